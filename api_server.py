@@ -0,0 +1,291 @@
+# api_server.py - API HTTP locale in sola lettura sulle classifiche
+# Server asyncio senza dipendenze esterne: i risultati della pipeline vengono letti
+# una volta dalle query cache, indicizzati in memoria e ricaricati quando cambiano.
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+from loguru import logger
+
+import config
+import query_cache
+
+DATASET_FILES = {
+    "unified": "QUERY_CACHE_FILE",
+    "fpedia": "FPEDIA_QUERY_CACHE_FILE",
+    "fstats": "FSTATS_QUERY_CACHE_FILE",
+}
+DEFAULT_SORT = {"unified": "Score_Affare", "fpedia": "Valore_su_Prezzo", "fstats": "Valore_su_Prezzo"}
+
+_STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class Dataset:
+    """
+    Una tabella di risultati in memoria con indici per ruolo e per prezzo.
+    Le righe vengono serializzate una sola volta al caricamento.
+    """
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        payload = query_cache.load_query_cache(path)
+        self.columns = payload["columns"]
+        self.data = payload["data"]
+        self.size = payload["rows"]
+        self.version = f"{self.mtime:.6f}"
+        self.rows = [{c: self.data[c][i] for c in self.columns} for i in range(self.size)]
+
+        # Indice per ruolo: ruolo -> indici di riga
+        self.by_role: dict[str, list[int]] = {}
+        for i, ruolo in enumerate(self.data.get("Ruolo", [None] * self.size)):
+            self.by_role.setdefault(ruolo, []).append(i)
+
+        # Indice per prezzo: coppie (quotazione, riga) ordinate, interrogate con bisect
+        prezzi = self.data.get("quotazione_attuale", [None] * self.size)
+        self.by_price = sorted((float(p), i) for i, p in enumerate(prezzi) if p is not None)
+        self._price_keys = [p for p, _ in self.by_price]
+
+        self._sorted: dict[tuple, list[int]] = {}
+
+    def price_range(self, low=None, high=None) -> list[int]:
+        start = 0 if low is None else bisect.bisect_left(self._price_keys, low)
+        end = len(self._price_keys) if high is None else bisect.bisect_right(self._price_keys, high)
+        return [i for _, i in self.by_price[start:end]]
+
+    def sorted_order(self, column: str, ascending: bool) -> list[int]:
+        """Ordine completo delle righe per colonna, calcolato una volta e memorizzato."""
+        key = (column, ascending)
+        if key not in self._sorted:
+            self._sorted[key] = query_cache.sort_rows(range(self.size), self.data[column], ascending)
+        return self._sorted[key]
+
+    def select(self, params: dict) -> tuple[int, int, list[dict]]:
+        """Applica filtri, ordinamento e paginazione. Ritorna (totale, offset, righe della pagina)."""
+        candidates = None
+
+        ruoli = [query_cache.normalize_role(r) for v in params.get("ruolo", []) for r in v.split(",")]
+        if ruoli:
+            candidates = {i for r in ruoli for i in self.by_role.get(r, [])}
+
+        low = _float_param(params, "min_prezzo")
+        high = _float_param(params, "max_prezzo")
+        if low is not None or high is not None:
+            in_range = set(self.price_range(low, high))
+            candidates = in_range if candidates is None else candidates & in_range
+
+        predicates = []
+        if "squadra" in params:
+            team = params["squadra"][0].strip().lower()
+            predicates.append(("Squadra", lambda v: v is not None and str(v).lower() == team))
+        if "fonte" in params:
+            source = params["fonte"][0].strip().lower()
+            predicates.append(("Fonte_Dati", lambda v: v is not None and source in str(v).lower()))
+        for condition in params.get("where", []):
+            column, op, target = query_cache.parse_condition(condition)
+            predicates.append((column, lambda v, op=op, t=target: query_cache.matches(v, op, t)))
+        for column, _ in predicates:
+            if column not in self.data:
+                raise ValueError(f"Colonna sconosciuta: '{column}'")
+
+        sort_by = params.get("sort", [DEFAULT_SORT.get(self.name, "Score_Affare")])[0]
+        if sort_by not in self.data:
+            raise ValueError(f"Colonna di ordinamento sconosciuta: '{sort_by}'")
+        ascending = params.get("order", ["desc"])[0].lower() == "asc"
+
+        # Si scorre l'ordine pre-calcolato: niente sort per richiesta
+        selected = [
+            i for i in self.sorted_order(sort_by, ascending)
+            if (candidates is None or i in candidates)
+            and all(predicate(self.data[column][i]) for column, predicate in predicates)
+        ]
+
+        offset = max(0, int(params.get("offset", ["0"])[0]))
+        limit = min(config.API_MAX_PAGE_SIZE, max(1, int(params.get("limit", [str(config.API_PAGE_SIZE)])[0])))
+        page = selected[offset:offset + limit]
+
+        if "columns" in params:
+            columns = [c for c in params["columns"][0].split(",") if c in self.data]
+            return len(selected), offset, [{c: self.data[c][i] for c in columns} for i in page]
+        return len(selected), offset, [self.rows[i] for i in page]
+
+
+def _float_param(params: dict, name: str):
+    if name not in params:
+        return None
+    try:
+        return float(params[name][0])
+    except ValueError:
+        raise ValueError(f"Parametro '{name}' non numerico: {params[name][0]}")
+
+
+class RankingsAPI:
+    """Stato del server: dataset caricati, cache delle risposte e hot reload."""
+
+    def __init__(self):
+        self.datasets: dict[str, Dataset] = {}
+        self._responses: OrderedDict[tuple, tuple[str, bytes]] = OrderedDict()
+
+    def load(self) -> bool:
+        """
+        (Ri)carica i dataset il cui file è cambiato. Ritorna True se qualcosa è cambiato.
+        I nuovi dataset vengono sostituiti in blocco, così le richieste in corso
+        continuano a leggere la versione precedente.
+        """
+        datasets = dict(self.datasets)
+        changed = False
+        for name, key in DATASET_FILES.items():
+            path = getattr(config, key)
+            if not os.path.exists(path):
+                if datasets.pop(name, None) is not None:
+                    changed = True
+                continue
+            current = datasets.get(name)
+            if current is not None and current.mtime == os.path.getmtime(path):
+                continue
+            try:
+                datasets[name] = Dataset(name, path)
+                changed = True
+                logger.info(f"API: dataset '{name}' caricato ({datasets[name].size} righe)")
+            except (OSError, ValueError) as e:
+                logger.error(f"API: impossibile caricare '{name}' da {path}: {e}")
+        if changed:
+            self.datasets = datasets
+            self._responses = OrderedDict()
+        return changed
+
+    async def watch(self):
+        """Hot reload: controlla periodicamente se la pipeline ha prodotto nuovi risultati."""
+        while True:
+            await asyncio.sleep(config.API_RELOAD_INTERVAL)
+            await asyncio.to_thread(self.load)
+
+    def handle(self, path: str, query: str) -> tuple[int, bytes, str | None]:
+        parts = [p for p in path.split("/") if p]
+
+        if not parts or parts == ["health"]:
+            body = {"status": "ok", "datasets": {n: d.version for n, d in self.datasets.items()}}
+            return 200, _dumps(body), None
+
+        if parts == ["datasets"]:
+            body = {
+                n: {"rows": d.size, "version": d.version, "columns": d.columns}
+                for n, d in self.datasets.items()
+            }
+            return 200, _dumps(body), None
+
+        if len(parts) == 2 and parts[0] == "players":
+            dataset = self.datasets.get(parts[1])
+            if dataset is None:
+                return 404, _dumps({"error": f"Dataset '{parts[1]}' non disponibile"}), None
+
+            cache_key = (dataset.name, dataset.version, query)
+            cached = self._responses.get(cache_key)
+            if cached is not None:
+                self._responses.move_to_end(cache_key)
+                etag, body = cached
+                return 200, body, etag
+
+            params = parse_qs(query)
+            try:
+                total, offset, items = dataset.select(params)
+            except ValueError as e:
+                return 400, _dumps({"error": str(e)}), None
+            body = _dumps({
+                "dataset": dataset.name,
+                "version": dataset.version,
+                "total": total,
+                "offset": offset,
+                "count": len(items),
+                "items": items,
+            })
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            self._responses[cache_key] = (etag, body)
+            if len(self._responses) > config.API_RESPONSE_CACHE_SIZE:
+                self._responses.popitem(last=False)
+            return 200, body, etag
+
+        return 404, _dumps({"error": "Endpoint non trovato"}), None
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                if method not in ("GET", "HEAD"):
+                    status, body, etag = 405, _dumps({"error": "Solo GET e HEAD"}), None
+                else:
+                    url = urlsplit(target)
+                    status, body, etag = self.handle(url.path, url.query)
+                    if etag is not None and headers.get("if-none-match") == etag:
+                        status, body = 304, b""
+
+                response_headers = [
+                    f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, '')}",
+                    "Content-Type: application/json; charset=utf-8",
+                    f"Content-Length: {len(body)}",
+                    "Access-Control-Allow-Origin: *",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ]
+                if etag is not None:
+                    response_headers.append(f"ETag: {etag}")
+                    response_headers.append("Cache-Control: no-cache")
+                writer.write(("\r\n".join(response_headers) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _dumps(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+async def serve(host: str = config.API_HOST, port: int = config.API_PORT):
+    api = RankingsAPI()
+    api.load()
+    if not api.datasets:
+        logger.warning("Nessun risultato disponibile: eseguire prima la pipeline. Il server resta in attesa.")
+
+    server = await asyncio.start_server(api.serve_client, host, port)
+    logger.info(f"API in ascolto su http://{host}:{port} (endpoint: /health, /datasets, /players/<dataset>)")
+    watcher = asyncio.create_task(api.watch())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+
+def run_server(host: str = config.API_HOST, port: int = config.API_PORT):
+    try:
+        asyncio.run(serve(host, port))
+    except KeyboardInterrupt:
+        logger.info("API arrestata.")
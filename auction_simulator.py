@@ -0,0 +1,212 @@
+# auction_simulator.py - Simulazione di aste complete con bot che seguono strategie diverse
+# Le classifiche del dataset unificato vengono messe alla prova in un'asta: ogni squadra è un bot
+# con una strategia (seguire Score_Affare, "stars and scrubs", budget bilanciato per ruolo...),
+# i vincoli sono quelli della lega (budget, giocatori per ruolo, un credito per slot ancora vuoto)
+# e ogni rosa finale viene valutata con lo Score_Lega della lega. Migliaia di aste indipendenti
+# girano in parallelo su tutti i core, ognuna con il proprio seed: i risultati sono riproducibili
+# e non dipendono dal numero di processi.
+import concurrent.futures
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+import config
+import league_batch
+
+# Le chiamate partono dai giocatori più quotati (con rumore): chi nomina chiama i nomi che contano
+NOMINATION_NOISE = 0.5
+# Stars and scrubs: percentile di prezzo nel ruolo oltre cui un giocatore è una "stella"
+STAR_PERCENTILE = 0.9
+STAR_MARKUP = 1.5
+
+
+def _valuta_score_affare(players: dict) -> np.ndarray:
+    # Fino a 1.5 volte il prezzo per i migliori Score_Affare del ruolo, metà prezzo per i peggiori
+    return players["prezzo"] * (0.5 + players["pct_affare"])
+
+
+def _valuta_stars_and_scrubs(players: dict) -> np.ndarray:
+    # Oltre il listino sui giocatori più cari del ruolo, un credito per tutti gli altri
+    return np.where(players["pct_prezzo"] >= STAR_PERCENTILE, players["prezzo"] * STAR_MARKUP, 1.0)
+
+
+def _valuta_balanced(players: dict) -> np.ndarray:
+    # Offerta massima della classifica di lega, dentro il budget di ogni ruolo
+    return players["offerta_max"]
+
+
+def _valuta_listino(players: dict) -> np.ndarray:
+    # Riferimento: il prezzo di listino scalato sul budget della lega
+    return players["prezzo"]
+
+
+# Strategia -> (valutazione dei giocatori, rispetta il budget per ruolo della lega)
+STRATEGIE = {
+    "score_affare": (_valuta_score_affare, False),
+    "stars_and_scrubs": (_valuta_stars_and_scrubs, False),
+    "balanced": (_valuta_balanced, True),
+    "listino": (_valuta_listino, False),
+}
+
+
+def load_dataset(league: league_batch.League, exclude=()) -> pd.DataFrame:
+    """Dataset unificato del formato della lega, dalla pipeline (con la cache degli stage)."""
+    import main
+
+    if league.formato == "classic":
+        return main.build_pipeline().run(targets=("unify",), exclude=exclude)["unify"]
+    results = main.build_pipeline().run(targets=league_batch.SHARED_STAGES, exclude=exclude)
+    df_quotazioni = results["quotazioni"] if results["quotazioni"] is not None else pd.DataFrame()
+    return league_batch.build_format_dataset(
+        results["process_fpedia"], results["process_FSTATS"], df_quotazioni, league.formato
+    )
+
+
+def prepare_players(df_unified: pd.DataFrame, league: league_batch.League) -> dict:
+    """Array numpy dei giocatori della lega: prezzi, punteggi e percentili per ruolo."""
+    df = league_batch.rank_league(df_unified, league)
+    ruoli = list(league.rosa)
+    per_ruolo = df.groupby("Ruolo")
+    affare = pd.to_numeric(df["Score_Affare"], errors="coerce")
+    forza = pd.to_numeric(df["Indice_Aggiustato"], errors="coerce").fillna(0)
+    return {
+        "ruolo": df["Ruolo"].map({r: i for i, r in enumerate(ruoli)}).to_numpy(dtype=np.int64),
+        "prezzo": df["Prezzo_Lega"].to_numpy(dtype=np.float64),
+        "offerta_max": df["Offerta_Max"].to_numpy(dtype=np.float64),
+        "score_lega": df["Score_Lega"].to_numpy(dtype=np.float64),
+        "forza": forza.to_numpy(dtype=np.float64),
+        "pct_prezzo": per_ruolo["Prezzo_Lega"].rank(pct=True).to_numpy(dtype=np.float64),
+        "pct_affare": affare.groupby(df["Ruolo"]).rank(pct=True).fillna(0).to_numpy(dtype=np.float64),
+    }
+
+
+def simulate_auction(players: dict, strategie: list[str], slots: np.ndarray, budget_ruolo: np.ndarray,
+                     budget: int, rng: np.random.Generator, noise: float = config.SIMULATION_NOISE) -> list[dict]:
+    """
+    Un'asta completa. Per ogni giocatore chiamato ogni bot ha un'offerta massima (la sua
+    valutazione con rumore, limitata dai crediti che deve tenere per gli slot ancora vuoti);
+    vince l'offerta più alta e paga un credito in più della seconda (asta al rialzo).
+    Ritorna una riga per squadra con spesa, giocatori e valore della rosa.
+    """
+    n_teams, n_ruoli = len(strategie), len(slots)
+    valutazioni = np.empty((n_teams, len(players["prezzo"])))
+    tetto_ruolo = np.full((n_teams, n_ruoli), np.inf)
+    for t, nome in enumerate(strategie):
+        valuta, per_ruolo = STRATEGIE[nome]
+        valutazioni[t] = valuta(players) * rng.lognormal(0.0, noise, len(players["prezzo"]))
+        if per_ruolo:
+            tetto_ruolo[t] = budget_ruolo
+
+    crediti = np.full(n_teams, float(budget))
+    liberi = np.tile(slots, (n_teams, 1))
+    rose = [[] for _ in range(n_teams)]
+    chiamata = players["prezzo"] * rng.lognormal(0.0, NOMINATION_NOISE, len(players["prezzo"]))
+
+    for ruolo in range(n_ruoli):
+        candidati = np.flatnonzero(players["ruolo"] == ruolo)
+        for i in candidati[np.argsort(-chiamata[candidati])]:
+            interessati = liberi[:, ruolo] > 0
+            if not interessati.any():
+                break
+            # Un credito per ogni altro slot da coprire, nel totale e (se previsto) nel ruolo
+            tetto = np.minimum(crediti - (liberi.sum(axis=1) - 1), tetto_ruolo[:, ruolo] - (liberi[:, ruolo] - 1))
+            offerte = np.where(interessati, np.maximum(1.0, np.minimum(np.floor(valutazioni[:, i]), tetto)), 0.0)
+            migliore = offerte.max()
+            vincitori = np.flatnonzero(offerte == migliore)
+            vincitore = vincitori[rng.integers(len(vincitori))] if len(vincitori) > 1 else vincitori[0]
+            seconda = np.partition(offerte, -2)[-2] if n_teams > 1 else 0.0
+            prezzo = migliore if len(vincitori) > 1 else max(1.0, min(migliore, seconda + 1))
+
+            crediti[vincitore] -= prezzo
+            liberi[vincitore, ruolo] -= 1
+            tetto_ruolo[vincitore, ruolo] -= prezzo
+            rose[vincitore].append(i)
+
+    return [
+        {
+            "squadra": t,
+            "strategia": strategie[t],
+            "giocatori": len(rosa),
+            "spesa": budget - crediti[t],
+            "valore": float(players["score_lega"][rosa].sum()),
+            "forza": float(players["forza"][rosa].sum()),
+        }
+        for t, rosa in enumerate(rose)
+    ]
+
+
+def _run_chunk(players: dict, strategie: list[str], slots: np.ndarray, budget_ruolo: np.ndarray,
+               budget: int, seed: int, aste: range, noise: float) -> list[dict]:
+    """Eseguito nei processi del pool: un blocco di aste, ognuna con il proprio seed."""
+    rows = []
+    for asta in aste:
+        rng = np.random.default_rng([seed, asta])
+        # I posti al tavolo ruotano: nessuna strategia è favorita dall'ordine delle squadre
+        shift = asta % len(strategie)
+        turno = strategie[shift:] + strategie[:shift]
+        for row in simulate_auction(players, turno, slots, budget_ruolo, budget, rng, noise):
+            row["asta"] = asta
+            rows.append(row)
+    return rows
+
+
+def run_simulation(df_unified: pd.DataFrame, league: league_batch.League, strategie: list[str],
+                   aste: int = config.SIMULATION_AUCTIONS, seed: int = 0,
+                   workers: int = config.SIMULATION_WORKERS, noise: float = config.SIMULATION_NOISE) -> pd.DataFrame:
+    """
+    Esegue `aste` aste con una squadra per strategia in `strategie` (ripetibili) e ritorna
+    una riga per squadra e asta, con la posizione in classifica per valore della rosa.
+    """
+    sconosciute = sorted(set(strategie) - set(STRATEGIE))
+    if sconosciute:
+        raise ValueError(f"Strategie sconosciute: {sconosciute} (disponibili: {', '.join(STRATEGIE)})")
+    if len(strategie) < 2:
+        raise ValueError("Servono almeno due squadre")
+
+    players = prepare_players(df_unified, league)
+    slots = np.array([league.rosa[r] for r in league.rosa], dtype=np.int64)
+    budget_ruolo = np.array([league.ripartizione[r] * league.budget for r in league.rosa])
+    for ruolo, disponibili in zip(league.rosa, np.bincount(players["ruolo"], minlength=len(slots))):
+        if disponibili < league.rosa[ruolo] * len(strategie):
+            raise ValueError(f"Giocatori insufficienti per il ruolo {ruolo}: {disponibili}")
+
+    workers = min(workers, aste)
+    step = max(1, -(-aste // (workers * 4)))
+    blocchi = [range(start, min(start + step, aste)) for start in range(0, aste, step)]
+    logger.info(f"🎲 {aste} aste da {len(strategie)} squadre su {workers} processi ({len(players['prezzo'])} giocatori)")
+
+    rows = []
+    if workers <= 1:
+        for blocco in blocchi:
+            rows.extend(_run_chunk(players, strategie, slots, budget_ruolo, league.budget, seed, blocco, noise))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            futures = [
+                pool.submit(_run_chunk, players, strategie, slots, budget_ruolo, league.budget, seed, blocco, noise)
+                for blocco in blocchi
+            ]
+            for future in futures:
+                rows.extend(future.result())
+
+    df = pd.DataFrame(rows)
+    df["posizione"] = df.groupby("asta")["valore"].rank(ascending=False, method="min").astype(int)
+    return df.sort_values(["asta", "squadra"]).reset_index(drop=True)
+
+
+def summarize(df_results: pd.DataFrame) -> pd.DataFrame:
+    """Confronto tra strategie: valore medio con intervallo di confidenza al 95%, vittorie e spesa."""
+    per_strategia = df_results.groupby("strategia")
+    summary = pd.DataFrame({
+        "squadre": per_strategia.size(),
+        "valore_medio": per_strategia["valore"].mean(),
+        "ic95": 1.96 * per_strategia["valore"].std(ddof=1) / np.sqrt(per_strategia.size()),
+        "forza_media": per_strategia["forza"].mean(),
+        "vittorie_%": per_strategia["posizione"].apply(lambda p: (p == 1).mean() * 100),
+        "posizione_media": per_strategia["posizione"].mean(),
+        "spesa_media": per_strategia["spesa"].mean(),
+    })
+    return summary.sort_values("valore_medio", ascending=False)
@@ -0,0 +1,177 @@
+# benchmark.py - Benchmark degli stage della pipeline su dati sintetici
+# Ogni esecuzione viene accodata a un file JSONL insieme al commit git corrente,
+# così le regressioni tra commit sono confrontabili.
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import warnings
+from datetime import datetime
+
+import pandas as pd
+from loguru import logger
+
+import config
+import convenienza_calculator
+import data_processor
+import data_unifier
+import projections
+import quotazioni_loader
+import synthetic_data
+
+DEFAULT_SIZES = (500, 5000)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _time(func, make_args, repeat: int) -> list[float]:
+    """Esegue `func(*make_args())` `repeat` volte; gli argomenti sono ricreati a ogni giro
+    perché le funzioni della pipeline modificano i DataFrame in input."""
+    timings = []
+    for _ in range(repeat):
+        args = make_args()
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def _end_to_end(df_fpedia, df_fstats, df_quotazioni):
+    fpedia = data_processor.process_fpedia_data(df_fpedia)
+    fpedia = quotazioni_loader.merge_with_quotazioni(fpedia, df_quotazioni)
+    fpedia = convenienza_calculator.calcola_convenienza_fpedia(fpedia)
+    fpedia = fpedia.sort_values(by="Valore_su_Prezzo", ascending=False)
+
+    fstats = data_processor.process_FSTATS_data(df_fstats)
+    fstats = quotazioni_loader.merge_with_quotazioni(fstats, df_quotazioni)
+    fstats = convenienza_calculator.calcola_convenienza_FSTATS(fstats)
+    fstats = fstats.sort_values(by="Valore_su_Prezzo", ascending=False)
+
+    return data_unifier.create_unified_dataset_improved(fpedia, fstats)
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat: int = 3, seed: int = 0) -> list[dict]:
+    """
+    Misura ogni stage in isolamento e la pipeline in memoria end to end (senza
+    download né scrittura Excel) per ogni dimensione dell'universo di giocatori.
+    """
+    results = []
+    logger.disable("")
+    # I filtri dei warning del chiamante (o di pytest) vengono ripristinati all'uscita
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        try:
+            for size in sizes:
+                data = synthetic_data.generate_dataset(size, seed)
+                fpedia, fstats, quot = data["fpedia"], data["fstats"], data["quotazioni"]
+
+                # Input intermedi, calcolati una volta e copiati a ogni ripetizione
+                fpedia_proc = data_processor.process_fpedia_data(fpedia.copy())
+                fstats_proc = data_processor.process_FSTATS_data(fstats.copy())
+                fpedia_merged = quotazioni_loader.merge_with_quotazioni(fpedia_proc.copy(), quot)
+                fstats_merged = quotazioni_loader.merge_with_quotazioni(fstats_proc.copy(), quot)
+                fpedia_scored = convenienza_calculator.calcola_convenienza_fpedia(fpedia_merged.copy())
+                fstats_scored = convenienza_calculator.calcola_convenienza_FSTATS(fstats_merged.copy())
+
+                stages = {
+                    "process_fpedia_data": (data_processor.process_fpedia_data, lambda: (fpedia.copy(),)),
+                    "process_FSTATS_data": (data_processor.process_FSTATS_data, lambda: (fstats.copy(),)),
+                    "merge_with_quotazioni[fpedia]": (
+                        quotazioni_loader.merge_with_quotazioni, lambda: (fpedia_proc.copy(), quot)),
+                    "merge_with_quotazioni[FSTATS]": (
+                        quotazioni_loader.merge_with_quotazioni, lambda: (fstats_proc.copy(), quot)),
+                    "projections": (projections.project, lambda: (fpedia_merged, fstats_merged)),
+                    "calcola_convenienza_fpedia": (
+                        convenienza_calculator.calcola_convenienza_fpedia, lambda: (fpedia_merged.copy(),)),
+                    "calcola_convenienza_FSTATS": (
+                        convenienza_calculator.calcola_convenienza_FSTATS, lambda: (fstats_merged.copy(),)),
+                    "create_unified_dataset_improved": (
+                        data_unifier.create_unified_dataset_improved, lambda: (fpedia_scored, fstats_scored)),
+                    "end_to_end": (_end_to_end, lambda: (fpedia.copy(), fstats.copy(), quot)),
+                }
+
+                for stage, (func, make_args) in stages.items():
+                    timings = _time(func, make_args, repeat)
+                    results.append({
+                        "stage": stage,
+                        "size": size,
+                        "min_s": min(timings),
+                        "median_s": statistics.median(timings),
+                        "repeat": repeat,
+                    })
+                    print(f"  {stage:<34} n={size:<7} min {min(timings) * 1000:10.1f} ms")
+        finally:
+            logger.enable("")
+    return results
+
+
+def save_results(results: list[dict], path: str = config.BENCHMARK_RESULTS_FILE) -> dict:
+    """Accoda una esecuzione al file JSONL dei risultati."""
+    run = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as fp:
+        fp.write(json.dumps(run) + "\n")
+    return run
+
+
+def load_runs(path: str = config.BENCHMARK_RESULTS_FILE) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as fp:
+        return [json.loads(line) for line in fp if line.strip()]
+
+
+def compare_runs(current: dict, previous: dict, threshold: float = config.BENCHMARK_REGRESSION_THRESHOLD) -> list[str]:
+    """
+    Confronta due esecuzioni stage per stage (tempo minimo) e ritorna le righe del report.
+    Le variazioni oltre `threshold` (es. 0.15 = +15%) sono segnalate come regressioni.
+    """
+    before = {(r["stage"], r["size"]): r["min_s"] for r in previous["results"]}
+    lines = [f"Confronto {previous['commit']} -> {current['commit']}"]
+    for r in current["results"]:
+        key = (r["stage"], r["size"])
+        if key not in before or before[key] == 0:
+            continue
+        ratio = r["min_s"] / before[key]
+        flag = "REGRESSIONE" if ratio > 1 + threshold else ("migliorato" if ratio < 1 - threshold else "")
+        lines.append(
+            f"  {r['stage']:<34} n={r['size']:<7} {before[key] * 1000:10.1f} -> {r['min_s'] * 1000:10.1f} ms"
+            f"  x{ratio:5.2f} {flag}"
+        )
+    return lines
+
+
+def main(sizes=DEFAULT_SIZES, repeat: int = 3, compare: bool = True, save: bool = True) -> dict:
+    print(f"Benchmark su dimensioni {list(sizes)} ({repeat} ripetizioni)")
+    previous_runs = load_runs()
+    run = {"commit": _git_commit(), "results": run_benchmarks(sizes, repeat)}
+    if save:
+        run = save_results(run["results"])
+    if compare:
+        # Confronto con l'ultima esecuzione di un commit diverso, o con l'ultima disponibile
+        others = [r for r in previous_runs if r["commit"] != run["commit"]] or previous_runs
+        if others:
+            print("\n".join(compare_runs(run, others[-1])))
+    return run
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,631 @@
+# cli.py - Interfaccia a riga di comando con sottocomandi e import pigri
+# I moduli pesanti (pandas, bs4, requests, loguru, la pipeline) vengono importati
+# solo dentro il sottocomando che li usa: `--help` parte senza pagarne il costo.
+import argparse
+import os
+import sys
+
+import config
+
+# Moduli che non devono essere importati all'avvio della CLI
+HEAVY_MODULES = ("pandas", "numpy", "bs4", "requests", "tqdm", "openpyxl", "loguru")
+
+FETCH_STAGES = ("fetch_fpedia", "fetch_FSTATS")
+COMMAND_TARGETS = {
+    "fetch": FETCH_STAGES,
+    "process": ("merge_fpedia", "merge_FSTATS"),
+    "score": ("score_fpedia", "score_FSTATS"),
+    "report": (
+        "report_fpedia", "report_FSTATS", "report_unified",
+        "query_cache", "query_cache_fpedia", "query_cache_FSTATS", "similarity_index", "shared_results",
+        "run_snapshot",
+    ),
+}
+
+
+def _apply_global_options(args):
+    try:
+        config.apply_overrides()
+    except ValueError as e:
+        print(f"Override di configurazione non validi: {e}", file=sys.stderr)
+        sys.exit(2)
+    if args.no_cache:
+        config.STAGE_CACHE_ENABLED = False
+        config.INCREMENTAL_SCORING = False
+    if args.trace:
+        config.TRACE_ENABLED = True
+    if args.workers:
+        config.PIPELINE_MAX_WORKERS = args.workers
+
+
+def _run_pipeline(args, targets=None, exclude=()):
+    import instrumentation
+    import main
+
+    _apply_global_options(args)
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+    with instrumentation.tracing():
+        return main.build_pipeline().run(targets=targets, exclude=exclude)
+
+
+def cmd_run(args):
+    import main
+
+    _apply_global_options(args)
+    main.main()
+
+
+def cmd_stages(args):
+    targets = COMMAND_TARGETS[args.command]
+    # Senza --fetch si lavora sui file già scaricati
+    exclude = () if args.command == "fetch" or args.fetch else FETCH_STAGES
+    _run_pipeline(args, targets=targets, exclude=exclude)
+
+
+def cmd_batch(args):
+    import instrumentation
+    import league_batch
+
+    _apply_global_options(args)
+    try:
+        leagues = league_batch.load_leagues(args.leagues)
+    except FileNotFoundError:
+        print(f"File delle leghe non trovato: {args.leagues}")
+        sys.exit(1)
+    except (TypeError, ValueError) as e:
+        print(f"Configurazione leghe non valida: {e}")
+        sys.exit(2)
+    if args.lega:
+        leagues = [l for l in leagues if l.nome in args.lega or l.slug in args.lega]
+        if not leagues:
+            print(f"Nessuna lega corrisponde a: {', '.join(args.lega)}")
+            sys.exit(2)
+
+    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+    with instrumentation.tracing():
+        summary = league_batch.run_batch(
+            leagues, exclude=() if args.fetch else FETCH_STAGES, output_dir=args.output_dir
+        )
+    for nome, s in summary.items():
+        print(f"{nome:<30} {s['formato']:<8} rosa {s['giocatori']:>2} giocatori, prezzo base {s['costo_rosa']:>5.0f} "
+              f"(residui {s['crediti_residui']:.0f}) -> {s['report']}")
+
+
+def cmd_simulate(args):
+    import auction_simulator
+    import instrumentation
+    import league_batch
+
+    _apply_global_options(args)
+    try:
+        if args.lega:
+            leagues = [l for l in league_batch.load_leagues(args.leagues) if args.lega in (l.nome, l.slug)]
+            if not leagues:
+                print(f"Nessuna lega corrisponde a: {args.lega}")
+                sys.exit(2)
+            league = leagues[0]
+        else:
+            league = league_batch.League("simulazione")
+    except FileNotFoundError:
+        print(f"File delle leghe non trovato: {args.leagues}")
+        sys.exit(1)
+    except (TypeError, ValueError) as e:
+        print(f"Configurazione leghe non valida: {e}")
+        sys.exit(2)
+
+    strategie = args.strategie.split(",") if args.strategie else list(config.SIMULATION_STRATEGIES)
+    # Le strategie indicate si ripetono fino a riempire il tavolo
+    squadre = [strategie[i % len(strategie)] for i in range(args.squadre or len(strategie))]
+    with instrumentation.tracing():
+        df_unified = auction_simulator.load_dataset(league, exclude=() if args.fetch else FETCH_STAGES)
+    if df_unified is None or df_unified.empty:
+        print("Dataset unificato vuoto: scaricare prima i dati (`cli.py fetch`).")
+        sys.exit(1)
+    try:
+        df_results = auction_simulator.run_simulation(
+            df_unified, league, squadre, aste=args.aste, seed=args.seed, workers=args.processi
+        )
+    except ValueError as e:
+        print(f"Errore: {e}")
+        sys.exit(2)
+
+    if args.output:
+        df_results.to_csv(args.output, index=False)
+        print(f"Risultati delle singole aste salvati in {args.output}")
+    print(f"Lega '{league.nome}' ({league.formato}, budget {league.budget}), {args.aste} aste, squadre: {', '.join(squadre)}")
+    print(auction_simulator.summarize(df_results).to_string(float_format=lambda v: f"{v:.1f}"))
+
+
+def cmd_diff(args):
+    import json
+    import run_snapshots
+
+    scope = os.path.join("leghe", args.lega) if args.lega else run_snapshots.UNIFIED
+    names = run_snapshots.list_snapshots(scope)
+    if args.list:
+        print("\n".join(names) if names else f"Nessuno snapshot per {scope}")
+        return
+    old, new = args.vecchio, args.nuovo
+    if old is None or new is None:
+        if len(names) < 2:
+            command = "batch" if args.lega else "run` o `cli.py report"
+            print(f"Servono almeno due snapshot per {scope}: eseguire `cli.py {command}` due volte.")
+            sys.exit(1)
+        new = new or names[-1]
+        old = old or names[names.index(new) - 1 if new in names and names.index(new) > 0 else -2]
+    try:
+        before = run_snapshots.load_snapshot(old, scope)
+        after = run_snapshots.load_snapshot(new, scope)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Snapshot non leggibile: {e}")
+        sys.exit(1)
+
+    result = run_snapshots.diff_snapshots(
+        before, after, columns=args.colonne.split(",") if args.colonne else None, min_rank_move=args.min_rank_move
+    )
+    if args.json:
+        records = {k: v.astype(object).where(v.notna(), None).to_dict("records") for k, v in result.items()}
+        print(json.dumps(records, ensure_ascii=False, default=str))
+        return
+
+    def fmt(value):
+        if value is None or value != value:
+            return "-"
+        return f"{value:g}" if isinstance(value, float) else value
+
+    def player(row):
+        return f"{row['Nome']} ({row['Squadra']})"
+
+    limit = args.limit or None
+    print(f"Confronto {before['name']} -> {after['name']} ({scope})")
+    for label, sign, df in (("Nuovi", "+", result["added"]), ("Usciti", "-", result["removed"])):
+        print(f"{label}: {len(df)}")
+        for _, row in df.head(limit).iterrows():
+            print(f"  {sign} {player(row)}")
+    changed = result["changed"]
+    groups = list(changed.groupby(list(run_snapshots.KEY_COLUMNS), sort=False))
+    print(f"Cambiati: {len(groups)}")
+    for _, rows in groups[:limit]:
+        deltas = [
+            f"{r['colonna']} {fmt(r['prima'])} -> {fmt(r['dopo'])}" + (f" ({r['delta']:+g})" if fmt(r["delta"]) != "-" else "")
+            for _, r in rows.iterrows()
+        ]
+        print(f"  ~ {player(rows.iloc[0])}: {', '.join(deltas)}")
+
+
+def cmd_history_ingest(args):
+    from datetime import date
+
+    import quotazioni_history
+
+    snapshot = date.fromisoformat(args.date) if args.date else None
+    if snapshot and len(args.files) > 1:
+        print("--date si può usare con un solo file")
+        sys.exit(2)
+    # I file settimanali vanno acquisiti in ordine di data
+    files = sorted(args.files, key=lambda f: (quotazioni_history.season_from_path(f), quotazioni_history.date_from_path(f)))
+    for path in files:
+        try:
+            rows = quotazioni_history.ingest_file(path, snapshot, args.stagione)
+        except ValueError as e:
+            print(f"{path}: {e}")
+            sys.exit(2)
+        print(f"{path}: {rows} righe cambiate")
+
+
+def cmd_history_trends(args):
+    import quotazioni_history
+
+    df = quotazioni_history.trends(args.stagione, args.window)
+    if df.empty:
+        print("Storico quotazioni vuoto: acquisire prima uno snapshot con `cli.py history ingest`.")
+        sys.exit(1)
+    if args.ruolo:
+        df = df[df["ruolo"].isin([r.upper() for r in args.ruolo])]
+    if not args.all:
+        df = df[df["presente"]]
+    if args.sort not in df.columns:
+        print(f"Colonna di ordinamento sconosciuta: {args.sort}")
+        sys.exit(2)
+    df = df.sort_values(args.sort, ascending=args.asc, na_position="last")
+    if args.limit:
+        df = df.head(args.limit)
+    if args.json:
+        print(df.reset_index().to_json(orient="records", force_ascii=False))
+    else:
+        print(f"Stagione {df.attrs.get('stagione')}: snapshot dal {df.attrs.get('dal')} al {df.attrs.get('al')}")
+        print(df.to_string())
+
+
+def cmd_similar(args):
+    import json
+    import similar_players
+
+    try:
+        index = similar_players.SimilarityIndex.load(args.index)
+    except FileNotFoundError:
+        print(f"Indice non trovato in {args.index}: eseguire prima `cli.py run` o `cli.py report`.")
+        sys.exit(1)
+
+    matches = index.find(args.nome)
+    if not matches:
+        print(f"Nessun giocatore corrisponde a '{args.nome}'")
+        sys.exit(1)
+    if len(matches) > 1:
+        print(f"'{args.nome}' è ambiguo, specificare meglio tra:")
+        for i in matches[:20]:
+            print(f"  {index.nomi[i]} ({index.squadre[i]}, {index.ruoli[i]})")
+        sys.exit(2)
+
+    target = matches[0]
+    results = index.similar(target, k=args.k, max_prezzo=args.max_prezzo, min_prezzo=args.min_prezzo)
+    rows = [dict(index.describe(i), distanza=round(d, 3)) for i, d in results]
+    if args.json:
+        print(json.dumps({"giocatore": index.describe(target), "simili": rows}, ensure_ascii=False))
+        return
+    t = index.describe(target)
+    print(f"Simili a {t['Nome']} ({t['Squadra']}, {t['Ruolo']}, Qt {t['quotazione_attuale']:.0f}):")
+    for r in rows:
+        print(f"  {r['Nome']:<30} {r['Squadra']:<14} Qt {r['quotazione_attuale']:>4.0f}  distanza {r['distanza']:.2f}")
+
+
+def cmd_query(args):
+    import json
+    import query_cache
+
+    try:
+        if args.shared:
+            import shared_results
+
+            payload = shared_results.SharedResults().table("unified").as_payload()
+        else:
+            payload = query_cache.load_query_cache(args.cache)
+    except FileNotFoundError:
+        source = config.SHARED_RESULTS_DIR if args.shared else args.cache
+        print(f"Risultati non trovati in {source}: eseguire prima `cli.py run` o `cli.py report`.")
+        sys.exit(1)
+
+    try:
+        indices = query_cache.query(
+            payload,
+            ruolo=args.ruolo,
+            squadra=args.squadra,
+            min_prezzo=args.min_prezzo,
+            max_prezzo=args.max_prezzo,
+            fonte=args.fonte,
+            conditions=args.where,
+            sort_by=args.sort,
+            ascending=args.asc,
+            limit=args.limit,
+        )
+    except (KeyError, ValueError) as e:
+        print(f"Errore: {e}")
+        sys.exit(2)
+
+    columns = args.columns.split(",") if args.columns else list(query_cache.DEFAULT_COLUMNS)
+    if args.sort and args.sort not in columns:
+        columns.append(args.sort)
+    if args.json:
+        data = payload["data"]
+        print(json.dumps([{c: data[c][i] for c in columns if c in data} for i in indices], ensure_ascii=False))
+    else:
+        print(query_cache.format_table(payload, indices, columns))
+
+
+def cmd_shared(args):
+    import shared_results
+
+    results = shared_results.SharedResults()
+    try:
+        results.refresh()
+    except FileNotFoundError as e:
+        print(f"{e}: eseguire prima `cli.py run` o `cli.py report`.")
+        sys.exit(1)
+    print(f"Risultati condivisi: versione {results.version} in {results.directory}")
+    for name, table in results.tables.items():
+        print(f"  {name}: {table.rows} righe, {len(table.columns)} colonne")
+
+    if args.readers:
+        for mode in ("mmap", "json"):
+            sizes = shared_results.measure_readers(args.readers, mode)
+            if None in sizes:
+                print("Misura della memoria disponibile solo su Linux (/proc/self/smaps_rollup).")
+                return
+            print(f"  {args.readers} lettori {mode}: {sum(sizes) / 1024:.1f} MB di memoria non condivisa in totale "
+                  f"({max(sizes) / 1024:.1f} MB al massimo per processo)")
+
+
+def cmd_formulas(args):
+    import scoring_formulas
+
+    try:
+        formulas = scoring_formulas.load_formulas(args.file)
+    except ValueError as e:
+        print(f"Formule non valide: {e}", file=sys.stderr)
+        sys.exit(2)
+    print(f"Formule valide ({args.file or config.SCORING_FORMULAS_FILE}; * = modificata dal file)")
+    for group in args.gruppo or scoring_formulas.GROUPS:
+        print(f"\n[{group}] colonne lette: {', '.join(formulas.inputs(group))}")
+        for formula in formulas.groups[group]:
+            marker = "*" if formula.name in formulas.custom.get(group, ()) else " "
+            print(f" {marker} {formula.name} = {formula.source}")
+
+
+def cmd_watch(args):
+    import watch
+
+    _apply_global_options(args)
+    try:
+        watch.Watcher(targets=watch.FAST_TARGETS if args.no_excel else None).run(interval=args.interval)
+    except KeyboardInterrupt:
+        print("\nWatch terminato.")
+
+
+def cmd_serve(args):
+    import api_server
+
+    api_server.run_server(args.host, args.port)
+
+
+def cmd_bench(args):
+    import benchmark
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    benchmark.main(sizes=sizes, repeat=args.repeat, compare=not args.no_compare, save=not args.no_save)
+
+
+def cmd_synth(args):
+    import synthetic_data
+
+    synthetic_data.write_dataset(args.data_dir, args.players, args.seed)
+    print(f"Dati sintetici ({args.players} giocatori) scritti in {args.data_dir}")
+
+
+def _faults(args):
+    import mock_server
+
+    return mock_server.Faults(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, max_rps=args.max_rps, retry_after_s=args.retry_after, seed=args.seed,
+    )
+
+
+def cmd_mock_server(args):
+    import mock_server
+
+    mock_server.run_mock_server(args.host, args.port, args.players, args.seed, _faults(args))
+
+
+def cmd_scrape_bench(args):
+    import json
+    import mock_server
+
+    result = mock_server.load_test(
+        n_players=args.players, workers=args.scrape_workers, faults=_faults(args), page_size=args.page_size,
+        retry_backoff_s=args.retry_backoff, seed=args.seed, parse_workers=args.parse_workers,
+        deadline_s=args.deadline,
+    )
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        mock_server.print_load_test(result)
+
+
+def _add_fault_arguments(p):
+    p.add_argument("--players", type=int, default=600, help="numero di giocatori serviti dal mock")
+    p.add_argument("--seed", type=int, default=0, help="seed per i dati e per gli errori iniettati")
+    p.add_argument("--latency-ms", type=float, default=0.0, help="latenza aggiunta a ogni risposta")
+    p.add_argument("--jitter-ms", type=float, default=0.0, help="variazione casuale della latenza (+/-)")
+    p.add_argument("--error-rate", type=float, default=0.0, help="frazione di risposte 500/502/503")
+    p.add_argument("--throttle-rate", type=float, default=0.0, help="frazione di risposte 429")
+    p.add_argument("--max-rps", type=float, default=0.0, help="richieste/s oltre cui rispondere 429 (0 = nessun limite)")
+    p.add_argument("--retry-after", type=float, default=1.0, help="valore dell'header Retry-After sui 429")
+
+
+def check_startup(budget_ms: float = config.CLI_IMPORT_BUDGET_MS) -> bool:
+    """
+    Import-time budget check: imports the CLI in a fresh interpreter and fails
+    if it takes longer than `budget_ms` or pulls in any of HEAVY_MODULES.
+    """
+    import subprocess
+    import time
+
+    code = (
+        "import sys, time\n"
+        "t = time.perf_counter()\n"
+        "import cli\n"
+        "elapsed = (time.perf_counter() - t) * 1000\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(f'{elapsed:.1f}', ','.join(heavy))\n"
+    )
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=project_dir, capture_output=True, text=True, check=True
+    ).stdout.split()
+    elapsed_ms = float(output[0])
+    heavy = output[1].split(",") if len(output) > 1 else []
+
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(project_dir, "cli.py"), "--help"],
+        capture_output=True, check=True,
+    )
+    help_ms = (time.perf_counter() - started) * 1000
+
+    print(f"Import cli: {elapsed_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    print(f"cli.py --help (interprete incluso): {help_ms:.1f} ms")
+    if heavy:
+        print(f"ERRORE: moduli pesanti importati all'avvio: {', '.join(heavy)}")
+    if elapsed_ms > budget_ms:
+        print("ERRORE: budget di import superato")
+    return not heavy and elapsed_ms <= budget_ms
+
+
+def cmd_check_startup(args):
+    if not check_startup(args.budget):
+        sys.exit(1)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="fantacalcio", description="Analisi Fantacalcio: recupero dati, calcolo convenienza e report."
+    )
+    parser.add_argument("--no-cache", action="store_true", help="ricalcola tutti gli stage ignorando la cache")
+    parser.add_argument("--workers", type=int, default=None, help="worker della pipeline (default da config)")
+    parser.add_argument("--trace", action="store_true",
+                        help="registra tempi, CPU, memoria e righe per stage in data/output/trace*.json")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("run", help="esegue l'intera pipeline (come main.py)")
+    p.set_defaults(func=cmd_run)
+
+    p = subparsers.add_parser("fetch", help="scarica i dati FPEDIA e FSTATS")
+    p.set_defaults(func=cmd_stages, fetch=True)
+
+    for command, description in (
+        ("process", "pulisce i dati scaricati e li unisce alle quotazioni"),
+        ("score", "calcola gli indici di convenienza"),
+        ("report", "scrive i report Excel e il dataset unificato"),
+    ):
+        p = subparsers.add_parser(command, help=description)
+        p.add_argument("--fetch", action="store_true", help="scarica prima i dati mancanti")
+        p.set_defaults(func=cmd_stages)
+
+    p = subparsers.add_parser("batch", help="classifiche e report per più leghe (Classic/Mantra) in un'unica esecuzione")
+    p.add_argument("--leagues", default=config.LEAGUES_FILE, help="file JSON con le configurazioni delle leghe")
+    p.add_argument("--lega", action="append", help="esegue solo la lega indicata (nome o slug, ripetibile)")
+    p.add_argument("--output-dir", default=config.LEAGUES_OUTPUT_DIR, help="directory dei report per lega")
+    p.add_argument("--fetch", action="store_true", help="scarica prima i dati mancanti")
+    p.set_defaults(func=cmd_batch)
+
+    p = subparsers.add_parser("simulate", help="confronta strategie d'asta con migliaia di aste simulate tra bot")
+    p.add_argument("--strategie", help=f"strategie separate da virgola (default: {','.join(config.SIMULATION_STRATEGIES)})")
+    p.add_argument("--squadre", type=int, default=config.SIMULATION_TEAMS, help="squadre al tavolo (le strategie si ripetono)")
+    p.add_argument("--aste", type=int, default=config.SIMULATION_AUCTIONS, help="numero di aste simulate")
+    p.add_argument("--processi", type=int, default=config.SIMULATION_WORKERS, help="processi in parallelo")
+    p.add_argument("--seed", type=int, default=0, help="seed delle aste (risultati riproducibili)")
+    p.add_argument("--lega", help="usa rosa, budget e pesi di una lega del file delle leghe")
+    p.add_argument("--leagues", default=config.LEAGUES_FILE, help="file JSON con le configurazioni delle leghe")
+    p.add_argument("--output", help="CSV con il risultato di ogni squadra in ogni asta")
+    p.add_argument("--fetch", action="store_true", help="scarica prima i dati mancanti")
+    p.set_defaults(func=cmd_simulate)
+
+    p = subparsers.add_parser("diff", help="cosa è cambiato tra due esecuzioni: giocatori nuovi, usciti e valori modificati")
+    p.add_argument("vecchio", nargs="?", help="snapshot di partenza (default: il penultimo)")
+    p.add_argument("nuovo", nargs="?", help="snapshot di arrivo (default: l'ultimo)")
+    p.add_argument("--lega", help="slug della lega di `batch` (default: dataset unificato)")
+    p.add_argument("--colonne", help="confronta solo queste colonne, separate da virgola")
+    p.add_argument("--min-rank-move", type=int, default=config.RUN_DIFF_MIN_RANK_MOVE,
+                   help="posizioni minime perché uno spostamento in classifica sia mostrato")
+    p.add_argument("--limit", type=int, default=50, help="righe massime per sezione (0 = tutte)")
+    p.add_argument("--list", action="store_true", help="elenca gli snapshot disponibili")
+    p.add_argument("--json", action="store_true", help="output in formato JSON")
+    p.set_defaults(func=cmd_diff)
+
+    p = subparsers.add_parser("history", help="storico delle quotazioni: acquisizione snapshot e trend")
+    history = p.add_subparsers(dest="history_command", required=True)
+    h = history.add_parser("ingest", help="aggiunge uno o più listoni allo storico (solo righe cambiate)")
+    h.add_argument("files", nargs="+", help="file xlsx delle quotazioni")
+    h.add_argument("--date", help="data dello snapshot YYYY-MM-DD (default: dal nome del file o data di modifica)")
+    h.add_argument("--stagione", help="stagione, es. 2025_26 (default: dal nome del file)")
+    h.set_defaults(func=cmd_history_ingest)
+    h = history.add_parser("trends", help="delta, momentum e trend FVM di tutti i giocatori")
+    h.add_argument("--stagione", help="stagione (default: la più recente)")
+    h.add_argument("--window", type=int, default=config.QUOTAZIONI_TREND_WINDOW, help="snapshot per delta e momentum")
+    h.add_argument("--ruolo", action="append", help="P/D/C/A, ripetibile")
+    h.add_argument("--sort", default="momentum", help="colonna di ordinamento")
+    h.add_argument("--asc", action="store_true", help="ordinamento crescente")
+    h.add_argument("--all", action="store_true", help="include i giocatori usciti dal listone")
+    h.add_argument("--limit", type=int, default=20, help="numero massimo di righe (0 = tutte)")
+    h.add_argument("--json", action="store_true", help="output in formato JSON")
+    h.set_defaults(func=cmd_history_trends)
+
+    p = subparsers.add_parser("query", help="interroga il dataset unificato dall'ultima esecuzione")
+    p.add_argument("--ruolo", action="append", help="P/D/C/A o nome esteso (es. attaccanti), ripetibile")
+    p.add_argument("--squadra", help="nome della squadra")
+    p.add_argument("--min-prezzo", type=float, help="quotazione minima")
+    p.add_argument("--max-prezzo", type=float, help="quotazione massima")
+    p.add_argument("--fonte", help="filtro su Fonte_Dati (es. entrambe, fpedia, fstats)")
+    p.add_argument("--where", action="append", default=[], metavar="COND",
+                   help="condizione su una colonna, es. 'Affidabilita_Dati>=70' (ripetibile)")
+    p.add_argument("--sort", default="Score_Affare", help="colonna di ordinamento")
+    p.add_argument("--asc", action="store_true", help="ordinamento crescente")
+    p.add_argument("--limit", type=int, default=10, help="numero massimo di righe (0 = tutte)")
+    p.add_argument("--columns", help="colonne da mostrare, separate da virgola")
+    p.add_argument("--json", action="store_true", help="output in formato JSON")
+    p.add_argument("--cache", default=config.QUERY_CACHE_FILE, help="percorso della query cache")
+    p.add_argument("--shared", action="store_true", help="legge i risultati condivisi mappati in memoria invece della query cache")
+    p.set_defaults(func=cmd_query)
+
+    p = subparsers.add_parser("shared", help="versione e tabelle dei risultati condivisi mappati in memoria")
+    p.add_argument("--readers", type=int, default=0, help="misura la memoria non condivisa di N lettori (mmap contro query cache JSON)")
+    p.set_defaults(func=cmd_shared)
+
+    p = subparsers.add_parser("formulas", help="valida e mostra le formule di punteggio in uso (default e personalizzate)")
+    p.add_argument("--file", help=f"file delle formule (default: {config.SCORING_FORMULAS_FILE})")
+    p.add_argument("--gruppo", action="append", choices=("fpedia", "FSTATS", "unificato"), help="solo questo gruppo (ripetibile)")
+    p.set_defaults(func=cmd_formulas)
+
+    p = subparsers.add_parser("similar", help="giocatori più simili a uno dato, entro un tetto di prezzo")
+    p.add_argument("nome", help="nome (o parte del nome) del giocatore")
+    p.add_argument("-k", type=int, default=10, help="numero di giocatori simili")
+    p.add_argument("--max-prezzo", type=float, help="quotazione massima")
+    p.add_argument("--min-prezzo", type=float, help="quotazione minima")
+    p.add_argument("--json", action="store_true", help="output in formato JSON")
+    p.add_argument("--index", default=config.SIMILARITY_INDEX_FILE, help="percorso dell'indice")
+    p.set_defaults(func=cmd_similar)
+
+    p = subparsers.add_parser("watch", help="resta attivo e riesegue gli stage a valle quando cambiano i file di input")
+    p.add_argument("--interval", type=float, default=config.WATCH_INTERVAL, help="intervallo di polling in secondi")
+    p.add_argument("--no-excel", action="store_true", help="aggiorna solo query cache e indice di similarità, senza report Excel")
+    p.set_defaults(func=cmd_watch)
+
+    p = subparsers.add_parser("serve", help="avvia l'API HTTP locale in sola lettura sulle classifiche")
+    p.add_argument("--host", default=config.API_HOST, help="indirizzo di ascolto (0.0.0.0 per la rete locale)")
+    p.add_argument("--port", type=int, default=config.API_PORT, help="porta di ascolto")
+    p.set_defaults(func=cmd_serve)
+
+    p = subparsers.add_parser("bench", help="benchmark degli stage su dati sintetici")
+    p.add_argument("--sizes", default="500,5000", help="dimensioni dell'universo, es. 500,5000,20000,100000")
+    p.add_argument("--repeat", type=int, default=3, help="ripetizioni per stage")
+    p.add_argument("--no-compare", action="store_true", help="non confrontare con l'esecuzione precedente")
+    p.add_argument("--no-save", action="store_true", help="non salvare i risultati")
+    p.set_defaults(func=cmd_bench)
+
+    p = subparsers.add_parser("synth", help="genera file di input sintetici per provare la pipeline offline")
+    p.add_argument("--players", type=int, default=600, help="numero di giocatori (500-100000)")
+    p.add_argument("--seed", type=int, default=0, help="seed del generatore")
+    p.add_argument("--data-dir", default=config.DATA_DIR, help="directory di destinazione")
+    p.set_defaults(func=cmd_synth)
+
+    p = subparsers.add_parser("mock-server", help="avvia un finto FPEDIA/FSTATS locale per provare il retriever offline")
+    p.add_argument("--host", default=config.MOCK_HOST, help="indirizzo di ascolto")
+    p.add_argument("--port", type=int, default=config.MOCK_PORT, help="porta di ascolto")
+    _add_fault_arguments(p)
+    p.set_defaults(func=cmd_mock_server)
+
+    p = subparsers.add_parser("scrape-bench", help="misura throughput e retry del retriever contro il mock locale")
+    _add_fault_arguments(p)
+    p.add_argument("--scrape-workers", type=int, default=config.MAX_WORKERS, help="thread di rete dello scraping FPEDIA")
+    p.add_argument("--parse-workers", type=int, default=None, help="processi di parsing HTML (default da config: tutti i core)")
+    p.add_argument("--page-size", type=int, default=200, help="giocatori per pagina FSTATS")
+    p.add_argument("--retry-backoff", type=float, default=None, help="backoff base tra i retry in secondi (default da config)")
+    p.add_argument("--deadline", type=float, default=None, help="tempo massimo dello scraping FPEDIA in secondi (default da config)")
+    p.add_argument("--json", action="store_true", help="risultato completo in JSON")
+    p.set_defaults(func=cmd_scrape_bench)
+
+    p = subparsers.add_parser("check-startup", help="verifica il budget del tempo di import della CLI")
+    p.add_argument("--budget", type=float, default=config.CLI_IMPORT_BUDGET_MS, help="budget in millisecondi")
+    p.set_defaults(func=cmd_check_startup)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,28 +15,200 @@ GIOCATORI_CSV = os.path.join(DATA_DIR, "_giocatori.csv")
 PLAYERS_CSV = os.path.join(DATA_DIR, "_players.csv")
 CONVENIENZA_CSV = os.path.join(OUTPUT_DIR, "convenienza.csv")
 OUTPUT_EXCEL = os.path.join(OUTPUT_DIR, "fantacalcio_analysis.xlsx")
+FPEDIA_OUTPUT_EXCEL = os.path.join(OUTPUT_DIR, "fpedia_analysis_con_quotazioni.xlsx")
+FSTATS_OUTPUT_EXCEL = os.path.join(OUTPUT_DIR, "FSTATS_analysis_con_quotazioni.xlsx")
+UNIFIED_OUTPUT_EXCEL = os.path.join(OUTPUT_DIR, "analisi_unificata_fantacalcio.xlsx")
+QUERY_CACHE_FILE = os.path.join(OUTPUT_DIR, "query_cache.json")
+FPEDIA_QUERY_CACHE_FILE = os.path.join(OUTPUT_DIR, "query_cache_fpedia.json")
+FSTATS_QUERY_CACHE_FILE = os.path.join(OUTPUT_DIR, "query_cache_FSTATS.json")
 # File quotazioni
 QUOTAZIONI_FILE = os.path.join(DATA_DIR, "Quotazioni_Fantacalcio_Stagione_2025_26.xlsx")
 
 # URLS
 ANNO_CORRENTE = 2025
 FSTATS_ANNO = 2024
-BASEURL_FPEDIA = decode("aHR0cHM6Ly93d3cuZmFudGFjYWxjaW9wZWRpYS5jb20=")
-BASEURL_FSTATS = decode("aHR0cHM6Ly9hcGkuYXBwLmZhbnRhZ29hdC5pdC9hcGk=")
+# Sovrascrivibili da ambiente, es. per puntare al mock server locale (`cli.py mock-server`)
+BASEURL_FPEDIA = os.getenv("FPEDIA_BASEURL") or decode("aHR0cHM6Ly93d3cuZmFudGFjYWxjaW9wZWRpYS5jb20=")
+BASEURL_FSTATS = os.getenv("FSTATS_BASEURL") or decode("aHR0cHM6Ly9hcGkuYXBwLmZhbnRhZ29hdC5pdC9hcGk=")
+FSTATS_PAGE_SIZE = 1000
+FSTATS_STREAM_CHUNK_SIZE = 64 * 1024  # byte letti per volta dalla risposta FSTATS (parsing in streaming)
 FPEDIA_URL = f"{BASEURL_FPEDIA}/lista-calciatori-serie-a/"
 FSTATS_LOGIN_URL = f"{BASEURL_FSTATS}/account/login/"
-FSTATS_PLAYERS_URL = f"{BASEURL_FSTATS}/v1/zona/player/?page_size=1000&page=1&season={str(FSTATS_ANNO)}%2F{str(FSTATS_ANNO+1)[-2:]}&ordering="
+FSTATS_PLAYERS_URL = f"{BASEURL_FSTATS}/v1/zona/player/?page_size={FSTATS_PAGE_SIZE}&page=1&season={str(FSTATS_ANNO)}%2F{str(FSTATS_ANNO+1)[-2:]}&ordering="
 
 # Scraping
 RUOLI = ["Portieri", "Difensori", "Centrocampisti", "Attaccanti"]
-MAX_WORKERS = 5
+MAX_WORKERS = 5  # thread di rete: scaricano le pagine giocatore senza analizzarle
+# Processi che analizzano l'HTML scaricato (default: tutti i core) e pagine che possono
+# attendere il parsing prima che i thread di rete si fermino
+PARSE_WORKERS = int(os.getenv("SCRAPE_PARSE_WORKERS", "0")) or os.cpu_count() or 1
+PARSE_QUEUE_SIZE = 64
+# Pausa di cortesia prima di ogni pagina giocatore (ms, estremi inclusi) e tra le pagine dei ruoli
+POLITE_DELAY_MS = tuple(int(v) for v in os.getenv("SCRAPE_POLITE_DELAY_MS", "1000,8000").split(","))
+ROLE_PAUSE_S = float(os.getenv("SCRAPE_ROLE_PAUSE_S", "1"))
+MAX_RETRIES = 3
+RETRY_BACKOFF_S = 2.0
+RETRY_MAX_WAIT_S = 60.0
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# Timeout di ogni richiesta HTTP (connessione, attesa tra un byte e l'altro della risposta) e
+# tempo massimo dello scraping FPEDIA (0 = nessun limite): allo scadere si salva quanto scaricato
+# e le pagine mancanti si riprendono al prossimo avvio dal checkpoint
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("SCRAPE_CONNECT_TIMEOUT_S", "10"))
+HTTP_READ_TIMEOUT_S = float(os.getenv("SCRAPE_READ_TIMEOUT_S", "30"))
+SCRAPE_DEADLINE_S = float(os.getenv("SCRAPE_DEADLINE_S", "1800"))
+# Giocatori FPEDIA già scaricati (una riga JSON ciascuno), scritti man mano: il file esiste finché
+# lo scraping non è completo; uno più vecchio di SCRAPE_CHECKPOINT_MAX_AGE_H ore si scarta
+GIOCATORI_CHECKPOINT_FILE = os.path.join(DATA_DIR, "_giocatori.checkpoint.jsonl")
+SCRAPE_CHECKPOINT_MAX_AGE_H = float(os.getenv("SCRAPE_CHECKPOINT_MAX_AGE_H", "24"))
+# Ordine di scraping FPEDIA (scrape_priority): peso di quotazione e FVM (percentile nel ruolo) e
+# dell'anzianità del dato (0-1, piena dopo SCRAPE_STALE_AFTER_H ore o se la pagina non era stata
+# scaricata); "copertura" penalizza i ruoli di cui è già in lista una quota maggiore
+SCRAPE_PRIORITY_WEIGHTS = {"quotazione": 0.6, "fantavoto": 0.3, "anzianita": 0.1, "copertura": 1.0}
+SCRAPE_STALE_AFTER_H = 24.0
+FPEDIA_TELEMETRY_FILE = os.path.join(OUTPUT_DIR, "scrape_telemetry_fpedia.json")
+FSTATS_TELEMETRY_FILE = os.path.join(OUTPUT_DIR, "scrape_telemetry_FSTATS.json")
+# Cache dei download condivisa tra esecuzioni e directory di lavoro dello stesso utente
+# (lock di file per risorsa): una copia più vecchia di DOWNLOAD_CACHE_MAX_AGE_H ore si riscarica
+DOWNLOAD_CACHE_ENABLED = os.getenv("DOWNLOAD_CACHE", "1") != "0"
+DOWNLOAD_CACHE_DIR = os.getenv("DOWNLOAD_CACHE_DIR") or os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "fantacalcio", "downloads"
+)
+DOWNLOAD_CACHE_MAX_AGE_H = float(os.getenv("DOWNLOAD_CACHE_MAX_AGE_H", "24"))
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 }
 
+# Pipeline
+PIPELINE_MAX_WORKERS = 4
+STAGE_CACHE_ENABLED = True
+STAGE_CACHE_DIR = os.path.join(DATA_DIR, "cache", "stages")
+# Punteggi incrementali: si ricalcolano solo i giocatori con input cambiati dall'ultima esecuzione
+INCREMENTAL_SCORING = os.getenv("INCREMENTAL_SCORING", "1") != "0"
+INCREMENTAL_STATE_DIR = os.path.join(DATA_DIR, "cache", "incremental")
+INCREMENTAL_MAX_CHANGED = 0.5  # oltre questa frazione di righe cambiate conviene il ricalcolo completo
+# Verifica ogni risultato incrementale contro il ricalcolo completo (lento, per controlli)
+INCREMENTAL_PARITY_CHECK = os.getenv("INCREMENTAL_PARITY_CHECK", "0") == "1"
+
+# Proiezioni della prossima stagione: regolarizzazione ridge (feature standardizzate) e righe
+# minime per stimare un ruolo da solo (altrimenti si usano i dati di tutti i ruoli)
+PROJECTION_RIDGE = 1.0
+PROJECTION_MIN_ROWS = 20
+
+# Strumentazione (attivabile con `cli.py --trace`)
+TRACE_ENABLED = False
+TRACE_REPORT_FILE = os.path.join(OUTPUT_DIR, "trace_report.json")
+TRACE_FILE = os.path.join(OUTPUT_DIR, "trace.json")
+
+# CLI
+CLI_IMPORT_BUDGET_MS = 50
+
+# Benchmark
+BENCHMARK_RESULTS_FILE = os.path.join(DATA_DIR, "benchmarks", "results.jsonl")
+BENCHMARK_REGRESSION_THRESHOLD = 0.15
+
+# API HTTP locale
+API_HOST = "127.0.0.1"
+API_PORT = 8000
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+API_RELOAD_INTERVAL = 2.0
+API_RESPONSE_CACHE_SIZE = 256
+
+# Mock server FPEDIA/FSTATS per test di carico offline del retriever
+MOCK_HOST = "127.0.0.1"
+MOCK_PORT = 8800
+MOCK_USERNAME = "mock@example.com"
+MOCK_PASSWORD = "mock"
+
+# Storico delle quotazioni (uno snapshot per data, solo righe cambiate)
+QUOTAZIONI_HISTORY_DIR = os.path.join(DATA_DIR, "history", "quotazioni")
+QUOTAZIONI_TREND_WINDOW = 4
+
+# Ricerca giocatori simili (feature standardizzate per ruolo)
+SIMILARITY_INDEX_FILE = os.path.join(OUTPUT_DIR, "similarity_index.npz")
+SIMILARITY_FEATURES = (
+    "fanta_avg", "xgFromOpenPlays", "xA", "goals", "assists", "presences", "Punteggio", "quotazione_attuale",
+)
+
+# Modalità batch multi-lega (`cli.py batch`)
+LEAGUES_FILE = os.path.join(DATA_DIR, "leagues.json")
+LEAGUES_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "leghe")
+# Budget a cui si riferiscono le quotazioni ufficiali: i prezzi sono scalati sul budget della lega
+BUDGET_STANDARD = 500
+LEAGUE_DEFAULT_ROSA = {"P": 3, "D": 8, "C": 8, "A": 6}
+LEAGUE_DEFAULT_RIPARTIZIONE = {"P": 0.08, "D": 0.17, "C": 0.30, "A": 0.45}
+LEAGUE_DEFAULT_PESI = {"Score_Affare": 0.5, "Valore_su_Prezzo": 0.3, "Convenienza Potenziale": 0.2}
+# Indice (valore/prezzo) da cui la rosa consigliata ricava il valore dei giocatori: moltiplicato per
+# la quotazione, è massimizzato entro il budget di ogni ruolo
+LEAGUE_ROSTER_INDEX = "Indice_Aggiustato"
+
+# Override locali delle costanti ({"NOME": valore}), applicati da `run` e ricaricati da `watch`.
+# Valgono per le costanti lette durante l'esecuzione, non per quelle derivate (es. OUTPUT_DIR da DATA_DIR)
+CONFIG_OVERRIDES_FILE = os.path.join(DATA_DIR, "config_overrides.json")
+
+# Modalità watch (`cli.py watch`): intervallo di polling dei file di input in secondi
+WATCH_INTERVAL = 0.5
+
+# Risultati condivisi (file colonnare mappato in memoria dai lettori in altri processi).
+# CURRENT punta all'ultima versione; si conservano le ultime SHARED_RESULTS_KEEP
+SHARED_RESULTS_DIR = os.path.join(OUTPUT_DIR, "shared")
+SHARED_RESULTS_CURRENT = os.path.join(SHARED_RESULTS_DIR, "CURRENT")
+SHARED_RESULTS_KEEP = 3
+
+# Simulatore d'asta (`cli.py simulate`): squadre-bot, aste per esecuzione e processi (0 = tutti i core).
+# Il rumore (deviazione del logaritmo) rende diverse le valutazioni dei bot da un'asta all'altra
+SIMULATION_STRATEGIES = ("score_affare", "stars_and_scrubs", "balanced", "listino")
+SIMULATION_TEAMS = 8
+SIMULATION_AUCTIONS = 1000
+SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", "0")) or os.cpu_count() or 1
+SIMULATION_NOISE = 0.15
+
+# Snapshot delle classifiche di ogni esecuzione per `cli.py diff` (uno per classifica e lega)
+RUN_SNAPSHOT_DIR = os.path.join(DATA_DIR, "history", "runs")
+RUN_SNAPSHOT_RANKS = ("Score_Affare",)
+RUN_SNAPSHOT_KEEP = 50
+RUN_DIFF_MIN_RANK_MOVE = 5
+
+# Formule di punteggio personalizzate ({"fpedia"|"FSTATS"|"unificato": {"nome": "espressione"}},
+# più "skills" per i pesi delle skills): sostituiscono o si aggiungono a quelle di scoring_formulas
+SCORING_FORMULAS_FILE = os.path.join(DATA_DIR, "scoring_formulas.json")
+
 # Costanti per il calcolo della convenienza
 PESO_FANTAMEDIA = 0.6
 PESO_PUNTEGGIO = 0.4
 PREZZO_MINIMO = 1
 PREZZO_MASSIMO = 500
 CONVENIENZA_MINIMA = 0.5
+
+
+# Valori originali delle costanti sovrascritte da apply_overrides
+_DEFAULTS = {}
+
+
+def apply_overrides(path: str | None = None) -> dict:
+    """
+    Applica gli override di CONFIG_OVERRIDES_FILE e ripristina i valori originali delle
+    costanti non più presenti nel file. Ritorna gli override attivi; ValueError se il file
+    non è valido o nomina una costante inesistente.
+    """
+    import json
+
+    path = path or CONFIG_OVERRIDES_FILE
+    overrides = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as fp:
+            overrides = json.load(fp)
+        if not isinstance(overrides, dict):
+            raise ValueError(f"{path}: atteso un oggetto JSON {{\"NOME\": valore}}")
+
+    module = globals()
+    unknown = [n for n in overrides if not n.isupper() or n.startswith("_") or n not in module]
+    if unknown:
+        raise ValueError(f"{path}: costanti sconosciute {unknown}")
+    for name in [n for n in _DEFAULTS if n not in overrides]:
+        module[name] = _DEFAULTS.pop(name)
+    for name, value in overrides.items():
+        default = _DEFAULTS.setdefault(name, module[name])
+        # In JSON le tuple diventano liste
+        module[name] = tuple(value) if isinstance(default, tuple) and isinstance(value, list) else value
+    return overrides
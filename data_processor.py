@@ -3,15 +3,15 @@ import pandas as pd
 from loguru import logger
 import config
 import os
-import re
+from instrumentation import traced
 
 
-def load_dataframes() -> tuple[pd.DataFrame, pd.DataFrame]:
+@traced
+def load_fpedia_dataframe() -> pd.DataFrame:
     """
-    Loads the two CSV files into pandas DataFrames, handling missing or empty files.
+    Loads the FPEDIA CSV file into a pandas DataFrame, handling missing or empty files.
     """
     df_fpedia = pd.DataFrame()
-    df_FSTATS = pd.DataFrame()
 
     if (
         os.path.exists(config.GIOCATORI_CSV)
@@ -25,6 +25,16 @@ def load_dataframes() -> tuple[pd.DataFrame, pd.DataFrame]:
     else:
         logger.warning(f"{config.GIOCATORI_CSV} not found or is empty.")
 
+    return df_fpedia
+
+
+@traced
+def load_FSTATS_dataframe() -> pd.DataFrame:
+    """
+    Loads the FSTATS CSV file into a pandas DataFrame, handling missing or empty files.
+    """
+    df_FSTATS = pd.DataFrame()
+
     if os.path.exists(config.PLAYERS_CSV) and os.path.getsize(config.PLAYERS_CSV) > 0:
         try:
             df_FSTATS = pd.read_csv(config.PLAYERS_CSV, sep=";", encoding="utf-8")
@@ -34,9 +44,17 @@ def load_dataframes() -> tuple[pd.DataFrame, pd.DataFrame]:
     else:
         logger.warning(f"{config.PLAYERS_CSV} not found or is empty.")
 
-    return df_fpedia, df_FSTATS
+    return df_FSTATS
+
+
+def load_dataframes() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Loads the two CSV files into pandas DataFrames, handling missing or empty files.
+    """
+    return load_fpedia_dataframe(), load_FSTATS_dataframe()
 
 
+@traced
 def process_fpedia_data(df: pd.DataFrame) -> pd.DataFrame:
     """
     Processes and cleans the DataFrame from FPEDIA.
@@ -81,6 +99,7 @@ def process_fpedia_data(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+@traced
 def process_FSTATS_data(df: pd.DataFrame) -> pd.DataFrame:
     """
     Processes and cleans the DataFrame from FSTATS.
@@ -92,31 +111,6 @@ def process_FSTATS_data(df: pd.DataFrame) -> pd.DataFrame:
 
     logger.debug("Processing FSTATS data...")
 
-    # FIX: Correggi il formato delle squadre PRIMA di tutto
-    def fix_team_format(team_value):
-        """Estrae il nome della squadra dal formato JSON"""
-        if pd.isna(team_value):
-            return ""
-        
-        team_str = str(team_value)
-        
-        # Se è già una stringa normale
-        if not '{' in team_str:
-            return team_str.capitalize()
-        
-        # Se è un dizionario come stringa, estrai il nome
-        match = re.search(r"'name':\s*'([^']+)'", team_str)
-        if match:
-            team_name = match.group(1)
-            # Capitalizza correttamente
-            return team_name.capitalize()
-        
-        # Se è un vero dizionario
-        if isinstance(team_value, dict) and 'name' in team_value:
-            return team_value['name'].capitalize()
-        
-        return str(team_value)
-
     # Rename columns for clarity and consistency
     rename_map = {
         "name": "Nome",
@@ -128,9 +122,15 @@ def process_FSTATS_data(df: pd.DataFrame) -> pd.DataFrame:
     }
     df = df.rename(columns=rename_map)
     
-    # FIX SQUADRE SUBITO DOPO IL RENAME
     if 'Squadra' in df.columns:
-        df['Squadra'] = df['Squadra'].apply(fix_team_format)
+        squadra = df['Squadra'].astype(object)
+        # I CSV scaricati prima dello streaming hanno la squadra come dict serializzato
+        # ("{'id': 8, 'name': 'inter'}"): si ripara solo su quelle righe
+        legacy = squadra.notna() & squadra.astype(str).str.contains("{", regex=False)
+        if legacy.any():
+            testo = squadra[legacy].astype(str)
+            squadra[legacy] = testo.str.extract(r"'name':\s*'([^']+)'", expand=False).fillna(testo)
+        df['Squadra'] = squadra.fillna("").astype(str).str.capitalize()
         logger.debug(f"Fixed team formats. Example teams: {df['Squadra'].head(5).tolist()}")
 
     numeric_cols = [
@@ -1,4 +1,5 @@
 # data_retriever.py
+import json
 import os
 import time
 from random import randint
@@ -7,94 +8,328 @@ from bs4 import BeautifulSoup
 from tqdm import tqdm
 from loguru import logger
 from dotenv import load_dotenv
-import pandas as pd
 import concurrent.futures
+import multiprocessing
+import queue
+import threading
 
 import config
+import download_cache
+import json_stream
+import scrape_priority
+import scraped_rows
+from instrumentation import traced
+from scraper_telemetry import ScrapeTelemetry, classify_error
 
 load_dotenv()
 
 
-def get_giocatori_urls() -> list:
+def _new_stats() -> dict:
+    return {"status": None, "size": 0, "latency_s": 0.0, "delay_s": 0.0, "network_s": 0.0, "parse_s": 0.0, "retries": 0, "throttled": 0}
+
+
+class ScrapeDeadline:
+    """Scadenza globale di uno scraping; con `seconds` <= 0 non scade mai."""
+
+    def __init__(self, seconds: float):
+        self.at = time.monotonic() + seconds if seconds > 0 else None
+
+    def remaining(self) -> float | None:
+        """Secondi rimasti (0 se scaduta), None se non c'è limite."""
+        return None if self.at is None else max(self.at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.at is not None and time.monotonic() >= self.at
+
+    def allows(self, seconds: float) -> bool:
+        """Vero se un'attesa di `seconds` finisce prima della scadenza."""
+        return self.at is None or time.monotonic() + seconds < self.at
+
+
+def _timeouts(deadline: ScrapeDeadline | None) -> tuple[float, float]:
+    """(connessione, lettura) per requests, mai oltre la scadenza dello scraping."""
+    connect, read = config.HTTP_CONNECT_TIMEOUT_S, config.HTTP_READ_TIMEOUT_S
+    remaining = deadline.remaining() if deadline is not None else None
+    if remaining is not None:
+        connect, read = max(min(connect, remaining), 0.01), max(min(read, remaining), 0.01)
+    return connect, read
+
+
+def _retry_wait(response, attempt: int) -> float:
+    """Attesa prima del retry: rispetta Retry-After se presente, altrimenti backoff esponenziale."""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), config.RETRY_MAX_WAIT_S)
+        except ValueError:
+            pass
+    return min(config.RETRY_BACKOFF_S * (2 ** attempt), config.RETRY_MAX_WAIT_S)
+
+
+def _http_request(method: str, url: str, stats: dict, deadline: ScrapeDeadline | None = None,
+                  **kwargs) -> requests.Response:
+    """
+    Esegue una richiesta HTTP con retry su 429/5xx ed errori di connessione,
+    aggiornando `stats` (status, byte, latenza, tempo di rete, backoff, retry).
+    Ogni tentativo ha i timeout di config (HTTP_CONNECT_TIMEOUT_S, HTTP_READ_TIMEOUT_S), ridotti
+    al tempo che resta prima di `deadline`; un retry che finirebbe oltre la scadenza non si fa.
+    Con `stream=True` il corpo non viene letto: `size` è quello dichiarato dal server
+    e va aggiornato dal chiamante con i byte effettivamente consumati.
+    """
+    streaming = kwargs.get("stream", False)
+    timeout = kwargs.pop("timeout", None)
+    while True:
+        if deadline is not None and deadline.expired():
+            raise requests.exceptions.Timeout(f"Scadenza dello scraping raggiunta prima di {url}")
+        started = time.perf_counter()
+        failure = None
+        try:
+            response = requests.request(method, url, timeout=timeout or _timeouts(deadline), **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            response, failure = None, e
+
+        stats["latency_s"] = time.perf_counter() - started
+        stats["network_s"] += stats["latency_s"]
+        if response is not None:
+            stats["status"] = response.status_code
+            if streaming:
+                stats["size"] = int(response.headers.get("Content-Length") or 0)
+            else:
+                stats["size"] = len(response.content)
+            if response.status_code == 429:
+                stats["throttled"] += 1
+
+        retryable = response is None or response.status_code in config.RETRY_STATUS
+        if retryable and stats["retries"] < config.MAX_RETRIES:
+            wait = _retry_wait(response, stats["retries"])
+            if deadline is None or deadline.allows(wait):
+                if response is not None and streaming:
+                    response.close()
+                logger.debug(f"Retry {stats['retries'] + 1}/{config.MAX_RETRIES} per {url} tra {wait:.1f}s")
+                time.sleep(wait)
+                stats["delay_s"] += wait
+                stats["retries"] += 1
+                continue
+
+        if failure is not None:
+            raise failure
+        response.raise_for_status()
+        return response
+
+
+@traced
+def get_giocatori_urls(telemetry: ScrapeTelemetry | None = None, deadline: ScrapeDeadline | None = None) -> list:
     """Scrapes FPEDIA to get all player URLs."""
-    giocatori_urls = []
+    with download_cache.resource("giocatori_urls", config.GIOCATORI_URLS_FILE, config.FPEDIA_URL) as download:
+        if not download.ready:
+            _scrape_giocatori_urls(download.path, telemetry, deadline)
+        else:
+            logger.debug("Reading player URLs from cache.")
     if not os.path.exists(config.GIOCATORI_URLS_FILE):
-        logger.debug("Scraping player URLs from FPEDIA...")
-        
-        # Aggiungiamo un counter per vedere quanti giocatori per ruolo
-        stats_per_ruolo = {}
+        return []
+    with open(config.GIOCATORI_URLS_FILE, "r", encoding="utf-8") as fp:
+        giocatori_urls = fp.readlines()
+    return [url.strip() for url in giocatori_urls]
+
+
+def _scrape_giocatori_urls(path: str, telemetry: ScrapeTelemetry | None, deadline: ScrapeDeadline | None = None):
+    """Scarica le liste dei ruoli e scrive gli URL dei giocatori in `path` (nulla se non ne trova)."""
+    giocatori_urls = []
+    logger.debug("Scraping player URLs from FPEDIA...")
+    
+    # Aggiungiamo un counter per vedere quanti giocatori per ruolo
+    stats_per_ruolo = {}
+    
+    for ruolo in config.RUOLI:  # Rimuoviamo tqdm qui per vedere meglio cosa succede
+        url = config.FPEDIA_URL + ruolo.lower() + "/"
+        logger.info(f"Scraping ruolo: {ruolo} - URL: {url}")
         
-        for ruolo in config.RUOLI:  # Rimuoviamo tqdm qui per vedere meglio cosa succede
-            url = config.FPEDIA_URL + ruolo.lower() + "/"
-            logger.info(f"Scraping ruolo: {ruolo} - URL: {url}")
+        stats = _new_stats()
+        error = None
+        try:
+            response = _http_request("GET", url, stats, deadline, headers=config.HEADERS)
+            parse_started = time.perf_counter()
+            soup = BeautifulSoup(response.content, "html.parser")
             
-            try:
-                response = requests.get(url, headers=config.HEADERS)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.content, "html.parser")
-                
-                # Contiamo quanti articoli troviamo
-                articles = soup.find_all("article")
-                logger.info(f"Trovati {len(articles)} articoli per {ruolo}")
-                
-                ruolo_urls = []
-                for giocatore in articles:
-                    link = giocatore.find("a")
-                    if link:
-                        calciatore_url = link.get("href")
-                        if calciatore_url:
-                            giocatori_urls.append(calciatore_url)
-                            ruolo_urls.append(calciatore_url)
-                    else:
-                        logger.debug(f"Nessun link trovato in un articolo per {ruolo}")
-                
-                stats_per_ruolo[ruolo] = len(ruolo_urls)
-                logger.info(f"Aggiunti {len(ruolo_urls)} giocatori per {ruolo}")
-                
-                # Piccola pausa tra un ruolo e l'altro per non sovraccaricare il server
-                time.sleep(1)
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Failed to retrieve URLs for role '{ruolo}': {e}")
-                continue
-            except Exception as e:
-                logger.error(f"Unexpected error for role '{ruolo}': {e}")
-                continue
-        
-        # Mostriamo il riepilogo
-        logger.info(f"Riepilogo giocatori per ruolo: {stats_per_ruolo}")
-        logger.info(f"Totale giocatori trovati: {len(giocatori_urls)}")
-
-        if not giocatori_urls:
-            logger.warning(
-                "No player URLs were scraped from FPEDIA. "
-                "The website structure may have changed, or the request was blocked."
-            )
-        else:
-            # Salviamo il file
-            with open(config.GIOCATORI_URLS_FILE, "w", encoding="utf-8") as fp:
-                for item in giocatori_urls:
-                    fp.write(f"{item}\n")
-            logger.info(f"{len(giocatori_urls)} player URLs saved to {config.GIOCATORI_URLS_FILE}")
+            # Contiamo quanti articoli troviamo
+            articles = soup.find_all("article")
+            logger.info(f"Trovati {len(articles)} articoli per {ruolo}")
+            
+            ruolo_urls = []
+            for giocatore in articles:
+                link = giocatore.find("a")
+                if link:
+                    calciatore_url = link.get("href")
+                    if calciatore_url:
+                        giocatori_urls.append(calciatore_url)
+                        ruolo_urls.append(calciatore_url)
+                else:
+                    logger.debug(f"Nessun link trovato in un articolo per {ruolo}")
+            stats["parse_s"] = time.perf_counter() - parse_started
+            
+            stats_per_ruolo[ruolo] = len(ruolo_urls)
+            logger.info(f"Aggiunti {len(ruolo_urls)} giocatori per {ruolo}")
+            
+            # Piccola pausa tra un ruolo e l'altro per non sovraccaricare il server
+            time.sleep(config.ROLE_PAUSE_S)
+            stats["delay_s"] += config.ROLE_PAUSE_S
+            
+        except requests.exceptions.RequestException as e:
+            error = classify_error(e, stats["status"])
+            logger.error(f"Failed to retrieve URLs for role '{ruolo}': {e}")
+            continue
+        except Exception as e:
+            error = classify_error(e, stats["status"])
+            logger.error(f"Unexpected error for role '{ruolo}': {e}")
+            continue
+        finally:
+            if telemetry is not None:
+                telemetry.record("lista_ruolo", url, error=error, **stats)
+    
+    # Mostriamo il riepilogo
+    logger.info(f"Riepilogo giocatori per ruolo: {stats_per_ruolo}")
+    logger.info(f"Totale giocatori trovati: {len(giocatori_urls)}")
+
+    if not giocatori_urls:
+        logger.warning(
+            "No player URLs were scraped from FPEDIA. "
+            "The website structure may have changed, or the request was blocked."
+        )
     else:
-        logger.debug("Reading player URLs from cache.")
-        with open(config.GIOCATORI_URLS_FILE, "r", encoding="utf-8") as fp:
-            giocatori_urls = fp.readlines()
-    return [url.strip() for url in giocatori_urls]
+        # Salviamo il file
+        with open(path, "w", encoding="utf-8") as fp:
+            for item in giocatori_urls:
+                fp.write(f"{item}\n")
+        logger.info(f"{len(giocatori_urls)} player URLs saved to {config.GIOCATORI_URLS_FILE}")
 
 
-def get_attributi_giocatore(url: str) -> dict:
-    """Scrapes a single player's page on FPEDIA for their attributes."""
+def _scarica_pagina_giocatore(url: str, stats: dict, deadline: ScrapeDeadline | None = None) -> bytes:
+    """Stadio di rete: pausa di cortesia e download della pagina di un giocatore (nessun parsing)."""
     logger.debug(f"Scraping attributes for player from URL: {url}")
-    time.sleep(randint(1000, 8000) / 1000)
+    delay = randint(*config.POLITE_DELAY_MS) / 1000
+    remaining = deadline.remaining() if deadline is not None else None
+    if remaining is not None:
+        delay = min(delay, remaining)
+    time.sleep(delay)
+    stats["delay_s"] += delay
+    return _http_request("GET", url, stats, deadline).content
+
+
+def get_attributi_giocatore(url: str, telemetry: ScrapeTelemetry | None = None,
+                            deadline: ScrapeDeadline | None = None) -> dict:
+    """
+    Scrapes a single player's page on FPEDIA for their attributes: stessi stadi di
+    `iter_attributi_giocatori` (download con scadenza, poi `_parse_attributi_timed`), senza pool.
+    """
+    url = url.strip()
+    stats = _new_stats()
+    error = None
+    try:
+        attributi, stats["parse_s"] = _parse_attributi_timed(_scarica_pagina_giocatore(url, stats, deadline))
+        return attributi
+    except Exception as e:
+        error = classify_error(e, stats["status"])
+        raise
+    finally:
+        if telemetry is not None:
+            telemetry.record("giocatore", url, error=error, **stats)
+
+
+def _parse_attributi_timed(content: bytes) -> tuple[dict, float]:
+    """Eseguita nei processi di parsing: attributi e secondi di CPU spesi a estrarli."""
+    parse_started = time.perf_counter()
+    attributi = _parse_attributi(content)
+    return attributi, time.perf_counter() - parse_started
+
+
+def iter_attributi_giocatori(urls: list, telemetry: ScrapeTelemetry | None = None,
+                             deadline: ScrapeDeadline | None = None):
+    """
+    Scarica e analizza le pagine dei giocatori in due stadi separati e genera
+    (url, attributi | None, errore | None) in ordine di completamento.
+    Allo scadere di `deadline` non parte nessun nuovo download: si generano ancora le pagine
+    già in volo (i timeout delle richieste ne limitano la durata) e le altre restano escluse.
+
+    I thread di rete (config.MAX_WORKERS) scaricano solo i byte; il parsing avviene in un
+    pool di processi (config.PARSE_WORKERS), così BeautifulSoup non contende il GIL ai
+    download. Al più config.PARSE_QUEUE_SIZE pagine attendono o sono in parsing: se i
+    parser restano indietro i thread di rete si fermano invece di accumulare HTML in memoria.
+    """
+    results = queue.Queue()
+    slots = threading.BoundedSemaphore(config.PARSE_QUEUE_SIZE)
+    # "spawn": i processi non ereditano lo stato (thread, lock) del processo che fa scraping
+    parsers = concurrent.futures.ProcessPoolExecutor(
+        max_workers=config.PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+    )
+
+    def parsed(url, stats, future):
+        slots.release()
+        error = None
+        attributi = None
+        try:
+            attributi, stats["parse_s"] = future.result()
+        except Exception as e:
+            error = e
+        if telemetry is not None:
+            telemetry.record("giocatore", url, error=classify_error(error, None) if error else None, **stats)
+        results.put((url, attributi, error))
+
+    def download(url):
+        if deadline is not None and deadline.expired():
+            return
+        stats = _new_stats()
+        try:
+            content = _scarica_pagina_giocatore(url, stats, deadline)
+        except Exception as e:
+            if deadline is not None and deadline.expired():
+                # Interrotta dalla scadenza: non è un errore della pagina, si riprova alla ripresa
+                return
+            if telemetry is not None:
+                telemetry.record("giocatore", url, error=classify_error(e, stats["status"]), **stats)
+            results.put((url, None, e))
+            return
+        slots.acquire()
+        try:
+            future = parsers.submit(_parse_attributi_timed, content)
+        except Exception as e:
+            slots.release()
+            results.put((url, None, e))
+            return
+        future.add_done_callback(lambda f: parsed(url, stats, f))
+
+    urls = [url.strip() for url in urls]
+    network = concurrent.futures.ThreadPoolExecutor(max_workers=config.MAX_WORKERS)
+    expired = False
+    try:
+        for url in urls:
+            network.submit(download, url)
+        for _ in urls:
+            try:
+                yield results.get(timeout=deadline.remaining() if deadline is not None else None)
+            except queue.Empty:
+                expired = True
+                break
+    finally:
+        network.shutdown(wait=True, cancel_futures=True)
+        # Alla scadenza le pagine già scaricate (al più PARSE_QUEUE_SIZE) si analizzano comunque
+        parsers.shutdown(wait=True, cancel_futures=not expired)
+    # Pagine completate mentre le richieste in volo terminavano
+    while expired and not results.empty():
+        yield results.get_nowait()
+
+
+def _parse_attributi(content: bytes) -> dict:
+    """
+    Parses the HTML of a player's page into a dict of attributes.
+    Numeric values are converted here (see `scraped_rows.number`), so the builder stores them as is.
+    """
     attributi = dict()
-    html = requests.get(url.strip())
-    soup = BeautifulSoup(html.content, "html.parser")
+    soup = BeautifulSoup(content, "html.parser")
 
     attributi["Nome"] = soup.select_one("h1").get_text().strip()
 
     selettore = "div.col_one_fourth:nth-of-type(1) span.stickdan"
-    attributi["Punteggio"] = soup.select_one(selettore).text.strip().replace("/100", "")
+    attributi["Punteggio"] = scraped_rows.number(soup.select_one(selettore).text.replace("/100", ""))
 
     selettore = "	div.col_one_fourth:nth-of-type(n+2) div"
     medie = [el.find("span").text.strip() for el in soup.select(selettore)]
@@ -103,7 +338,7 @@ def get_attributi_giocatore(url: str) -> dict:
     ]
     i = 0
     for anno in anni:
-        attributi[f"Fantamedia anno {anno}"] = medie[i]
+        attributi[f"Fantamedia anno {anno}"] = scraped_rows.number(medie[i])
         i += 1
 
     selettore = "div.col_one_third:nth-of-type(2) div"
@@ -111,7 +346,7 @@ def get_attributi_giocatore(url: str) -> dict:
     parametri = [
         el.text.strip().replace(":", "") for el in stats_ultimo_anno.find_all("strong")
     ]
-    valori = [el.text.strip() for el in stats_ultimo_anno.find_all("span")]
+    valori = [scraped_rows.number(el.text) for el in stats_ultimo_anno.find_all("span")]
     attributi.update(dict(zip(parametri, valori)))
 
     selettore = ".col_one_third.col_last div"
@@ -119,7 +354,7 @@ def get_attributi_giocatore(url: str) -> dict:
     parametri = [
         el.text.strip().replace(":", "") for el in stats_previste.find_all("strong")
     ]
-    valori = [el.text.strip() for el in stats_previste.find_all("span")]
+    valori = [scraped_rows.number(el.text) for el in stats_previste.find_all("span")]
     attributi.update(dict(zip(parametri, valori)))
 
     selettore = ".label12 span.label"
@@ -132,11 +367,11 @@ def get_attributi_giocatore(url: str) -> dict:
 
     selettore = "div.progress-percent"
     investimento = soup.select(selettore)[2]
-    attributi["Buon investimento"] = investimento.text.replace("%", "")
+    attributi["Buon investimento"] = scraped_rows.number(investimento.text.replace("%", ""))
 
     selettore = "div.progress-percent"
     investimento = soup.select(selettore)[3]
-    attributi["Resistenza infortuni"] = investimento.text.replace("%", "")
+    attributi["Resistenza infortuni"] = scraped_rows.number(investimento.text.replace("%", ""))
 
     selettore = "img.inf_calc"
     try:
@@ -183,47 +418,160 @@ def get_attributi_giocatore(url: str) -> dict:
 
     selettore = "div.col_one_fourth:nth-of-type(2) span.rouge"
     presenze_attuali = soup.select_one(selettore).text
-    attributi["Presenze campionato corrente"] = presenze_attuali
+    attributi["Presenze campionato corrente"] = scraped_rows.number(presenze_attuali)
 
     return attributi
 
 
+class _Checkpoint:
+    """
+    Giocatori FPEDIA già scaricati, una riga JSON ciascuno (url e attributi) dopo un'intestazione
+    con stagione e sorgente. Ogni riga è scritta appena pronta: uno scraping interrotto o scaduto
+    riparte da qui invece che da zero.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header = {"anno": config.ANNO_CORRENTE, "source": config.FPEDIA_URL}
+        self._fp = None
+
+    def load(self) -> dict[str, dict]:
+        """Attributi per URL; un checkpoint di un'altra stagione o sorgente, o troppo vecchio, si scarta."""
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as fp:
+            lines = fp.read().splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else None
+        except ValueError:
+            header = None
+        age_h = (time.time() - os.path.getmtime(self.path)) / 3600
+        if header != self.header or age_h > config.SCRAPE_CHECKPOINT_MAX_AGE_H:
+            logger.info(f"Checkpoint FPEDIA non valido o scaduto, riparto da zero: {self.path}")
+            self.remove()
+            return {}
+        rows = {}
+        for line in lines[1:]:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                # Ultima riga scritta a metà da un'interruzione
+                continue
+            rows[row["url"]] = row["attributi"]
+        return rows
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        truncated = False
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, "rb") as fp:
+                fp.seek(-1, os.SEEK_END)
+                truncated = fp.read(1) != b"\n"
+        self._fp = open(self.path, "a", encoding="utf-8")
+        if self._fp.tell() == 0:
+            self._fp.write(json.dumps(self.header) + "\n")
+        elif truncated:
+            # Si chiude la riga lasciata a metà, che `load` poi ignora
+            self._fp.write("\n")
+        self._fp.flush()
+        return self
+
+    def append(self, url: str, attributi: dict) -> None:
+        self._fp.write(json.dumps({"url": url, "attributi": attributi}, ensure_ascii=False) + "\n")
+        self._fp.flush()
+
+    def __exit__(self, *exc):
+        self._fp.close()
+        self._fp = None
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+@traced
 def scrape_fpedia():
     """
     Orchestrates the scraping of FPEDIA.
     Fetches all player URLs and then scrapes each player's page for their attributes in parallel.
-    Saves the data to a CSV file.
+    Saves the data to a CSV file. If a previous scrape was interrupted or hit
+    config.SCRAPE_DEADLINE_S, its checkpoint is resumed even when a (partial) CSV exists.
     """
-    if os.path.exists(config.GIOCATORI_CSV):
-        logger.debug(f"{config.GIOCATORI_CSV} already exists. Skipping scraping.")
-        return
-
-    urls = get_giocatori_urls()
-    giocatori = []
+    checkpoint = _Checkpoint(config.GIOCATORI_CHECKPOINT_FILE)
+    # Lock sul checkpoint: due esecuzioni nella stessa directory non riprendono (né accodano
+    # allo stesso checkpoint) in parallelo; la seconda attende e poi ricontrolla lo stato
+    with download_cache.file_lock(f"{checkpoint.path}.lock", description="giocatori (checkpoint)"):
+        resume = os.path.exists(checkpoint.path)
+        if os.path.exists(config.GIOCATORI_CSV) and not resume:
+            logger.debug(f"{config.GIOCATORI_CSV} already exists. Skipping scraping.")
+            return
+
+        if resume:
+            # Si completa il CSV locale: la cache condivisa riceve solo scraping fatti in un colpo
+            with download_cache.atomic_target(config.GIOCATORI_CSV) as tmp:
+                complete = _scrape_fpedia(tmp, checkpoint)
+        else:
+            # Lock sulla risorsa condivisa: con più esecuzioni in parallelo scarica una sola
+            with download_cache.resource("giocatori", config.GIOCATORI_CSV, config.FPEDIA_URL) as download:
+                if download.ready:
+                    return
+                complete = _scrape_fpedia(download.path, checkpoint)
+                # Un dataset parziale resta locale, altrimenti altre esecuzioni lo prenderebbero per completo
+                download.shared = complete
+        if complete:
+            checkpoint.remove()
+
+
+def _scrape_fpedia(path: str, checkpoint: _Checkpoint) -> bool:
+    """
+    Scarica le pagine non ancora nel checkpoint e scrive in `path` il CSV di tutti i giocatori
+    ottenuti. Ritorna False se la scadenza ha lasciato pagine da scaricare.
+    """
+    deadline = ScrapeDeadline(config.SCRAPE_DEADLINE_S)
+    telemetry = ScrapeTelemetry("fpedia")
+    urls = get_giocatori_urls(telemetry, deadline)
+    # Righe accumulate per colonna, già tipizzate: niente lista di dict da convertire alla fine
+    giocatori = scraped_rows.TypedColumnBuilder(scraped_rows.fpedia_schema())
+    listed = set(urls)
+    done = {url: attributi for url, attributi in checkpoint.load().items() if url in listed}
+    for attributi in done.values():
+        giocatori.append(attributi)
+    # Prima le pagine più utili all'asta: uno scraping a tempo lascia fuori solo le meno rilevanti
+    todo = scrape_priority.order([url for url in urls if url not in done])
+    if done:
+        logger.info(f"♻️ Ripresa dal checkpoint: {len(done)} giocatori già scaricati, {len(todo)} da scaricare")
     logger.debug("Scraping individual player data from website...")
 
-    with concurrent.futures.ThreadPoolExecutor(
-        max_workers=config.MAX_WORKERS
-    ) as executor:
-        future_to_url = {
-            executor.submit(get_attributi_giocatore, url): url for url in urls
-        }
-        for future in tqdm(
-            concurrent.futures.as_completed(future_to_url), total=len(urls)
-        ):
-            url = future_to_url[future]
-            try:
-                attributi = future.result()
-                if attributi:
-                    giocatori.append(attributi)
-            except Exception as exc:
+    logger.debug(
+        f"Network: {config.MAX_WORKERS} thread, parsing: {config.PARSE_WORKERS} processi "
+        f"(coda massima {config.PARSE_QUEUE_SIZE} pagine), scadenza {config.SCRAPE_DEADLINE_S:.0f}s"
+    )
+    attempted = 0
+    with checkpoint:
+        for url, attributi, exc in tqdm(iter_attributi_giocatori(todo, telemetry, deadline), total=len(todo)):
+            attempted += 1
+            if exc is not None:
                 logger.error(f"{url} generated an exception: {exc}")
-
-    df = pd.DataFrame(giocatori)
-    df.to_csv(config.GIOCATORI_CSV, index=False, encoding="utf-8")
+            elif attributi:
+                giocatori.append(attributi)
+                checkpoint.append(url, attributi)
+
+    complete = attempted == len(todo)
+    if not complete:
+        logger.warning(
+            f"⏰ Scadenza dello scraping ({config.SCRAPE_DEADLINE_S:.0f}s): salvati {len(giocatori)} giocatori, "
+            f"{len(todo) - attempted} pagine si riprendono dal checkpoint al prossimo avvio"
+        )
+    if giocatori.overflow:
+        logger.info(f"Campi FPEDIA non previsti dallo schema: {', '.join(giocatori.overflow)}")
+    df = giocatori.to_frame()
+    df.to_csv(path, index=False, encoding="utf-8")
     logger.debug("FPEDIA data saved to CSV.")
+    telemetry.write(config.FPEDIA_TELEMETRY_FILE)
+    return complete
 
 
+@traced
 def fetch_FSTATS_data():
     """
     Logs into FSTATS, fetches player data from the API,
@@ -233,38 +581,80 @@ def fetch_FSTATS_data():
         logger.debug(f"{config.PLAYERS_CSV} already exists. Skipping download.")
         return
 
-    user = os.getenv("FSTATS_MAIL")
-    password = os.getenv("FSTATS_PASSWORD")
+    with download_cache.resource("players", config.PLAYERS_CSV, config.FSTATS_PLAYERS_URL) as download:
+        if download.ready:
+            return
 
-    if not user or not password:
-        logger.error("FSTATS credentials not found in .env file. Skipping download.")
-        return
+        user = os.getenv("FSTATS_MAIL")
+        password = os.getenv("FSTATS_PASSWORD")
+
+        if not user or not password:
+            logger.error("FSTATS credentials not found in .env file. Skipping download.")
+            return
+
+        telemetry = ScrapeTelemetry("FSTATS")
+        try:
+            _download_FSTATS(user, password, telemetry, download.path)
+        finally:
+            telemetry.write(config.FSTATS_TELEMETRY_FILE)
 
+
+def _download_FSTATS(user: str, password: str, telemetry: ScrapeTelemetry, path: str):
     # 1. Login and get token
     logger.debug("Logging into FSTATS...")
     login_payload = {"username": user, "password": password}
     headers = {"content-type": "application/json"}
+    stats = _new_stats()
+    error = None
     try:
-        response = requests.post(
-            config.FSTATS_LOGIN_URL, json=login_payload, headers=headers
+        response = _http_request(
+            "POST", config.FSTATS_LOGIN_URL, stats, json=login_payload, headers=headers
         )
-        response.raise_for_status()
         token = response.json()["access_token"]
         logger.debug("Login successful.")
     except requests.exceptions.RequestException as e:
+        error = classify_error(e, stats["status"])
         logger.error(f"FSTATS login failed: {e}")
         return
+    finally:
+        telemetry.record("login", config.FSTATS_LOGIN_URL, error=error, **stats)
 
-    # 2. Fetch player data
+    # 2. Fetch player data, seguendo la paginazione (`next`) se presente.
+    # Ogni pagina è letta in streaming e appiattita in colonne tipizzate (team -> team, team_id):
+    # niente dict annidati serializzati nel CSV né payload completo in memoria.
     logger.debug("Fetching player data from FSTATS API...")
     auth_headers = {"authorization": f"Bearer {token}"}
-    try:
-        response = requests.get(config.FSTATS_PLAYERS_URL, headers=auth_headers)
-        response.raise_for_status()
-        players_data = response.json()["results"]
-
-        df = pd.DataFrame(players_data)
-        df.to_csv(config.PLAYERS_CSV, index=False, sep=";", encoding="utf-8")
-        logger.debug("FSTATS data saved to CSV.")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"FSTATS data fetch failed: {e}")
\ No newline at end of file
+    columns = scraped_rows.TypedColumnBuilder(scraped_rows.fstats_schema())
+    url = config.FSTATS_PLAYERS_URL
+    while url:
+        page_url, url = url, None
+        stats = _new_stats()
+        error = None
+        try:
+            response = _http_request("GET", page_url, stats, headers=auth_headers, stream=True)
+            # Download del corpo e parsing sono intercalati: parse_s comprende entrambi
+            parse_started = time.perf_counter()
+            fields = {}
+            received = [0]
+
+            def chunks():
+                for chunk in response.iter_content(chunk_size=config.FSTATS_STREAM_CHUNK_SIZE):
+                    received[0] += len(chunk)
+                    yield chunk
+
+            with response:
+                for player in json_stream.stream_items(chunks(), "results", fields):
+                    columns.append(json_stream.flatten_record(player))
+            stats["size"] = received[0]
+            stats["parse_s"] = time.perf_counter() - parse_started
+            url = fields.get("next")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            error = classify_error(e, stats["status"])
+            logger.error(f"FSTATS data fetch failed: {e}")
+            return
+        finally:
+            telemetry.record("giocatori", page_url, error=error, **stats)
+
+    df = columns.to_frame()
+    df.to_csv(path, index=False, sep=";", encoding="utf-8")
+    logger.debug(f"FSTATS data saved to CSV ({len(df)} players).")
@@ -2,6 +2,8 @@
 import pandas as pd
 from loguru import logger
 import config
+import scoring_formulas
+from instrumentation import traced
 
 
 def normalize_roles(df: pd.DataFrame) -> pd.DataFrame:
@@ -34,74 +36,31 @@ def normalize_roles(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def calculate_adjusted_index(row: pd.Series) -> float:
+def adjusted_index_frame(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Calcola un indice aggiustato che bilancia meglio i ruoli.
+    Aggiunge Indice_Aggiustato e gli altri indici delle formule del gruppo "unificato"
+    (scoring_formulas), calcolati su tutte le righe insieme (usato anche dal ricalcolo incrementale).
     """
-    base_index = row.get('Indice_Unificato', 0)
-    if pd.isna(base_index) or base_index is None:
-        base_index = 0
-    
-    ruolo = row.get('Ruolo', '')
-    quotazione = row.get('quotazione_attuale', 10)
-    if pd.isna(quotazione) or quotazione is None:
-        quotazione = 10
-    
-    # FIX: Gestisci correttamente le presenze che potrebbero essere None
-    presenze = row.get('Presenze campionato corrente', 0)
-    if pd.isna(presenze) or presenze is None:
-        presenze = 0
-    
-    # AGGIUSTAMENTO AGGRESSIVO PER RUOLO
-    # I portieri hanno dinamiche diverse, quindi vanno valutati separatamente
-    if ruolo == 'P':
-        # Penalizzazione forte per i portieri nell'indice generale
-        base_index = base_index * 0.4  # Riduzione del 60%
-        
-        # Bonus solo per portieri titolari certi
-        if presenze > 15:
-            base_index = base_index * 1.2
-    
-    # Bonus per giocatori di movimento con quotazioni medio-alte
-    if ruolo in ['D', 'C', 'A']:
-        if quotazione > 10 and quotazione <= 20:
-            base_index = base_index * 1.1
-        elif quotazione > 20 and quotazione <= 30:
-            base_index = base_index * 1.15
-        elif quotazione > 30:
-            base_index = base_index * 1.2
-        
-        # Bonus per attaccanti e centrocampisti prolifici
-        goals = row.get('goals', 0)
-        if pd.isna(goals) or goals is None:
-            goals = 0
-        
-        assists = row.get('assists', 0)
-        if pd.isna(assists) or assists is None:
-            assists = 0
-        
-        if ruolo == 'A' and goals > 10:
-            base_index = base_index * 1.2
-        elif ruolo == 'C' and (goals > 5 or assists > 5):
-            base_index = base_index * 1.15
-        elif ruolo == 'D' and goals > 2:
-            base_index = base_index * 1.1
-    
-    # Bonus per giocatori con dati completi e affidabili
-    if row.get('Fonte_Dati') == 'Entrambe':
-        base_index = base_index * 1.1
-    
-    # Bonus per titolari certi (tante presenze)
-    if presenze > 20:
-        base_index = base_index * 1.05
-    
-    return base_index
+    return df.assign(**scoring_formulas.evaluate("unificato", df))
+
 
+def merge_key(df: pd.DataFrame, cognome_primo: bool) -> pd.Series:
+    """Chiave cognome + squadra (minuscoli) con cui si abbinano i giocatori delle due fonti."""
+    posizione = 0 if cognome_primo else -1
+    cognome = df['Nome'].apply(
+        lambda x: x.split()[posizione].lower() if pd.notna(x) and ' ' in x else str(x).lower()
+    )
+    return cognome + '_' + df['Squadra'].str.lower().str.strip()
 
-def create_unified_dataset_improved(df_fpedia: pd.DataFrame, df_fstats: pd.DataFrame) -> pd.DataFrame:
+
+@traced
+def create_unified_dataset_improved(df_fpedia: pd.DataFrame, df_fstats: pd.DataFrame,
+                                    adjusted_index=None) -> pd.DataFrame:
     """
     Versione corretta dell'unificazione che elimina davvero i duplicati.
     Usa cognome + squadra per il matching e rimuove duplicati finali.
+    `adjusted_index` (DataFrame -> DataFrame con le colonne delle formule "unificato") sostituisce
+    `adjusted_index_frame` nel calcolo di Indice_Aggiustato, es. con una versione incrementale.
     """
     if df_fpedia.empty and df_fstats.empty:
         logger.warning("Entrambi i DataFrame sono vuoti")
@@ -122,25 +81,10 @@ def create_unified_dataset_improved(df_fpedia: pd.DataFrame, df_fstats: pd.DataF
     if df_fstats.empty:
         return df_fpedia
     
-    # APPROCCIO SEMPLIFICATO: Usa Nome e Squadra per il merge
-    # Prima assicurati che le squadre siano comparabili
-    df_fpedia['Squadra_norm'] = df_fpedia['Squadra'].str.lower().str.strip()
-    df_fstats['Squadra_norm'] = df_fstats['Squadra'].str.lower().str.strip()
-    
-    # Crea chiave di merge basata su cognome + squadra
-    # Per FPEDIA (formato: COGNOME NOME)
-    df_fpedia['cognome'] = df_fpedia['Nome'].apply(
-        lambda x: x.split()[0].lower() if pd.notna(x) and ' ' in x else str(x).lower()
-    )
-    
-    # Per FSTATS (formato: Nome Cognome)
-    df_fstats['cognome'] = df_fstats['Nome'].apply(
-        lambda x: x.split()[-1].lower() if pd.notna(x) and ' ' in x else str(x).lower()
-    )
-    
-    # Crea chiave di merge
-    df_fpedia['merge_key'] = df_fpedia['cognome'] + '_' + df_fpedia['Squadra_norm']
-    df_fstats['merge_key'] = df_fstats['cognome'] + '_' + df_fstats['Squadra_norm']
+    # APPROCCIO SEMPLIFICATO: Usa cognome e squadra per il merge
+    # FPEDIA ha il formato COGNOME NOME, FSTATS Nome Cognome
+    df_fpedia['merge_key'] = merge_key(df_fpedia, cognome_primo=True)
+    df_fstats['merge_key'] = merge_key(df_fstats, cognome_primo=False)
     
     # Log per debug
     logger.info(f"Chiavi merge FPEDIA esempio: {df_fpedia['merge_key'].head(5).tolist()}")
@@ -185,7 +129,7 @@ def create_unified_dataset_improved(df_fpedia: pd.DataFrame, df_fstats: pd.DataF
     
     # Aggiungi colonne mancanti a df_fstats_only
     for col in df_fpedia.columns:
-        if col not in df_fstats_only.columns and col not in ['merge_key', 'cognome', 'Squadra_norm']:
+        if col not in df_fstats_only.columns and col != 'merge_key':
             df_fstats_only[col] = None
     
     # STEP 4: Concatena tutti i DataFrame
@@ -200,7 +144,7 @@ def create_unified_dataset_improved(df_fpedia: pd.DataFrame, df_fstats: pd.DataF
     df_unified = pd.concat(frames_to_concat, ignore_index=True)
     
     # Rimuovi colonne temporanee
-    cols_to_drop = ['merge_key', 'cognome', 'Squadra_norm']
+    cols_to_drop = ['merge_key']
     df_unified = df_unified.drop(columns=[c for c in cols_to_drop if c in df_unified.columns])
     
     # Calcola gli indici
@@ -232,7 +176,9 @@ def create_unified_dataset_improved(df_fpedia: pd.DataFrame, df_fstats: pd.DataF
         df_unified.loc[mask_fstats, 'Indice_Unificato'] = fanta_avg_fstats / quota_fstats * 100
     
     # Calcola gli altri indici
-    df_unified['Indice_Aggiustato'] = df_unified.apply(calculate_adjusted_index, axis=1)
+    scored = (adjusted_index or adjusted_index_frame)(df_unified)
+    for column in scoring_formulas.load_formulas().outputs("unificato"):
+        df_unified[column] = scored[column].to_numpy()
     
     df_unified['Affidabilita_Dati'] = 50
     df_unified.loc[df_unified['Fonte_Dati'] == 'Entrambe', 'Affidabilita_Dati'] += 30
@@ -274,6 +220,7 @@ def create_unified_dataset_improved(df_fpedia: pd.DataFrame, df_fstats: pd.DataF
     return df_unified
 
 
+@traced
 def save_unified_excel_improved(df_unified: pd.DataFrame, output_path: str):
     """
     Salva il file Excel unificato con sheet ottimizzati e classifiche bilanciate.
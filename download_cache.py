@@ -0,0 +1,163 @@
+# download_cache.py - Cache dei download condivisa tra esecuzioni e processi dello stesso utente
+# Esecuzioni diverse (leghe in directory di lavoro diverse, anche in contemporanea) scaricano gli
+# stessi file: lista URL FPEDIA, _giocatori.csv e _players.csv. Ogni risorsa ha una copia in una
+# cache a livello utente protetta da un lock di file: il primo processo scarica, gli altri attendono
+# il lock e poi copiano il risultato, quindi c'è un solo download in corso per risorsa. Ogni
+# scrittura (nella cache e nella copia locale) passa da un file temporaneo e os.replace: nessun
+# lettore vede mai un file scritto a metà.
+import contextlib
+import hashlib
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+
+from loguru import logger
+
+import config
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+def _lock(fp, blocking: bool) -> bool:
+    if os.name == "nt":
+        fp.seek(0)
+        try:
+            msvcrt.locking(fp.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+        while True:
+            # LK_LOCK rinuncia dopo 10 tentativi in 10 secondi: si riprova finché serve
+            try:
+                msvcrt.locking(fp.fileno(), msvcrt.LK_LOCK, 1)
+                return True
+            except OSError:
+                continue
+    try:
+        fcntl.flock(fp.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        return True
+    except BlockingIOError:
+        return False
+
+
+def _unlock(fp):
+    if os.name == "nt":
+        fp.seek(0)
+        msvcrt.locking(fp.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def file_lock(path: str, description: str = ""):
+    """
+    Lock esclusivo tra processi su `path`. Il sistema operativo lo rilascia anche se il processo
+    termina senza uscire dal blocco, quindi non restano lock orfani.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+b") as fp:
+        if not _lock(fp, blocking=False):
+            logger.info(f"⏳ {description or path}: download in corso in un altro processo, attendo...")
+            started = time.perf_counter()
+            _lock(fp, blocking=True)
+            logger.debug(f"{description or path}: lock ottenuto dopo {time.perf_counter() - started:.1f} s")
+        try:
+            yield
+        finally:
+            _unlock(fp)
+
+
+def _temp_path(path: str) -> str:
+    # Nome unico per processo e thread, nella stessa directory: os.replace resta atomico
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+@contextlib.contextmanager
+def atomic_target(path: str):
+    """
+    Percorso temporaneo da scrivere al posto di `path`: all'uscita senza errori, se è stato
+    scritto, sostituisce `path` in modo atomico; altrimenti viene eliminato.
+    """
+    tmp = _temp_path(path)
+    try:
+        yield tmp
+        if os.path.exists(tmp):
+            os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def atomic_copy(source: str, destination: str):
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    with atomic_target(destination) as tmp:
+        shutil.copyfile(source, tmp)
+
+
+def entry_path(name: str, local_path: str, source: str) -> str:
+    """File della cache per una risorsa: nome leggibile più l'impronta di sorgente e stagione."""
+    digest = hashlib.sha256(f"{name}\0{source}\0{config.ANNO_CORRENTE}".encode("utf-8")).hexdigest()[:16]
+    extension = os.path.splitext(local_path)[1]
+    return os.path.join(config.DOWNLOAD_CACHE_DIR, f"{name}-{digest}{extension}")
+
+
+def _is_fresh(path: str) -> bool:
+    if not os.path.exists(path):
+        return False
+    return time.time() - os.path.getmtime(path) < config.DOWNLOAD_CACHE_MAX_AGE_H * 3600
+
+
+@dataclass
+class Download:
+    """
+    Esito di `resource`: `ready` se il file locale è già pronto, altrimenti va scritto `path`.
+    Con `shared` falso (es. dati parziali) il file scritto va solo nel percorso locale.
+    """
+    path: str
+    ready: bool
+    shared: bool = True
+
+
+@contextlib.contextmanager
+def resource(name: str, local_path: str, source: str):
+    """
+    Coordina il download di una risorsa salvata in `local_path` (`source` è l'URL di origine).
+    Se il file locale esiste, o la cache ne ha una copia recente, `ready` è vero e non c'è nulla
+    da scaricare. Altrimenti il chiamante scrive `path` mentre tiene il lock della risorsa:
+    all'uscita il file va nella cache e da lì nel percorso locale, entrambi in modo atomico.
+    Se il chiamante non scrive nulla (download fallito), nessuno dei due file viene toccato.
+    """
+    if os.path.exists(local_path):
+        yield Download(local_path, True)
+        return
+    if not config.DOWNLOAD_CACHE_ENABLED:
+        with atomic_target(local_path) as tmp:
+            yield Download(tmp, False)
+        return
+
+    entry = entry_path(name, local_path, source)
+    with file_lock(f"{entry}.lock", description=name):
+        # Ricontrollo sotto lock: un altro processo può aver appena completato lo stesso download
+        if _is_fresh(entry):
+            atomic_copy(entry, local_path)
+            logger.info(f"♻️ {name}: copiato dalla cache condivisa ({entry})")
+            yield Download(local_path, True)
+            return
+        with atomic_target(entry) as tmp:
+            download = Download(tmp, False)
+            yield download
+            written = os.path.exists(tmp)
+            if written and not download.shared:
+                # Solo copia locale: la cache resta com'era
+                atomic_copy(tmp, local_path)
+                os.remove(tmp)
+                written = False
+        if written:
+            atomic_copy(entry, local_path)
+            logger.debug(f"{name}: salvato nella cache condivisa ({entry})")
@@ -0,0 +1,185 @@
+# incremental_scoring.py - Ricalcolo dei punteggi limitato alle righe cambiate
+# Dopo un aggiornamento settimanale delle quotazioni cambia il prezzo di pochi giocatori, ma
+# le funzioni di punteggio lavorano riga per riga su tutto il DataFrame. Un RowScorer conserva
+# su disco input e colonne calcolate dell'esecuzione precedente, indicizzati per giocatore,
+# e alla successiva passa alla funzione solo le righe nuove o con almeno un input diverso.
+import os
+import pickle
+
+import pandas as pd
+from loguru import logger
+
+import config
+import stage_cache
+
+
+class RowScorer:
+    """
+    Applica `func` (DataFrame -> DataFrame con le stesse righe e nuove colonne di punteggio)
+    in modo incrementale. `func` deve essere riga-locale: il punteggio di un giocatore dipende
+    solo dalla sua riga e dai valori globali calcolati da `normalizers` (nome -> funzione
+    DataFrame -> scalare). Se uno di questi cambia, o cambiano colonne, codice o chiavi,
+    si ricalcola tutto.
+    """
+
+    def __init__(self, name: str, func, key: tuple, normalizers: dict | None = None,
+                 state_dir: str | None = None):
+        self.name = name
+        self.func = func
+        self.key = tuple(key)
+        self.normalizers = normalizers or {}
+        self.state_dir = state_dir
+        # Esito dell'ultima chiamata (per log, benchmark e verifica di parità)
+        self.last_run = {}
+
+    def __call__(self, df: pd.DataFrame) -> pd.DataFrame:
+        if not config.INCREMENTAL_SCORING or df.empty:
+            return self.func(df)
+
+        # calcola_convenienza_fpedia aggiunge le colonne al DataFrame in input: si conserva una copia
+        df = df.copy()
+        keys = self._keys(df)
+        normalizers = {name: _scalar(f(df)) for name, f in self.normalizers.items()}
+        state = self._load()
+        reason = self._full_reason(df, keys, normalizers, state)
+        if reason:
+            result = self.func(df.copy())
+            self.last_run = {"mode": "full", "reason": reason, "rows": len(df), "changed": len(df)}
+            logger.debug(f"Punteggi '{self.name}': ricalcolo completo ({reason})")
+            self._save(df, keys, normalizers, result)
+            return result
+
+        inputs = df.set_axis(keys)
+        changed, by_column = _changed_rows(inputs, state["inputs"])
+        if changed.sum() > len(df) * config.INCREMENTAL_MAX_CHANGED:
+            result = self.func(df.copy())
+            self.last_run = {"mode": "full", "reason": "troppe righe cambiate", "rows": len(df),
+                             "changed": int(changed.sum()), "by_column": by_column}
+            self._save(df, keys, normalizers, result)
+            return result
+
+        scores = state["scores"].reindex(keys)
+        if changed.any():
+            # Indice ricostruito 0..n-1: alcune funzioni fanno merge e riallineano per posizione
+            partial = self.func(df[changed.to_numpy()].reset_index(drop=True))
+            scores.loc[changed.to_numpy()] = partial[list(scores.columns)].to_numpy()
+        result = df.copy()
+        for column in scores.columns:
+            result[column] = scores[column].to_numpy().astype(state["scores"][column].dtype, copy=False)
+
+        self.last_run = {"mode": "incremental", "rows": len(df), "changed": int(changed.sum()), "by_column": by_column}
+        logger.info(
+            f"Punteggi '{self.name}': ricalcolate {int(changed.sum())}/{len(df)} righe"
+            + (f" ({', '.join(f'{c}: {n}' for c, n in by_column.items())})" if by_column else "")
+        )
+        if config.INCREMENTAL_PARITY_CHECK:
+            result = check_parity(self, result, df)
+        self._save(df, keys, normalizers, result)
+        return result
+
+    @property
+    def path(self) -> str:
+        # Risolto a ogni uso: DATA_DIR può essere cambiata dopo l'import (benchmark, test)
+        return os.path.join(self.state_dir or config.INCREMENTAL_STATE_DIR, f"{self.name}.pkl")
+
+    def _keys(self, df: pd.DataFrame) -> pd.Index:
+        if not all(k in df.columns for k in self.key):
+            return pd.Index([])
+        if len(self.key) == 1:
+            return pd.Index(df[self.key[0]].astype(str))
+        return pd.MultiIndex.from_frame(df[list(self.key)].astype(str))
+
+    def _full_reason(self, df, keys, normalizers, state) -> str | None:
+        if len(keys) != len(df):
+            return f"colonne chiave mancanti {self.key}"
+        if not keys.is_unique:
+            return "chiavi duplicate"
+        if state is None:
+            return "nessuno stato precedente"
+        if state["code"] != stage_cache.code_digest():
+            return "codice cambiato"
+        if list(state["inputs"].columns) != list(df.columns):
+            return "colonne di input cambiate"
+        shifted = [n for n, v in normalizers.items() if state["normalizers"].get(n) != v]
+        if shifted:
+            return f"normalizzatori cambiati: {', '.join(shifted)}"
+        return None
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as fp:
+                return pickle.load(fp)
+        except Exception as e:
+            logger.warning(f"Stato incrementale '{self.name}' illeggibile, ricalcolo completo: {e}")
+            return None
+
+    def _save(self, df, keys, normalizers, result) -> None:
+        score_columns = [c for c in result.columns if c not in df.columns]
+        if len(result) != len(df) or len(keys) != len(df) or not keys.is_unique:
+            # La funzione ha aggiunto o tolto righe (es. nomi duplicati): niente stato incrementale
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        state = {
+            "code": stage_cache.code_digest(),
+            "normalizers": normalizers,
+            "inputs": df.set_axis(keys),
+            "scores": result[score_columns].set_axis(keys),
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "wb") as fp:
+                pickle.dump(state, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Impossibile salvare lo stato incrementale '{self.name}': {e}")
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _scalar(value):
+    """Valore confrontabile tra esecuzioni: NaN diventa None, gli scalari numpy tipi Python."""
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def _changed_rows(current: pd.DataFrame, previous: pd.DataFrame) -> tuple[pd.Series, dict]:
+    """Righe nuove o con almeno una colonna diversa (NaN == NaN) e numero di modifiche per colonna."""
+    is_new = ~current.index.isin(previous.index)
+    previous = previous.reindex(current.index)
+    changed = is_new.copy()
+    by_column = {}
+    # Confronto su array numpy: le righe sono già allineate per chiave
+    for column in current.columns:
+        a, b = current[column].to_numpy(), previous[column].to_numpy()
+        differs = ~((a == b) | (pd.isna(a) & pd.isna(b))) & ~is_new
+        n = int(differs.sum())
+        if n:
+            by_column[column] = n
+            changed |= differs
+    if is_new.any():
+        by_column["(nuovi)"] = int(is_new.sum())
+    return pd.Series(changed, index=current.index), by_column
+
+
+def check_parity(scorer: RowScorer, incremental: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Confronta un risultato incrementale con il ricalcolo completo sullo stesso input:
+    se differiscono lo segnala e ritorna il ricalcolo completo.
+    """
+    full = scorer.func(df.copy())
+    try:
+        pd.testing.assert_frame_equal(incremental, full)
+    except AssertionError as e:
+        logger.error(f"Punteggi '{scorer.name}': incrementale diverso dal ricalcolo completo, uso quest'ultimo: {e}")
+        scorer.last_run["parity"] = False
+        return full
+    logger.info(f"Punteggi '{scorer.name}': parità con il ricalcolo completo verificata")
+    scorer.last_run["parity"] = True
+    return incremental
@@ -0,0 +1,209 @@
+# instrumentation.py - Eventi strutturati per stage con export JSON e trace file
+# Disattivata di default: quando non è abilitata, `span` e `traced` costano un solo controllo.
+# Il trace è nel formato "Trace Event" apribile con chrome://tracing o https://ui.perfetto.dev.
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from loguru import logger
+
+import config
+
+_lock = threading.Lock()
+_events: list[dict] = []
+_enabled = False
+# Picchi di memoria degli span aperti (uno per span, in ordine di apertura)
+_open_peaks: list[list[int]] = []
+_origin = 0.0
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable() -> None:
+    global _enabled, _origin
+    with _lock:
+        _events.clear()
+        _origin = time.perf_counter()
+        _enabled = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def events() -> list[dict]:
+    with _lock:
+        return list(_events)
+
+
+def describe(value):
+    """Righe e colonne di un DataFrame (o di ogni DataFrame in una tupla/lista)."""
+    shape = getattr(value, "shape", None)
+    if shape is not None and len(shape) == 2:
+        return {"rows": int(shape[0]), "columns": int(shape[1])}
+    if isinstance(value, (tuple, list)):
+        described = [describe(v) for v in value]
+        return [d for d in described if d is not None] or None
+    return None
+
+
+@contextmanager
+def span(name: str, category: str = "stage", inputs=None):
+    """
+    Misura un blocco: tempo reale, tempo CPU del thread, delta del picco di memoria
+    (tracemalloc) e forma di input/output. Il chiamante può impostare
+    `event["outputs"]` sull'evento restituito.
+
+    Il picco di tracemalloc è uno solo per processo: a ogni apertura di span viene azzerato
+    dopo averlo riportato in tutti gli span aperti, così ogni span ha il proprio picco e quello
+    di uno span figlio confluisce nel padre. Per stage eseguiti in parallelo include le
+    allocazioni degli stage sovrapposti.
+    """
+    if not _enabled:
+        yield {}
+        return
+
+    frame = [0]
+    with _lock:
+        mem_start = 0
+        if tracemalloc.is_tracing():
+            mem_start, peak = tracemalloc.get_traced_memory()
+            for open_peak in _open_peaks:
+                open_peak[0] = max(open_peak[0], peak)
+            tracemalloc.reset_peak()
+        _open_peaks.append(frame)
+
+    thread = threading.current_thread()
+    event = {
+        "name": name,
+        "category": category,
+        "thread": thread.name,
+        "tid": threading.get_ident(),
+        "inputs": describe(inputs),
+        "outputs": None,
+    }
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield event
+    except Exception as exc:
+        event["error"] = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        wall_end = time.perf_counter()
+        event["start_s"] = wall_start - _origin
+        event["wall_s"] = wall_end - wall_start
+        event["cpu_s"] = time.thread_time() - cpu_start
+        with _lock:
+            peak = max(frame[0], tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0)
+            _open_peaks[:] = [open_peak for open_peak in _open_peaks if open_peak is not frame]
+            for open_peak in _open_peaks:
+                open_peak[0] = max(open_peak[0], peak)
+            event["peak_mem_delta_mb"] = max(0, peak - mem_start) / 1024 / 1024
+            _events.append(event)
+
+
+def traced(func=None, *, name: str | None = None, category: str = "function"):
+    """Decoratore per le funzioni dei moduli: registra uno span con input e output."""
+    def decorator(f):
+        label = name or f"{f.__module__}.{f.__name__}"
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return f(*args, **kwargs)
+            with span(label, category, inputs=args) as event:
+                result = f(*args, **kwargs)
+                event["outputs"] = describe(result)
+                return result
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
+
+
+def build_report() -> dict:
+    """Report JSON: eventi in ordine di inizio più un riepilogo per nome."""
+    recorded = sorted(events(), key=lambda e: e["start_s"])
+    summary = {}
+    for e in recorded:
+        s = summary.setdefault(e["name"], {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_mem_delta_mb": 0.0})
+        s["calls"] += 1
+        s["wall_s"] += e["wall_s"]
+        s["cpu_s"] += e["cpu_s"]
+        s["peak_mem_delta_mb"] = max(s["peak_mem_delta_mb"], e["peak_mem_delta_mb"])
+    slowest = sorted(
+        (n for n in summary if n != "pipeline"), key=lambda n: summary[n]["wall_s"], reverse=True
+    )
+    return {"events": recorded, "summary": summary, "slowest": slowest[:5]}
+
+
+def build_trace() -> dict:
+    """Eventi nel formato Trace Event ("X" = evento completo, tempi in microsecondi)."""
+    pid = os.getpid()
+    trace_events = []
+    threads = {}
+    for e in events():
+        threads[e["tid"]] = e["thread"]
+        trace_events.append({
+            "name": e["name"],
+            "cat": e["category"],
+            "ph": "X",
+            "ts": round(e["start_s"] * 1e6, 1),
+            "dur": round(e["wall_s"] * 1e6, 1),
+            "pid": pid,
+            "tid": e["tid"],
+            "args": {
+                "cpu_ms": round(e["cpu_s"] * 1000, 2),
+                "peak_mem_delta_mb": round(e["peak_mem_delta_mb"], 2),
+                "inputs": e["inputs"],
+                "outputs": e["outputs"],
+                **({"error": e["error"]} if "error" in e else {}),
+            },
+        })
+    for tid, thread_name in threads.items():
+        trace_events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def write_outputs(report_path: str = config.TRACE_REPORT_FILE, trace_path: str = config.TRACE_FILE) -> None:
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    report = build_report()
+    with open(report_path, "w", encoding="utf-8") as fp:
+        json.dump(report, fp, indent=2, ensure_ascii=False)
+    with open(trace_path, "w", encoding="utf-8") as fp:
+        json.dump(build_trace(), fp)
+
+    logger.info(f"Report strumentazione salvato in: {report_path}")
+    logger.info(f"Trace salvato in: {trace_path} (aprire con chrome://tracing o ui.perfetto.dev)")
+    for name in report["slowest"]:
+        s = report["summary"][name]
+        logger.info(f"  {name}: {s['wall_s']:.2f}s wall, {s['cpu_s']:.2f}s CPU, +{s['peak_mem_delta_mb']:.1f} MB")
+
+
+@contextmanager
+def tracing(enabled: bool | None = None):
+    """Abilita la strumentazione per un'esecuzione e scrive report e trace alla fine."""
+    if enabled is None:
+        enabled = config.TRACE_ENABLED
+    if not enabled:
+        yield
+        return
+
+    enable()
+    try:
+        with span("pipeline", category="pipeline"):
+            yield
+    finally:
+        write_outputs()
+        disable()
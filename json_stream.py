@@ -0,0 +1,117 @@
+# json_stream.py - Lettura incrementale di risposte JSON di grandi dimensioni
+# Una risposta come {"count": ..., "next": ..., "results": [{...}, ...]} viene letta a pezzi:
+# gli elementi dell'array indicato sono decodificati uno alla volta con `raw_decode`, appiattiti
+# e accodati a colonne, senza mai tenere in memoria il documento intero né la lista di dict.
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+class _Buffer:
+    """Testo decodificato ancora da consumare, riempito a richiesta dai pezzi in ingresso."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self.text += self._decode(b"", final=True)
+            self.eof = True
+            return False
+        self.text += self._decode(chunk) if isinstance(chunk, bytes) else chunk
+        return True
+
+    def peek(self) -> str:
+        """Primo carattere non di spaziatura ("" a fine input)."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if self.eof or not self.fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"JSON non valido: atteso uno tra {chars!r}, trovato {char or 'fine input'!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.fill()
+                continue
+            # Un numero a fine buffer potrebbe continuare nel pezzo successivo
+            if end == len(self.text) and not self.eof:
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def stream_items(chunks, key: str, fields: dict | None = None):
+    """
+    Genera uno alla volta gli elementi dell'array `key` di un oggetto JSON ricevuto in
+    `chunks` (bytes o str). Gli altri campi di primo livello (es. "next") finiscono in `fields`
+    man mano che vengono letti: sono completi solo quando il generatore è esaurito.
+    """
+    fields = fields if fields is not None else {}
+    buffer = _Buffer(chunks)
+    buffer.expect("{")
+    if buffer.peek() == "}":
+        buffer.pos += 1
+        return
+    while True:
+        name = buffer.value()
+        buffer.expect(":")
+        if name == key and buffer.peek() == "[":
+            buffer.pos += 1
+            if buffer.peek() == "]":
+                buffer.pos += 1
+            else:
+                while True:
+                    yield buffer.value()
+                    if buffer.expect(",]") == "]":
+                        break
+        else:
+            fields[name] = buffer.value()
+        if buffer.expect(",}") == "}":
+            return
+
+
+def flatten_record(record: dict) -> dict:
+    """
+    Appiattisce un oggetto: i dict annidati diventano colonne `campo_sottocampo` e, se hanno
+    un "name", il campo stesso vale il nome (es. team -> team="inter", team_id=8). Le liste e
+    gli oggetti più profondi restano serializzati in JSON.
+    """
+    flat = {}
+    for name, value in record.items():
+        if isinstance(value, dict):
+            for sub, sub_value in value.items():
+                if sub == "name":
+                    flat[name] = sub_value
+                else:
+                    flat[f"{name}_{sub}"] = json.dumps(sub_value) if isinstance(sub_value, (dict, list)) else sub_value
+        elif isinstance(value, list):
+            flat[name] = json.dumps(value)
+        else:
+            flat[name] = value
+    return flat
@@ -0,0 +1,217 @@
+# league_batch.py - Classifiche e report per più leghe (Classic e Mantra) in una sola esecuzione
+# I dati sorgente sono caricati e puliti una volta sola dalla pipeline; merge con le quotazioni,
+# punteggi e dataset unificato sono calcolati una volta per formato e condivisi dalle leghe
+# di quel formato. Per ogni lega restano solo operazioni vettoriali leggere.
+import json
+import os
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+import config
+import main
+import projections
+import report_writer
+import run_snapshots
+from quotazioni_loader import COLONNE_FORMATO
+
+# Stage della pipeline condivisi da tutte le leghe
+SHARED_STAGES = ("process_fpedia", "process_FSTATS", "quotazioni")
+RUOLI = ("P", "D", "C", "A")
+
+
+@dataclass
+class League:
+    """
+    Configurazione di una lega.
+
+    rosa: giocatori per ruolo; ripartizione: quota del budget per ruolo;
+    pesi: colonne del dataset unificato combinate nello Score_Lega. Anche in Mantra
+    rosa e ripartizione usano i macro-ruoli P/D/C/A (il ruolo Mantra è riportato nei report).
+    """
+    nome: str
+    formato: str = "classic"
+    budget: int = config.BUDGET_STANDARD
+    rosa: dict = field(default_factory=lambda: dict(config.LEAGUE_DEFAULT_ROSA))
+    ripartizione: dict = field(default_factory=lambda: dict(config.LEAGUE_DEFAULT_RIPARTIZIONE))
+    pesi: dict = field(default_factory=lambda: dict(config.LEAGUE_DEFAULT_PESI))
+
+    def __post_init__(self):
+        self.formato = self.formato.lower()
+        if self.formato not in COLONNE_FORMATO:
+            raise ValueError(f"Lega '{self.nome}': formato non valido {self.formato!r}")
+        if self.budget <= 0:
+            raise ValueError(f"Lega '{self.nome}': il budget deve essere positivo")
+        for nome_campo in ("rosa", "ripartizione"):
+            valori = getattr(self, nome_campo)
+            sconosciuti = set(valori) - set(RUOLI)
+            if sconosciuti:
+                raise ValueError(f"Lega '{self.nome}': ruoli non validi in {nome_campo}: {sorted(sconosciuti)}")
+        if not self.rosa:
+            raise ValueError(f"Lega '{self.nome}': la rosa deve avere almeno un ruolo")
+        non_validi = {r: n for r, n in self.rosa.items() if isinstance(n, bool) or not isinstance(n, int) or n <= 0}
+        if non_validi:
+            raise ValueError(f"Lega '{self.nome}': i posti in rosa devono essere interi positivi: {non_validi}")
+        if not self.pesi or sum(self.pesi.values()) <= 0:
+            raise ValueError(f"Lega '{self.nome}': servono pesi positivi")
+        # La ripartizione è normalizzata: basta indicare le proporzioni
+        totale = sum(self.ripartizione.get(r, 0) for r in self.rosa)
+        self.ripartizione = {r: self.ripartizione.get(r, 0) / totale if totale else 1 / len(self.rosa) for r in self.rosa}
+
+    @property
+    def slug(self) -> str:
+        return re.sub(r"[^a-z0-9]+", "_", self.nome.lower()).strip("_") or "lega"
+
+
+def load_leagues(path: str = config.LEAGUES_FILE) -> list[League]:
+    """Legge le leghe da un file JSON: una lista di oggetti con i campi di `League`."""
+    with open(path, "r", encoding="utf-8") as fp:
+        data = json.load(fp)
+    leagues = [League(**entry) for entry in (data["leghe"] if isinstance(data, dict) else data)]
+    nomi = [l.slug for l in leagues]
+    duplicati = {n for n in nomi if nomi.count(n) > 1}
+    if duplicati:
+        raise ValueError(f"Nomi di lega duplicati: {sorted(duplicati)}")
+    return leagues
+
+
+def build_format_dataset(df_fpedia: pd.DataFrame, df_fstats: pd.DataFrame,
+                         df_quotazioni: pd.DataFrame, formato: str) -> pd.DataFrame:
+    """
+    Merge con le quotazioni del formato, punteggi e unificazione (come la pipeline principale).
+    I punteggi incrementali hanno uno stato per formato, distinto da quello della pipeline.
+    """
+    # Il merge aggiunge colonne al DataFrame in input: si lavora su copie dei frame condivisi
+    fpedia = main._merge_quotazioni(df_fpedia.copy(), df_quotazioni, formato)
+    fstats = main._merge_quotazioni(df_fstats.copy(), df_quotazioni, formato)
+    df_projections = projections.project(fpedia, fstats)
+    scorers = main.make_scorers(f"lega_{formato}")
+    fpedia = main._score_fpedia(fpedia, df_projections, scorers)
+    fstats = main._score_FSTATS(fstats, df_projections, scorers)
+    return main._unify(fpedia, fstats, scorers)
+
+
+def rank_league(df_unified: pd.DataFrame, league: League) -> pd.DataFrame:
+    """
+    Classifica della lega: prezzo scalato sul budget e Score_Lega come media pesata dei
+    percentili per ruolo delle colonne in `league.pesi` (0-100). Non modifica l'input.
+    """
+    mancanti = [c for c in league.pesi if c not in df_unified.columns]
+    if mancanti:
+        raise ValueError(f"Lega '{league.nome}': colonne dei pesi non presenti nel dataset: {mancanti}")
+
+    df = df_unified[df_unified["Ruolo"].isin(league.rosa)].copy()
+    quotazione = pd.to_numeric(df["quotazione_attuale"], errors="coerce").fillna(1).clip(lower=1)
+    df["Prezzo_Lega"] = (quotazione * league.budget / config.BUDGET_STANDARD).round().clip(lower=1)
+
+    score = pd.Series(0.0, index=df.index)
+    for colonna, peso in league.pesi.items():
+        valori = pd.to_numeric(df[colonna], errors="coerce")
+        score += valori.groupby(df["Ruolo"]).rank(pct=True).fillna(0) * peso
+    df["Score_Lega"] = score / sum(league.pesi.values()) * 100
+
+    df = df.sort_values("Score_Lega", ascending=False)
+    df["Rank_Ruolo"] = df.groupby("Ruolo").cumcount() + 1
+    df["Budget_Ruolo"] = df["Ruolo"].map(league.ripartizione) * league.budget
+    # Offerta massima: prezzo di lega maggiorato fino al doppio per i migliori Score_Lega,
+    # senza superare il budget del ruolo meno un credito per ogni altro slot
+    tetto = df["Budget_Ruolo"] - (df["Ruolo"].map(league.rosa) - 1)
+    df["Offerta_Max"] = (df["Prezzo_Lega"] * (1 + df["Score_Lega"] / 100)).round().clip(upper=tetto, lower=1)
+    return df
+
+
+def _best_roster(prezzi: np.ndarray, valori: np.ndarray, slots: int, budget: int) -> list[int]:
+    """
+    Zaino con cardinalità: gli `slots` giocatori (posizioni) di valore totale massimo con
+    costo entro `budget`. Se nessuna combinazione completa entra nel budget, la più numerosa.
+    """
+    n = len(prezzi)
+    # migliore[k, b]: valore massimo con k giocatori e costo totale al più b
+    migliore = np.full((slots + 1, budget + 1), -np.inf)
+    migliore[0] = 0.0
+    preso = np.zeros((n, slots + 1, budget + 1), dtype=bool)
+    for i, (prezzo, valore) in enumerate(zip(prezzi, valori)):
+        if prezzo > budget:
+            continue
+        for k in range(min(i + 1, slots), 0, -1):
+            candidato = migliore[k - 1, : budget + 1 - prezzo] + valore
+            meglio = candidato > migliore[k, prezzo:]
+            migliore[k, prezzo:][meglio] = candidato[meglio]
+            preso[i, k, prezzo:] = meglio
+    k = max(k for k in range(slots + 1) if np.isfinite(migliore[k, budget]))
+    scelti, b = [], budget
+    for i in range(n - 1, -1, -1):
+        if k and preso[i, k, b]:
+            scelti.append(i)
+            b -= int(prezzi[i])
+            k -= 1
+    return sorted(scelti)
+
+
+def suggest_roster(df_ranked: pd.DataFrame, league: League, indice: str = config.LEAGUE_ROSTER_INDEX) -> pd.DataFrame:
+    """
+    Rosa indicativa: per ogni ruolo gli slot coperti dalla combinazione di giocatori di valore
+    totale massimo con i prezzi di lega entro il budget del ruolo. Gli indici sono rapporti
+    valore/prezzo: il valore di un giocatore è `indice` per la quotazione, altrimenti la rosa
+    migliore sarebbe sempre quella dei giocatori a prezzo base. L'ordine resta per Score_Lega.
+    """
+    scelti = []
+    for ruolo, slots in league.rosa.items():
+        candidati = df_ranked[df_ranked["Ruolo"] == ruolo]
+        budget = int(league.ripartizione[ruolo] * league.budget)
+        prezzi = candidati["Prezzo_Lega"].to_numpy(dtype=np.int64)
+        valori = (pd.to_numeric(candidati[indice], errors="coerce").fillna(0)
+                  * pd.to_numeric(candidati["quotazione_attuale"], errors="coerce").fillna(1).clip(lower=1) / 100)
+        valori = valori.to_numpy(dtype=float)
+        presi = _best_roster(prezzi, valori, slots, budget)
+        if len(presi) < slots:
+            logger.warning(f"Lega '{league.nome}': solo {len(presi)}/{slots} giocatori per il ruolo {ruolo}")
+        scelti.append(candidati.iloc[presi])
+    return pd.concat(scelti) if scelti else df_ranked.iloc[0:0]
+
+
+def run_batch(leagues: list[League], exclude=(), output_dir: str = config.LEAGUES_OUTPUT_DIR) -> dict:
+    """
+    Esegue una sola volta gli stage condivisi della pipeline (con la cache degli stage),
+    poi un dataset per formato e infine classifica, rosa e report per ogni lega.
+    Ritorna per ogni lega il percorso del report e un riepilogo della rosa.
+    """
+    results = main.build_pipeline().run(targets=SHARED_STAGES, exclude=exclude)
+    df_fpedia = results["process_fpedia"]
+    df_fstats = results["process_FSTATS"]
+    df_quotazioni = results["quotazioni"]
+    if df_quotazioni is None or df_quotazioni.empty:
+        logger.warning("⚠️ Quotazioni non disponibili: prezzi di lega stimati con i default per ruolo")
+        df_quotazioni = pd.DataFrame()
+
+    datasets = {}
+    for formato in sorted({league.formato for league in leagues}):
+        logger.info(f"--- Dataset condiviso per il formato {formato} ---")
+        datasets[formato] = build_format_dataset(df_fpedia, df_fstats, df_quotazioni, formato)
+
+    os.makedirs(output_dir, exist_ok=True)
+    summary = {}
+    for league in leagues:
+        df_unified = datasets[league.formato]
+        if df_unified.empty:
+            logger.warning(f"Lega '{league.nome}': dataset vuoto, report saltato")
+            continue
+        df_ranked = rank_league(df_unified, league)
+        rosa = suggest_roster(df_ranked, league)
+        run_snapshots.write_snapshot(df_ranked, scope=os.path.join("leghe", league.slug), rank_columns=("Score_Lega",))
+        path = report_writer.save_league_excel(
+            df_ranked, rosa, league, os.path.join(output_dir, f"{league.slug}.xlsx")
+        )
+        costo = float(rosa["Prezzo_Lega"].sum())
+        summary[league.nome] = {
+            "report": path, "formato": league.formato, "giocatori": len(rosa),
+            "costo_rosa": costo, "crediti_residui": league.budget - costo,
+        }
+        logger.info(
+            f"🏟️ Lega '{league.nome}' ({league.formato}, budget {league.budget}): "
+            f"rosa di {len(rosa)} giocatori a prezzo base {costo:.0f} crediti, {league.budget - costo:.0f} residui"
+        )
+    return summary
@@ -3,158 +3,267 @@ import os
 from loguru import logger
 import pandas as pd
 
-import data_retriever
 import data_processor
 import convenienza_calculator
 import quotazioni_loader
 import data_unifier  # NUOVO: modulo dedicato per unificazione
+import report_writer
+import query_cache
+import similar_players
+import shared_results
+import run_snapshots
+import incremental_scoring
+import projections
+import scoring_formulas
 import config
+import instrumentation
+from pipeline import Pipeline
+from stage_cache import StageCache
 
 
-def main():
-    """
-    Main script per l'analisi Fantacalcio con integrazione quotazioni e file unificato migliorato.
-    """
-    os.makedirs(config.DATA_DIR, exist_ok=True)
-    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+def _fetch_fpedia():
+    # Import pigro: requests e BeautifulSoup servono solo per il download
+    import data_retriever
+    data_retriever.scrape_fpedia()
 
-    logger.info("Starting Fantacalcio analysis pipeline con quotazioni...")
 
-    # 1. Recupera tutti i dati
-    logger.info("Step 1: Retrieving data from all sources...")
-    data_retriever.scrape_fpedia()
+def _fetch_FSTATS():
+    import data_retriever
     data_retriever.fetch_FSTATS_data()
-    logger.info("Data retrieval complete.")
 
-    # 2. Carica dataframes
-    df_fpedia, df_FSTATS = data_processor.load_dataframes()
-    
-    # 3. Carica le quotazioni ufficiali
-    logger.info("Step 2: Caricamento quotazioni ufficiali...")
+
+def _load_quotazioni() -> pd.DataFrame:
+    logger.info("Caricamento quotazioni ufficiali...")
     df_quotazioni = quotazioni_loader.load_quotazioni()
-    
+
     if df_quotazioni.empty:
         logger.warning("⚠️ Quotazioni non disponibili - il calcolo userà stime basate su Punteggio")
     else:
         logger.info(f"✅ Caricate {len(df_quotazioni)} quotazioni ufficiali")
+    return df_quotazioni
+
+
+def _record_quotazioni_history(df_quotazioni: pd.DataFrame):
+    """Aggiunge il listone corrente allo storico (solo righe cambiate), datato alla modifica del file."""
+    if df_quotazioni.empty:
+        return None
+    import quotazioni_history
+
+    path = config.QUOTAZIONI_FILE
+    try:
+        return quotazioni_history.ingest_snapshot(
+            df_quotazioni, quotazioni_history.date_from_path(path), quotazioni_history.season_from_path(path)
+        )
+    except ValueError as e:
+        logger.warning(f"Storico quotazioni non aggiornato: {e}")
+        return None
+
+
+def _merge_quotazioni(df_processed: pd.DataFrame, df_quotazioni: pd.DataFrame,
+                      formato: str = "classic") -> pd.DataFrame:
+    if df_processed.empty or df_quotazioni.empty:
+        return df_processed
+    return quotazioni_loader.merge_with_quotazioni(df_processed, df_quotazioni, formato)
+
+
+def make_scorers(variant: str = "") -> dict[str, incremental_scoring.RowScorer]:
+    """
+    Punteggi riga per riga ricalcolati solo per i giocatori con input cambiati (vedi
+    incremental_scoring); con formule diverse (SCORING_FORMULAS_FILE) si ricalcola tutto.
+    `variant` dà a ogni insieme di input (es. i formati delle leghe di `batch`) il proprio
+    stato, così non invalida quello della pipeline principale.
+    """
+    suffix = f"_{variant}" if variant else ""
+    return {
+        "fpedia": incremental_scoring.RowScorer(
+            f"score_fpedia{suffix}", convenienza_calculator.calcola_convenienza_fpedia, key=("Nome", "Squadra"),
+            normalizers={"giocatemax": convenienza_calculator.calcola_giocatemax, "formule": scoring_formulas.digest},
+        ),
+        "FSTATS": incremental_scoring.RowScorer(
+            f"score_FSTATS{suffix}", convenienza_calculator.calcola_convenienza_FSTATS, key=("Nome",),
+            normalizers={"formule": scoring_formulas.digest},
+        ),
+        "adjusted_index": incremental_scoring.RowScorer(
+            f"adjusted_index{suffix}", data_unifier.adjusted_index_frame, key=("Nome", "Squadra", "Fonte_Dati"),
+            normalizers={"formule": scoring_formulas.digest},
+        ),
+    }
+
+
+SCORERS = make_scorers()
+FPEDIA_SCORER = SCORERS["fpedia"]
+FSTATS_SCORER = SCORERS["FSTATS"]
+ADJUSTED_INDEX_SCORER = SCORERS["adjusted_index"]
+
+
+def _adjusted_index(df_unified: pd.DataFrame, scorers: dict | None = None) -> pd.DataFrame:
+    # Solo le colonne lette dalle formule "unificato": le altre non invalidano le righe
+    inputs = scoring_formulas.load_formulas().inputs("unificato")
+    columns = ["Nome", "Squadra", "Fonte_Dati", *(c for c in inputs if c in df_unified.columns)]
+    return (scorers or SCORERS)["adjusted_index"](df_unified[list(dict.fromkeys(columns))])
+
+
+def _score_fpedia(df_processed: pd.DataFrame, df_projections: dict | None = None,
+                  scorers: dict | None = None) -> pd.DataFrame:
+    if df_processed.empty:
+        return pd.DataFrame()
+    logger.info("--- Starting FPEDIA Pipeline con Quotazioni ---")
+    df_processed = projections.attach(df_processed, (df_projections or {}).get("fpedia"))
+    df_fpedia_final = (scorers or SCORERS)["fpedia"](df_processed)
+    # Ordina per il nuovo indice Valore_su_Prezzo
+    return df_fpedia_final.sort_values(by="Valore_su_Prezzo", ascending=False)
+
+
+def _score_FSTATS(df_processed: pd.DataFrame, df_projections: dict | None = None,
+                  scorers: dict | None = None) -> pd.DataFrame:
+    if df_processed.empty:
+        return pd.DataFrame()
+    logger.info("--- Starting FSTATS Pipeline con Quotazioni ---")
+    df_processed = projections.attach(df_processed, (df_projections or {}).get("FSTATS"))
+    df_fstats_final = (scorers or SCORERS)["FSTATS"](df_processed)
+    return df_fstats_final.sort_values(by="Valore_su_Prezzo", ascending=False)
+
+
+def _report_fpedia(df_fpedia_final: pd.DataFrame):
+    if df_fpedia_final.empty:
+        return None
+    return report_writer.save_fpedia_excel(df_fpedia_final, config.FPEDIA_OUTPUT_EXCEL)
+
+
+def _report_FSTATS(df_fstats_final: pd.DataFrame):
+    if df_fstats_final.empty:
+        return None
+    return report_writer.save_FSTATS_excel(df_fstats_final, config.FSTATS_OUTPUT_EXCEL)
+
+
+def _unify(df_fpedia_final: pd.DataFrame, df_fstats_final: pd.DataFrame,
+           scorers: dict | None = None) -> pd.DataFrame:
+    if df_fpedia_final.empty and df_fstats_final.empty:
+        return pd.DataFrame()
+    logger.info("--- Creazione Dataset Unificato MIGLIORATO ---")
+    return data_unifier.create_unified_dataset_improved(
+        df_fpedia_final, df_fstats_final, adjusted_index=lambda df: _adjusted_index(df, scorers)
+    )
+
+
+def _report_unified(df_unified: pd.DataFrame):
+    if df_unified.empty:
+        return None
+
+    # Salva file unificato con il nuovo sistema migliorato
+    output_path = config.UNIFIED_OUTPUT_EXCEL
+    data_unifier.save_unified_excel_improved(df_unified, output_path)
+
+    # Log top 10 super affari
+    logger.info("\n🏆 TOP 10 SUPER AFFARI (Score bilanciato):")
+    top10 = df_unified.nlargest(10, 'Score_Affare')[
+        ['Nome', 'Squadra', 'Ruolo', 'quotazione_attuale',
+         'Indice_Aggiustato', 'Score_Affare', 'Affidabilita_Dati', 'Fonte_Dati']
+    ]
+    for _, row in top10.iterrows():
+        logger.info(
+            f"  {row['Nome']} ({row['Squadra']}) - {row['Ruolo']} - "
+            f"Qt: {row['quotazione_attuale']:.0f} - Score: {row['Score_Affare']:.1f} - "
+            f"Affidab: {row['Affidabilita_Dati']:.0f}% - Fonte: {row['Fonte_Dati']}"
+        )
+    return output_path
+
+
+def _query_cache_writer(path_key: str):
+    def write(df: pd.DataFrame):
+        if df.empty:
+            return None
+        return query_cache.write_query_cache(df, getattr(config, path_key))
+    return write
+
+
+def build_pipeline(memory: dict | None = None) -> Pipeline:
+    """
+    Costruisce il grafo degli stage. I rami FPEDIA e FSTATS sono indipendenti
+    fino all'unificazione, e il caricamento delle quotazioni si sovrappone al download.
+    `memory` conserva i risultati tra più esecuzioni nello stesso processo (vedi watch.py).
+    """
+    cache = StageCache(config.STAGE_CACHE_DIR) if config.STAGE_CACHE_ENABLED else None
+    pipeline = Pipeline(cache=cache, memory=memory)
+    anno = ("ANNO_CORRENTE",)
+
+    # 1. Recupero dati (network-bound) e quotazioni in parallelo
+    pipeline.add_stage("fetch_fpedia", _fetch_fpedia)
+    pipeline.add_stage("fetch_FSTATS", _fetch_FSTATS)
+    pipeline.add_stage("quotazioni", _load_quotazioni, cache=True, files=("QUOTAZIONI_FILE",))
+    # Eseguito solo quando il file delle quotazioni cambia (cache sull'impronta del file)
+    pipeline.add_stage("quotazioni_history", _record_quotazioni_history, deps=("quotazioni",), cache=True)
+
+    # 2. Ramo FPEDIA
+    pipeline.add_stage("load_fpedia", data_processor.load_fpedia_dataframe,
+                       after=("fetch_fpedia",), files=("GIOCATORI_CSV",))
+    pipeline.add_stage("process_fpedia", data_processor.process_fpedia_data,
+                       deps=("load_fpedia",), cache=True, config_keys=anno)
+    pipeline.add_stage("merge_fpedia", _merge_quotazioni,
+                       deps=("process_fpedia", "quotazioni"), cache=True)
+
+    # 3. Ramo FSTATS
+    pipeline.add_stage("load_FSTATS", data_processor.load_FSTATS_dataframe,
+                       after=("fetch_FSTATS",), files=("PLAYERS_CSV",))
+    pipeline.add_stage("process_FSTATS", data_processor.process_FSTATS_data,
+                       deps=("load_FSTATS",), cache=True)
+    pipeline.add_stage("merge_FSTATS", _merge_quotazioni,
+                       deps=("process_FSTATS", "quotazioni"), cache=True)
+
+    # 3b. Proiezioni della prossima stagione (regressioni per ruolo su entrambe le fonti),
+    # poi punteggi e report di ciascun ramo
+    pipeline.add_stage("projections", projections.project, deps=("merge_fpedia", "merge_FSTATS"), cache=True,
+                       config_keys=("ANNO_CORRENTE", "PROJECTION_RIDGE", "PROJECTION_MIN_ROWS"))
+    formule = ("SCORING_FORMULAS_FILE",)
+    pipeline.add_stage("score_fpedia", _score_fpedia, deps=("merge_fpedia", "projections"),
+                       cache=True, config_keys=anno, files=formule)
+    pipeline.add_stage("report_fpedia", _report_fpedia, deps=("score_fpedia",), cache=True,
+                       config_keys=anno, outputs=("FPEDIA_OUTPUT_EXCEL",))
+    pipeline.add_stage("score_FSTATS", _score_FSTATS, deps=("merge_FSTATS", "projections"),
+                       cache=True, files=formule)
+    pipeline.add_stage("report_FSTATS", _report_FSTATS, deps=("score_FSTATS",), cache=True,
+                       outputs=("FSTATS_OUTPUT_EXCEL",))
+
+    # 4. Dataset unificato
+    pipeline.add_stage("unify", _unify, deps=("score_fpedia", "score_FSTATS"), cache=True, files=formule)
+    pipeline.add_stage("report_unified", _report_unified, deps=("unify",), cache=True,
+                       outputs=("UNIFIED_OUTPUT_EXCEL",))
+
+    # 5. Query cache per CLI e API
+    pipeline.add_stage("query_cache", _query_cache_writer("QUERY_CACHE_FILE"), deps=("unify",),
+                       cache=True, outputs=("QUERY_CACHE_FILE",))
+    pipeline.add_stage("query_cache_fpedia", _query_cache_writer("FPEDIA_QUERY_CACHE_FILE"),
+                       deps=("score_fpedia",), cache=True, outputs=("FPEDIA_QUERY_CACHE_FILE",))
+    pipeline.add_stage("query_cache_FSTATS", _query_cache_writer("FSTATS_QUERY_CACHE_FILE"),
+                       deps=("score_FSTATS",), cache=True, outputs=("FSTATS_QUERY_CACHE_FILE",))
+
+    # 6. Indice dei giocatori simili (comando `similar`)
+    pipeline.add_stage("similarity_index", similar_players.build_similarity_index, deps=("unify",),
+                       cache=True, config_keys=("SIMILARITY_FEATURES",), outputs=("SIMILARITY_INDEX_FILE",))
+
+    # 7. Risultati condivisi in formato colonnare mappabile (lettori multi-processo)
+    pipeline.add_stage("shared_results", shared_results.publish_stage,
+                       deps=("score_fpedia", "score_FSTATS", "unify"), cache=True,
+                       outputs=("SHARED_RESULTS_CURRENT",))
+
+    # 8. Snapshot della classifica per il confronto tra esecuzioni (comando `diff`)
+    pipeline.add_stage("run_snapshot", run_snapshots.snapshot_stage, deps=("unify",), cache=True)
+
+    return pipeline
+
+
+def main():
+    """
+    Main script per l'analisi Fantacalcio con integrazione quotazioni e file unificato migliorato.
+    """
+    config.apply_overrides()
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+
+    logger.info("Starting Fantacalcio analysis pipeline con quotazioni...")
 
-    # Variabili per conservare i dataset processati
-    df_fpedia_final = pd.DataFrame()
-    df_fstats_final = pd.DataFrame()
-
-    # --- Pipeline FPEDIA con QUOTAZIONI ---
-    if not df_fpedia.empty:
-        logger.info("--- Starting FPEDIA Pipeline con Quotazioni ---")
-
-        # Processa i dati FPEDIA
-        df_processed = data_processor.process_fpedia_data(df_fpedia)
-        
-        # Merge con le quotazioni
-        if not df_quotazioni.empty:
-            df_processed = quotazioni_loader.merge_with_quotazioni(df_processed, df_quotazioni)
-        
-        # Calcola convenienza con quotazioni reali
-        df_fpedia_final = convenienza_calculator.calcola_convenienza_fpedia(df_processed)
-
-        # Ordina per il nuovo indice Valore_su_Prezzo
-        df_fpedia_final = df_fpedia_final.sort_values(by="Valore_su_Prezzo", ascending=False)
-
-        # Colonne output
-        output_columns = [
-            "Nome", "Ruolo", "Squadra",
-            "quotazione_attuale", "Valore_su_Prezzo", "Convenienza", "Convenienza Potenziale", "fantavoto_medio",
-            f"Fantamedia anno {config.ANNO_CORRENTE-1}-{config.ANNO_CORRENTE}",
-            f"Presenze {config.ANNO_CORRENTE-1}-{config.ANNO_CORRENTE}",
-            f"FM su tot gare {config.ANNO_CORRENTE-1}-{config.ANNO_CORRENTE}",
-            "Presenze campionato corrente",
-            f"Fantamedia anno {config.ANNO_CORRENTE-2}-{config.ANNO_CORRENTE-1}",
-            "Presenze previste", "Gol previsti", "Assist previsti",
-            "Punteggio", "Trend", "Skills",
-            "Buon investimento", "Resistenza infortuni",
-            "Infortunato", "Nuovo acquisto",
-        ]
-        
-        final_columns = [col for col in output_columns if col in df_fpedia_final.columns]
-
-        # Salva FPEDIA
-        output_path = os.path.join(config.OUTPUT_DIR, "fpedia_analysis_con_quotazioni.xlsx")
-        
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            df_fpedia_final[final_columns].to_excel(writer, sheet_name='Tutti', index=False)
-            
-            for ruolo in ['P', 'D', 'C', 'A']:
-                df_ruolo = df_fpedia_final[df_fpedia_final['Ruolo'] == ruolo].head(30)
-                if not df_ruolo.empty:
-                    df_ruolo[final_columns].to_excel(writer, sheet_name=f'{ruolo}_Top30', index=False)
-            
-            df_occasioni = df_fpedia_final[df_fpedia_final['Valore_su_Prezzo'] > df_fpedia_final['Valore_su_Prezzo'].quantile(0.8)]
-            df_occasioni[final_columns].to_excel(writer, sheet_name='Occasioni', index=False)
-
-        logger.info(f"✅ FPEDIA analysis salvata in: {output_path}")
-
-    # --- Pipeline FSTATS con QUOTAZIONI ---
-    if not df_FSTATS.empty:
-        logger.info("--- Starting FSTATS Pipeline con Quotazioni ---")
-
-        # Processa i dati FSTATS
-        df_processed = data_processor.process_FSTATS_data(df_FSTATS)
-        
-        # Merge con le quotazioni
-        if not df_quotazioni.empty:
-            df_processed = quotazioni_loader.merge_with_quotazioni(df_processed, df_quotazioni)
-        
-        # Calcola convenienza con quotazioni reali
-        df_fstats_final = convenienza_calculator.calcola_convenienza_FSTATS(df_processed)
-
-        # Ordina per Valore_su_Prezzo
-        df_fstats_final = df_fstats_final.sort_values(by="Valore_su_Prezzo", ascending=False)
-
-        # Colonne output
-        output_columns = [
-            "Nome", "Ruolo", "Squadra",
-            "quotazione_attuale", "Valore_su_Prezzo", "Convenienza", "Convenienza Potenziale", "fantavoto_medio",
-            "fantacalcioFantaindex", "fanta_avg", "avg", "presences",
-            "goals", "assists", "xgFromOpenPlays", "xA",
-            "yellowCards", "redCards",
-        ]
-        
-        final_columns = [col for col in output_columns if col in df_fstats_final.columns]
-
-        output_path = os.path.join(config.OUTPUT_DIR, "FSTATS_analysis_con_quotazioni.xlsx")
-        
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            df_fstats_final[final_columns].to_excel(writer, sheet_name='Tutti', index=False)
-            
-            for ruolo in ['P', 'D', 'C', 'A']:
-                df_ruolo = df_fstats_final[df_fstats_final['Ruolo'] == ruolo].head(30)
-                if not df_ruolo.empty:
-                    df_ruolo[final_columns].to_excel(writer, sheet_name=f'{ruolo}_Top30', index=False)
-
-        logger.info(f"✅ FSTATS analysis salvata in: {output_path}")
-
-    # --- NUOVO: Crea Dataset Unificato MIGLIORATO ---
-    if not df_fpedia_final.empty or not df_fstats_final.empty:
-        logger.info("--- Creazione Dataset Unificato MIGLIORATO ---")
-        
-        df_unified = data_unifier.create_unified_dataset_improved(df_fpedia_final, df_fstats_final)
-        
-        if not df_unified.empty:
-            # Salva file unificato con il nuovo sistema migliorato
-            output_path = os.path.join(config.OUTPUT_DIR, "analisi_unificata_fantacalcio.xlsx")
-            data_unifier.save_unified_excel_improved(df_unified, output_path)
-            
-            # Log top 10 super affari
-            logger.info("\n🏆 TOP 10 SUPER AFFARI (Score bilanciato):")
-            top10 = df_unified.nlargest(10, 'Score_Affare')[
-                ['Nome', 'Squadra', 'Ruolo', 'quotazione_attuale', 
-                 'Indice_Aggiustato', 'Score_Affare', 'Affidabilita_Dati', 'Fonte_Dati']
-            ]
-            for _, row in top10.iterrows():
-                logger.info(
-                    f"  {row['Nome']} ({row['Squadra']}) - {row['Ruolo']} - "
-                    f"Qt: {row['quotazione_attuale']:.0f} - Score: {row['Score_Affare']:.1f} - "
-                    f"Affidab: {row['Affidabilita_Dati']:.0f}% - Fonte: {row['Fonte_Dati']}"
-                )
+    with instrumentation.tracing():
+        build_pipeline().run()
 
     logger.info("\n✨ Pipeline completata con successo!")
     logger.info("📊 File generati in data/output/:")
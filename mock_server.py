@@ -0,0 +1,456 @@
+# mock_server.py - Server locale che imita FPEDIA e FSTATS per test di carico offline
+# Le pagine sono generate da synthetic_data e rispettano i selettori usati da
+# `data_retriever._parse_attributi`; latenza, errori 5xx e throttling 429 sono configurabili.
+# Solo libreria standard per il server: pandas/numpy servono solo a generare i dati all'avvio.
+import ast
+import json
+import os
+import random
+import secrets
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+
+import config
+
+FPEDIA_PREFIX = "/fpedia"
+FSTATS_PREFIX = "/fstats/api"
+STATS_PATH = "/__mock__/stats"
+
+RUOLI_LISTA = {"Portiere": "portieri", "Difensore": "difensori", "Centrocampista": "centrocampisti", "Attaccante": "attaccanti"}
+
+
+@dataclass
+class Faults:
+    """Comportamento del server: latenza per richiesta ed errori iniettati."""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0      # probabilità di 500/502/503
+    throttle_rate: float = 0.0   # probabilità di 429 indipendente dal carico
+    max_rps: float = 0.0         # oltre questa frequenza risponde 429 (0 = nessun limite)
+    retry_after_s: float = 1.0
+    seed: int | None = None
+
+
+def _slug(nome: str) -> str:
+    return "-".join(nome.lower().split())
+
+
+def _player_page(row: dict) -> str:
+    """Pagina giocatore con la stessa struttura (per i selettori usati) della pagina reale."""
+    anno = config.ANNO_CORRENTE
+    trend = {"UP": '<i class="icon icon-arrow-up"></i>', "DOWN": '<i class="icon icon-arrow-down"></i>'}.get(row["Trend"], "")
+    if row["Infortunato"]:
+        stato = '<img class="inf_calc" src="#" title="Infortunato">'
+    elif row["Consigliato prossima giornata"]:
+        stato = '<img class="inf_calc" src="#" title="Consigliato per la giornata">'
+    else:
+        stato = ""
+    nuovo = '<span class="new_calc">Nuovo</span>' if row["Nuovo acquisto"] else ""
+    skills = "".join(f'<span class="stickdanpic">{escape(s)}</span>' for s in ast.literal_eval(row["Skills"]))
+    return f"""<!DOCTYPE html>
+<html><head><title>{escape(row["Nome"])}</title></head><body>
+<div id="content"><div><div class="section nobg nomargin"><div><div>
+<div class="col_full">{stato}{nuovo}</div>
+<div>
+<h1>{escape(row["Nome"])}</h1>
+<div class="col_three_fifth">
+<div class="promo promo-border promo-light row">
+<div class="label12"><span class="label">{escape(row["Ruolo"])}</span></div>
+<div>{skills}</div>
+<div><div><div><img src="#" title="Squadra: {escape(row["Squadra"])}"></div></div></div>
+</div>
+</div>
+<div class="cards">
+<div class="col_one_fourth"><span class="stickdan">{row["Punteggio"]}/100</span></div>
+<div class="col_one_fourth"><div><strong>Fantamedia anno {anno-1}-{anno}</strong><span>{row[f"Fantamedia anno {anno-1}-{anno}"]}</span>{trend}</div><span class="rouge">{row["Presenze campionato corrente"]}</span></div>
+<div class="col_one_fourth"><div><strong>Fantamedia anno {anno-2}-{anno-1}</strong><span>{row[f"Fantamedia anno {anno-2}-{anno-1}"]}</span></div></div>
+</div>
+<div class="stats">
+<div class="col_one_third"><div class="progress-percent">{row["Punteggio"]}%</div><div class="progress-percent">50%</div><div class="progress-percent">{row["Buon investimento"]}%</div><div class="progress-percent">{row["Resistenza infortuni"]}%</div></div>
+<div class="col_one_third"><div>
+<strong>Presenze {anno-1}-{anno}:</strong><span>{row[f"Presenze {anno-1}-{anno}"]}</span>
+<strong>FM su tot gare {anno-1}-{anno}:</strong><span>{row[f"FM su tot gare {anno-1}-{anno}"]}</span>
+</div></div>
+<div class="col_one_third col_last"><div>
+<strong>Presenze previste:</strong><span>{row["Presenze previste"]}</span>
+<strong>Gol previsti:</strong><span>{row["Gol previsti"]}</span>
+<strong>Assist previsti:</strong><span>{row["Assist previsti"]}</span>
+</div></div>
+</div>
+</div>
+</div></div></div></div></div>
+</body></html>"""
+
+
+class MockSite:
+    """Contenuti del mock: giocatori FPEDIA per slug e ruolo, giocatori FSTATS in JSON."""
+
+    def __init__(self, n_players: int = 600, seed: int = 0):
+        import synthetic_data
+
+        dataset = synthetic_data.generate_dataset(n_players, seed)
+        self.fpedia = {_slug(r["Nome"]): r for r in dataset["fpedia"].to_dict("records")}
+        self.by_role = {lista: [] for lista in RUOLI_LISTA.values()}
+        for slug, row in self.fpedia.items():
+            self.by_role[RUOLI_LISTA[row["Ruolo"]]].append(slug)
+
+        self.fstats = []
+        for row in json.loads(dataset["fstats"].to_json(orient="records")):
+            row["team"] = ast.literal_eval(row["team"])
+            self.fstats.append(row)
+
+    def listing_page(self, ruolo: str, base_url: str) -> str | None:
+        slugs = self.by_role.get(ruolo)
+        if slugs is None:
+            return None
+        articles = "\n".join(
+            f'<article class="giocatore"><a href="{base_url}/calciatore/{slug}/">{escape(self.fpedia[slug]["Nome"])}</a></article>'
+            for slug in slugs
+        )
+        return f"<!DOCTYPE html>\n<html><body><div id=\"lista\">\n{articles}\n</div></body></html>"
+
+    def player_page(self, slug: str) -> str | None:
+        row = self.fpedia.get(slug)
+        return _player_page(row) if row is not None else None
+
+    def players_json(self, page: int, page_size: int, next_url) -> dict:
+        start = (page - 1) * page_size
+        results = self.fstats[start:start + page_size]
+        has_next = start + page_size < len(self.fstats)
+        return {
+            "count": len(self.fstats),
+            "next": next_url(page + 1) if has_next else None,
+            "previous": next_url(page - 1) if page > 1 else None,
+            "results": results,
+        }
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Client che chiude la connessione (timeout di lettura, scadenza dello scraping): non è un errore del mock
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class MockServer:
+    """
+    Server HTTP multi-thread con i due siti sotto /fpedia e /fstats/api.
+    `start()` lo avvia in background (porta 0 = porta libera scelta dal sistema).
+    """
+
+    def __init__(self, host: str = config.MOCK_HOST, port: int = config.MOCK_PORT,
+                 n_players: int = 600, seed: int = 0, faults: Faults | None = None):
+        self.site = MockSite(n_players, seed)
+        self.faults = faults or Faults()
+        self._rng = random.Random(self.faults.seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self._tokens = set()
+        self.counters = {}
+        self.httpd = _HTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def fpedia_base(self) -> str:
+        return self.url + FPEDIA_PREFIX
+
+    @property
+    def fstats_base(self) -> str:
+        return self.url + FSTATS_PREFIX
+
+    def start(self) -> "MockServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, kind: str, status: int) -> None:
+        with self._lock:
+            by_status = self.counters.setdefault(kind, {})
+            by_status[str(status)] = by_status.get(str(status), 0) + 1
+
+    def _injected_fault(self) -> int | None:
+        """Status di errore da restituire per questa richiesta, se ne va iniettato uno."""
+        f = self.faults
+        with self._lock:
+            if f.max_rps > 0:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] > 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= f.max_rps:
+                    return 429
+                self._recent.append(now)
+            roll = self._rng.random()
+            if roll < f.throttle_rate:
+                return 429
+            if roll < f.throttle_rate + f.error_rate:
+                return self._rng.choice((500, 502, 503))
+            delay = f.latency_ms + (self._rng.uniform(-f.jitter_ms, f.jitter_ms) if f.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"faults": asdict(self.faults), "requests": json.loads(json.dumps(self.counters))}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, kind: str, status: int, body: str, content_type: str = "text/html; charset=utf-8",
+                      headers: dict | None = None) -> None:
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+                server._count(kind, status)
+
+            def _send_json(self, kind: str, status: int, data) -> None:
+                self._send(kind, status, json.dumps(data), "application/json")
+
+            def _route(self, method: str):
+                parts = urlsplit(self.path)
+                path = parts.path
+                if path == STATS_PATH:
+                    return self._send_json("stats", 200, server.stats())
+
+                if path.startswith(FPEDIA_PREFIX + "/lista-calciatori-serie-a/"):
+                    kind = "lista_ruolo"
+                elif path.startswith(FPEDIA_PREFIX + "/calciatore/"):
+                    kind = "giocatore"
+                elif path == FSTATS_PREFIX + "/account/login/":
+                    kind = "login"
+                elif path == FSTATS_PREFIX + "/v1/zona/player/":
+                    kind = "giocatori"
+                else:
+                    return self._send("not_found", 404, "Not found")
+
+                status = server._injected_fault()
+                if status == 429:
+                    return self._send(kind, 429, "Too Many Requests",
+                                      headers={"Retry-After": f"{server.faults.retry_after_s:g}"})
+                if status is not None:
+                    return self._send(kind, status, "Server error")
+
+                segment = unquote(path.rstrip("/").rsplit("/", 1)[-1])
+                if kind == "lista_ruolo":
+                    base_url = f"http://{self.headers.get('Host')}{FPEDIA_PREFIX}"
+                    html = server.site.listing_page(segment, base_url)
+                    return self._send(kind, 200, html) if html else self._send(kind, 404, "Not found")
+                if kind == "giocatore":
+                    html = server.site.player_page(segment)
+                    return self._send(kind, 200, html) if html else self._send(kind, 404, "Not found")
+                if kind == "login":
+                    return self._login(method)
+                return self._players(parts)
+
+            def _login(self, method: str):
+                if method != "POST":
+                    return self._send_json("login", 405, {"detail": "Method not allowed"})
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    credentials = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    credentials = {}
+                if not credentials.get("username") or not credentials.get("password"):
+                    return self._send_json("login", 401, {"detail": "Invalid credentials"})
+                token = secrets.token_hex(16)
+                with server._lock:
+                    server._tokens.add(token)
+                return self._send_json("login", 200, {"access_token": token, "refresh_token": secrets.token_hex(16)})
+
+            def _players(self, parts):
+                token = self.headers.get("authorization", "").removeprefix("Bearer ").strip()
+                with server._lock:
+                    authorized = token in server._tokens
+                if not authorized:
+                    return self._send_json("giocatori", 401, {"detail": "Authentication required"})
+                query = {k: v[-1] for k, v in parse_qs(parts.query, keep_blank_values=True).items()}
+                try:
+                    page = max(1, int(query.get("page", 1)))
+                    page_size = max(1, int(query.get("page_size", 100)))
+                except ValueError:
+                    return self._send_json("giocatori", 400, {"detail": "Invalid page"})
+
+                def page_url(n: int) -> str:
+                    return f"http://{self.headers.get('Host')}{parts.path}?{urlencode(dict(query, page=n))}"
+
+                return self._send_json("giocatori", 200, server.site.players_json(page, page_size, page_url))
+
+            def do_GET(self):
+                self._route("GET")
+
+            def do_POST(self):
+                self._route("POST")
+
+        return Handler
+
+
+def run_mock_server(host: str = config.MOCK_HOST, port: int = config.MOCK_PORT, n_players: int = 600,
+                    seed: int = 0, faults: Faults | None = None) -> None:
+    """Avvia il mock in primo piano fino a Ctrl+C."""
+    server = MockServer(host, port, n_players, seed, faults)
+    print(f"Mock FPEDIA/FSTATS su {server.url} ({len(server.site.fpedia)} pagine FPEDIA, "
+          f"{len(server.site.fstats)} giocatori FSTATS)")
+    print("Per puntarvi il retriever:")
+    print(f"  export FPEDIA_BASEURL={server.fpedia_base}")
+    print(f"  export FSTATS_BASEURL={server.fstats_base}")
+    print("  export SCRAPE_POLITE_DELAY_MS=0,0 SCRAPE_ROLE_PAUSE_S=0")
+    print(f"Contatori richieste: {server.url}{STATS_PATH}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+def _point_config_at(server: MockServer, work_dir: str, page_size: int) -> dict:
+    """Reindirizza URL e file del retriever verso il mock; ritorna i valori da ripristinare."""
+    overrides = {
+        "BASEURL_FPEDIA": server.fpedia_base,
+        "BASEURL_FSTATS": server.fstats_base,
+        "FPEDIA_URL": f"{server.fpedia_base}/lista-calciatori-serie-a/",
+        "FSTATS_LOGIN_URL": f"{server.fstats_base}/account/login/",
+        "FSTATS_PLAYERS_URL": config.FSTATS_PLAYERS_URL.replace(config.BASEURL_FSTATS, server.fstats_base, 1)
+                                                       .replace(f"page_size={config.FSTATS_PAGE_SIZE}", f"page_size={page_size}", 1),
+        "GIOCATORI_URLS_FILE": os.path.join(work_dir, os.path.basename(config.GIOCATORI_URLS_FILE)),
+        "GIOCATORI_CSV": os.path.join(work_dir, os.path.basename(config.GIOCATORI_CSV)),
+        "GIOCATORI_CHECKPOINT_FILE": os.path.join(work_dir, os.path.basename(config.GIOCATORI_CHECKPOINT_FILE)),
+        "PLAYERS_CSV": os.path.join(work_dir, os.path.basename(config.PLAYERS_CSV)),
+        "FPEDIA_TELEMETRY_FILE": os.path.join(work_dir, os.path.basename(config.FPEDIA_TELEMETRY_FILE)),
+        "FSTATS_TELEMETRY_FILE": os.path.join(work_dir, os.path.basename(config.FSTATS_TELEMETRY_FILE)),
+        # Il test di carico deve colpire il mock, non la cache dei download condivisa
+        "DOWNLOAD_CACHE_ENABLED": False,
+    }
+    previous = {key: getattr(config, key) for key in overrides}
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return previous
+
+
+def load_test(n_players: int = 600, workers: int = config.MAX_WORKERS, faults: Faults | None = None,
+              page_size: int = 200, polite_delay_ms: tuple = (0, 0), retry_backoff_s: float | None = None,
+              seed: int = 0, parse_workers: int | None = None, deadline_s: float | None = None) -> dict:
+    """
+    Esegue scrape FPEDIA e download FSTATS contro un mock in-process e ritorna throughput,
+    copertura (righe ottenute / attese) e la telemetria di client e server.
+    I file scaricati finiscono in una directory temporanea: `data/` non viene toccata.
+    """
+    import pandas as pd
+
+    import data_retriever
+
+    saved = {
+        "MAX_WORKERS": config.MAX_WORKERS, "PARSE_WORKERS": config.PARSE_WORKERS,
+        "POLITE_DELAY_MS": config.POLITE_DELAY_MS,
+        "ROLE_PAUSE_S": config.ROLE_PAUSE_S, "RETRY_BACKOFF_S": config.RETRY_BACKOFF_S,
+        "SCRAPE_DEADLINE_S": config.SCRAPE_DEADLINE_S,
+    }
+    saved_env = {key: os.environ.get(key) for key in ("FSTATS_MAIL", "FSTATS_PASSWORD")}
+    with MockServer("127.0.0.1", 0, n_players, seed, faults) as server, tempfile.TemporaryDirectory() as work_dir:
+        saved.update(_point_config_at(server, work_dir, page_size))
+        config.MAX_WORKERS = workers
+        config.PARSE_WORKERS = parse_workers or config.PARSE_WORKERS
+        config.POLITE_DELAY_MS = tuple(polite_delay_ms)
+        config.ROLE_PAUSE_S = 0.0
+        if retry_backoff_s is not None:
+            config.RETRY_BACKOFF_S = retry_backoff_s
+        if deadline_s is not None:
+            config.SCRAPE_DEADLINE_S = deadline_s
+        os.environ["FSTATS_MAIL"] = config.MOCK_USERNAME
+        os.environ["FSTATS_PASSWORD"] = config.MOCK_PASSWORD
+        try:
+            started = time.perf_counter()
+            data_retriever.scrape_fpedia()
+            fpedia_s = time.perf_counter() - started
+            started = time.perf_counter()
+            data_retriever.fetch_FSTATS_data()
+            fstats_s = time.perf_counter() - started
+
+            def rows(path, **kwargs):
+                return len(pd.read_csv(path, **kwargs)) if os.path.exists(path) else 0
+
+            def telemetry(path):
+                if not os.path.exists(path):
+                    return {}
+                with open(path, "r", encoding="utf-8") as fp:
+                    summary = json.load(fp)
+                summary.pop("records", None)
+                return summary
+
+            fpedia_rows = rows(config.GIOCATORI_CSV)
+            fstats_rows = rows(config.PLAYERS_CSV, sep=";")
+            result = {
+                "players": n_players,
+                "workers": workers,
+                "parse_workers": config.PARSE_WORKERS,
+                "faults": asdict(server.faults),
+                "fpedia": {
+                    "expected": len(server.site.fpedia), "scraped": fpedia_rows, "elapsed_s": fpedia_s,
+                    "pages_per_s": fpedia_rows / fpedia_s if fpedia_s > 0 else 0.0,
+                    "telemetry": telemetry(config.FPEDIA_TELEMETRY_FILE),
+                },
+                "fstats": {
+                    "expected": len(server.site.fstats), "downloaded": fstats_rows, "elapsed_s": fstats_s,
+                    "telemetry": telemetry(config.FSTATS_TELEMETRY_FILE),
+                },
+                "server": server.stats()["requests"],
+            }
+        finally:
+            for key, value in saved.items():
+                setattr(config, key, value)
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+    return result
+
+
+def print_load_test(result: dict) -> None:
+    fpedia, fstats = result["fpedia"], result["fstats"]
+    print(f"Mock: {result['players']} giocatori, {result['workers']} thread di rete, "
+          f"{result['parse_workers']} processi di parsing, fault {result['faults']}")
+    print(f"FPEDIA: {fpedia['scraped']}/{fpedia['expected']} pagine in {fpedia['elapsed_s']:.2f}s "
+          f"({fpedia['pages_per_s']:.1f} pagine/s)")
+    print(f"FSTATS: {fstats['downloaded']}/{fstats['expected']} giocatori in {fstats['elapsed_s']:.2f}s")
+    for source in ("fpedia", "fstats"):
+        for kind, s in result[source]["telemetry"].get("by_kind", {}).items():
+            latency = s["latency_ms"]
+            print(f"  {kind:<12} richieste {s['requests']:>6}  ok {s['ok']:>6}  retry {s['retries']:>4}  "
+                  f"429 {s['throttled_429']:>4}  p50 {latency.get('p50', 0):7.1f} ms  p90 {latency.get('p90', 0):7.1f} ms")
+    print(f"Risposte del server per tipo e status: {result['server']}")
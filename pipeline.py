@@ -0,0 +1,165 @@
+# pipeline.py - Esecuzione della pipeline come grafo di dipendenze
+import concurrent.futures
+import os
+from dataclasses import dataclass
+from typing import Callable
+
+from loguru import logger
+
+import config
+import instrumentation
+import stage_cache
+
+
+@dataclass
+class Stage:
+    """
+    A single pipeline step.
+
+    `deps` are the stages whose results are passed positionally to `func`,
+    `after` are ordering-only dependencies whose results are ignored.
+
+    Cached stages are skipped when their fingerprint (fingerprints of `deps`,
+    `config_keys` values and `files` contents, both given as `config` attribute
+    names) matches the last run and all their `outputs` files still exist.
+    """
+
+    name: str
+    func: Callable
+    deps: tuple = ()
+    after: tuple = ()
+    cache: bool = False
+    config_keys: tuple = ()
+    files: tuple = ()
+    outputs: tuple = ()
+
+    @property
+    def upstream(self) -> tuple:
+        return tuple(self.deps) + tuple(self.after)
+
+
+class Pipeline:
+    """
+    Dependency graph of stages executed by a small thread-based scheduler.
+
+    Every stage is submitted as soon as all its upstream stages have finished,
+    so independent branches (FPEDIA / FSTATS / quotazioni) overlap in time.
+    """
+
+    def __init__(self, cache: stage_cache.StageCache | None = None, memory: dict | None = None):
+        self.stages: dict[str, Stage] = {}
+        self.cache = cache
+        # Risultati in memoria per nome stage -> (fingerprint, risultato), condivisi tra più
+        # esecuzioni nello stesso processo (modalità watch): valgono per tutti gli stage
+        self.memory = memory
+        # Provenienza del risultato di ogni stage nell'ultima esecuzione: memoria, cache o eseguito
+        self.sources: dict[str, str] = {}
+
+    def add_stage(self, name: str, func: Callable, deps=(), after=(), **options) -> Stage:
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' already defined")
+        for dep in tuple(deps) + tuple(after):
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        stage = Stage(name, func, tuple(deps), tuple(after), **options)
+        self.stages[name] = stage
+        return stage
+
+    def required_stages(self, targets=None) -> list[str]:
+        """Returns the stages needed to build `targets`, in insertion (topological) order."""
+        if targets is None:
+            return list(self.stages)
+
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.stages:
+                raise KeyError(f"Unknown stage '{name}'")
+            if name in needed:
+                continue
+            needed.add(name)
+            stack.extend(self.stages[name].upstream)
+        return [name for name in self.stages if name in needed]
+
+    def _run_stage(self, stage: Stage, results: dict, fingerprints: dict):
+        fp = stage_cache.fingerprint(
+            stage.name,
+            config_keys=stage.config_keys + stage.outputs,
+            files=stage.files,
+            # Le dipendenze `after` non passano dati: il loro effetto entra tramite `files`
+            upstream=[fingerprints[dep] for dep in stage.deps],
+        )
+
+        use_cache = self.cache is not None and stage.cache
+        outputs_exist = all(os.path.exists(getattr(config, key)) for key in stage.outputs)
+        args = [results[dep] for dep in stage.deps]
+
+        with instrumentation.span(stage.name, inputs=args) as event:
+            in_memory = self.memory is not None and self.memory.get(stage.name, (None,))[0] == fp
+            if in_memory and outputs_exist:
+                logger.debug(f"Stage '{stage.name}': input invariati, uso il risultato in memoria")
+                result = self.memory[stage.name][1]
+                event["cached"] = True
+                self.sources[stage.name] = "memoria"
+            elif use_cache and outputs_exist and self.cache.is_valid(stage.name, fp):
+                logger.info(f"Stage '{stage.name}': input invariati, uso il risultato in cache")
+                result = self.cache.load(stage.name)
+                event["cached"] = True
+                self.sources[stage.name] = "cache"
+            else:
+                result = stage.func(*args)
+                if use_cache:
+                    self.cache.store(stage.name, fp, result)
+                self.sources[stage.name] = "eseguito"
+            if self.memory is not None:
+                self.memory[stage.name] = (fp, result)
+            event["outputs"] = instrumentation.describe(result)
+        return fp, result
+
+    def run(self, targets=None, exclude=(), max_workers: int | None = None) -> dict:
+        """
+        Runs the stages required by `targets` (all stages by default).
+
+        Stages listed in `exclude` are treated as already completed with a
+        `None` result, e.g. to skip the network fetch and work on cached CSVs.
+        Returns a dict stage name -> result.
+        """
+        order = self.required_stages(targets)
+        self.sources = {}
+        results = {name: None for name in exclude if name in self.stages}
+        fingerprints = {name: f"excluded:{name}" for name in results}
+        pending = [name for name in order if name not in results]
+        max_workers = max_workers or config.PIPELINE_MAX_WORKERS
+
+        logger.debug(f"Pipeline: {len(pending)} stage da eseguire con {max_workers} worker")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running = {}
+            while pending or running:
+                # Sottometti tutti gli stage le cui dipendenze sono soddisfatte
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if all(dep in results for dep in stage.upstream):
+                        pending.remove(name)
+                        logger.debug(f"Pipeline: avvio stage '{name}'")
+                        running[executor.submit(self._run_stage, stage, results, fingerprints)] = name
+
+                if not running:
+                    raise RuntimeError(f"Pipeline bloccata, stage non eseguibili: {pending}")
+
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        fingerprints[name], results[name] = future.result()
+                    except Exception as exc:
+                        logger.error(f"Stage '{name}' fallito: {exc}")
+                        for other in running:
+                            other.cancel()
+                        raise
+                    logger.debug(f"Pipeline: stage '{name}' completato")
+
+        return results
@@ -0,0 +1,195 @@
+# projections.py - Proiezioni della prossima stagione con regressioni lineari per ruolo
+# FPEDIA fornisce presenze, gol e assist previsti, FSTATS solo i totali dell'ultima stagione.
+# Qui si stimano regressioni per ruolo (ridge, feature standardizzate) che proiettano presenze,
+# gol, assist e fantamedia di ogni giocatore dalle stagioni precedenti e da xG/xA: le previsioni
+# FPEDIA fanno da etichette per i conteggi, il passaggio fantamedia stagione precedente ->
+# ultima stagione per la fantamedia. Tutti i sistemi (ruolo x obiettivo) sono risolti insieme
+# con un solo np.linalg.solve, e le proiezioni valgono per entrambe le fonti.
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+import config
+import data_unifier
+from instrumentation import traced
+
+RUOLI = ("P", "D", "C", "A")
+FEATURES = ("presenze", "gol", "assist", "xg", "xa", "fantamedia")
+# Obiettivo -> (colonna di output, etichetta FPEDIA o None per la fantamedia, feature usate)
+TARGETS = {
+    "presenze": ("Presenze_Proiettate", "Presenze previste", FEATURES),
+    "gol": ("Gol_Proiettati", "Gol previsti", FEATURES),
+    "assist": ("Assist_Proiettati", "Assist previsti", FEATURES),
+    "fantamedia": ("Fantamedia_Proiettata", None, ("fantamedia",)),
+}
+PROJECTION_COLUMNS = tuple(column for column, _, _ in TARGETS.values())
+
+
+def _numeric(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series(np.nan, index=df.index)
+    return pd.to_numeric(df[column], errors="coerce")
+
+
+def _player_table(df_fpedia: pd.DataFrame, df_fstats: pd.DataFrame) -> pd.DataFrame:
+    """
+    Una riga per giocatore di ciascuna fonte (prima FPEDIA, poi FSTATS) con le feature delle due
+    fonti abbinate sulla chiave cognome + squadra di data_unifier, le etichette FPEDIA e la
+    fantamedia della stagione precedente.
+    """
+    anno = config.ANNO_CORRENTE
+    fp = pd.DataFrame({
+        "chiave": data_unifier.merge_key(df_fpedia, cognome_primo=True) if not df_fpedia.empty else [],
+        "Ruolo": df_fpedia.get("Ruolo", pd.Series(dtype=object)),
+        "fp_presenze": _numeric(df_fpedia, f"Presenze {anno-1}-{anno}"),
+        "fp_fantamedia": _numeric(df_fpedia, f"Fantamedia anno {anno-1}-{anno}"),
+        "fantamedia_prec": _numeric(df_fpedia, f"Fantamedia anno {anno-2}-{anno-1}"),
+        **{label: _numeric(df_fpedia, label) for _, label, _ in TARGETS.values() if label},
+    })
+    fs = pd.DataFrame({
+        "chiave": data_unifier.merge_key(df_fstats, cognome_primo=False) if not df_fstats.empty else [],
+        "Ruolo": df_fstats.get("Ruolo", pd.Series(dtype=object)),
+        "fs_presenze": _numeric(df_fstats, "presences"),
+        "gol": _numeric(df_fstats, "goals"),
+        "assist": _numeric(df_fstats, "assists"),
+        "xg": _numeric(df_fstats, "xgFromOpenPlays"),
+        "xa": _numeric(df_fstats, "xA"),
+        "fs_fantamedia": _numeric(df_fstats, "fanta_avg"),
+    })
+    # Ogni fonte riceve le colonne dell'altra per i giocatori abbinati (prima occorrenza della chiave)
+    fs_cols = [c for c in fs.columns if c not in ("chiave", "Ruolo")]
+    fp_cols = [c for c in fp.columns if c not in ("chiave", "Ruolo")]
+    fp = fp.join(fs.drop_duplicates("chiave").set_index("chiave")[fs_cols], on="chiave")
+    fs = fs.join(fp.drop_duplicates("chiave").set_index("chiave")[fp_cols], on="chiave")
+    fp["fonte"], fs["fonte"] = "fpedia", "FSTATS"
+    table = pd.concat([fp, fs], ignore_index=True)
+
+    table["Ruolo"] = data_unifier.normalize_roles(table[["Ruolo"]].astype(object).fillna(""))["Ruolo"]
+    table["presenze"] = table["fs_presenze"].fillna(table["fp_presenze"])
+    table["fantamedia"] = table["fp_fantamedia"].where(table["fp_fantamedia"] > 0).fillna(table["fs_fantamedia"])
+    return table
+
+
+def _standardize(table: pd.DataFrame, scaling: tuple | None = None) -> tuple[np.ndarray, tuple]:
+    """Matrice delle feature (intercetta + feature standardizzate) e medie/deviazioni usate."""
+    values = table[list(FEATURES)].to_numpy(dtype=np.float64)
+    observed = ~np.isnan(values)
+    # I valori mancanti (es. xG per chi è solo su FPEDIA) prendono la media del ruolo
+    role_means = table[list(FEATURES)].groupby(table["Ruolo"]).transform("mean").to_numpy(dtype=np.float64)
+    values = np.where(observed, values, role_means)
+    values = np.where(np.isnan(values), np.nan_to_num(np.nanmean(values, axis=0)), values)
+    if scaling is None:
+        std = values.std(axis=0)
+        std[std == 0] = 1
+        scaling = (values.mean(axis=0), std)
+    mean, std = scaling
+    return np.column_stack([np.ones(len(values)), (values - mean) / std]), scaling
+
+
+@traced
+def fit_projections(table: pd.DataFrame) -> dict:
+    """
+    Stima i coefficienti di tutti i sistemi ruolo x obiettivo in un solo passo: matrici normali
+    (R*T, k, k) pesate per ruolo e riga valida, ridge sulle feature (non sull'intercetta, così la
+    media per ruolo delle proiezioni coincide con quella delle etichette) e np.linalg.solve batch.
+    I ruoli con meno di PROJECTION_MIN_ROWS righe usano i dati di tutti i ruoli.
+    """
+    X, scaling = _standardize(table)
+    k = X.shape[1]
+    ruoli = table["Ruolo"].to_numpy()
+    in_role = np.stack([ruoli == r for r in RUOLI]).astype(np.float64)  # (R, n)
+    fantamedia_col = 1 + FEATURES.index("fantamedia")
+
+    grams, rhs = [], []
+    for _, label, features in TARGETS.values():
+        mask = np.zeros(k)
+        mask[0] = 1
+        mask[[1 + FEATURES.index(f) for f in features]] = 1
+        design = X * mask
+        if label:
+            y = table[label].to_numpy(dtype=np.float64)
+        else:
+            # Fantamedia: si impara il passaggio stagione precedente -> ultima stagione
+            y = table["fantamedia"].to_numpy(dtype=np.float64)
+            prec = table["fantamedia_prec"].to_numpy(dtype=np.float64)
+            valid_prec = (prec > 0) & (y > 0)
+            design = design.copy()
+            mean, std = scaling[0][FEATURES.index("fantamedia")], scaling[1][FEATURES.index("fantamedia")]
+            design[:, fantamedia_col] = np.where(valid_prec, (prec - mean) / std, 0)
+            y = np.where(valid_prec, y, np.nan)
+        valid = ~np.isnan(y) & (table["fonte"].to_numpy() == "fpedia")
+        weights = in_role * valid  # (R, n)
+        pooled = weights.sum(axis=1) < config.PROJECTION_MIN_ROWS
+        weights[pooled] = valid
+        y = np.where(valid, y, 0.0)
+
+        gram = np.einsum("rn,ni,nj->rij", weights, design, design)
+        penalty = np.diag(np.r_[1e-9, np.full(k - 1, config.PROJECTION_RIDGE)])
+        grams.append(gram + penalty)
+        rhs.append(np.einsum("rn,ni,n->ri", weights, design, y))
+
+    # (T, R, k, k) -> un unico solve batch su R*T sistemi
+    grams, rhs = np.stack(grams), np.stack(rhs)
+    coef = np.linalg.solve(grams.reshape(-1, k, k), rhs.reshape(-1, k, 1)).reshape(len(TARGETS), len(RUOLI), k)
+    return {"coef": coef, "scaling": scaling}
+
+
+@traced
+def predict_projections(table: pd.DataFrame, model: dict) -> pd.DataFrame:
+    """Proiezioni per tutte le righe della tabella, limitate a valori plausibili."""
+    X, _ = _standardize(table, model["scaling"])
+    role_index = table["Ruolo"].map({r: i for i, r in enumerate(RUOLI)})
+    known = role_index.notna().to_numpy()
+    coef = model["coef"][:, role_index.fillna(0).astype(int).to_numpy(), :]  # (T, n, k)
+    predictions = np.einsum("nk,tnk->nt", X, coef)
+    predictions[~known] = np.nan
+
+    out = pd.DataFrame(predictions, columns=list(PROJECTION_COLUMNS), index=table.index)
+    out["Presenze_Proiettate"] = out["Presenze_Proiettate"].clip(0, 38)
+    out["Gol_Proiettati"] = out["Gol_Proiettati"].clip(lower=0)
+    out["Assist_Proiettati"] = out["Assist_Proiettati"].clip(lower=0)
+    # Fantamedia entro l'intervallo osservato nel ruolo
+    fantamedia = table["fantamedia"].where(table["fantamedia"] > 0)
+    low = fantamedia.groupby(table["Ruolo"]).transform("min")
+    high = fantamedia.groupby(table["Ruolo"]).transform("max")
+    out["Fantamedia_Proiettata"] = out["Fantamedia_Proiettata"].clip(low, high)
+    return out.round(2)
+
+
+def project(df_fpedia: pd.DataFrame, df_fstats: pd.DataFrame) -> dict:
+    """
+    Stage della pipeline: proiezioni per i giocatori di entrambe le fonti. Ritorna un DataFrame
+    per fonte ("fpedia", "FSTATS") con le colonne di PROJECTION_COLUMNS, nell'ordine delle righe
+    dell'input (vedi `attach`).
+    """
+    empty = {"fpedia": pd.DataFrame(columns=PROJECTION_COLUMNS), "FSTATS": pd.DataFrame(columns=PROJECTION_COLUMNS)}
+    if df_fpedia.empty:
+        # Senza le etichette FPEDIA non c'è nulla su cui stimare i modelli
+        return empty
+    table = _player_table(df_fpedia, df_fstats)
+    model = fit_projections(table)
+    projections = predict_projections(table, model)
+
+    labelled = table["fonte"] == "fpedia"
+    # Adattamento sulle previsioni FPEDIA (la fantamedia proiettata guarda alla stagione successiva)
+    for column, label, _ in TARGETS.values():
+        if not label:
+            continue
+        target = table[label]
+        valid = labelled & target.notna()
+        residual = ((target - projections[column])[valid] ** 2).sum()
+        total = ((target[valid] - target[valid].mean()) ** 2).sum()
+        logger.debug(f"Proiezione {column}: R² {1 - residual / total if total else 0:.2f} su {valid.sum()} giocatori")
+    logger.info(f"Proiezioni calcolate per {len(table)} righe ({labelled.sum()} FPEDIA, {(~labelled).sum()} FSTATS)")
+
+    return {
+        "fpedia": projections[labelled.to_numpy()].reset_index(drop=True),
+        "FSTATS": projections[~labelled.to_numpy()].reset_index(drop=True),
+    }
+
+
+def attach(df: pd.DataFrame, projections: pd.DataFrame | None) -> pd.DataFrame:
+    """Aggiunge le colonne delle proiezioni (stesso ordine di righe di `project`)."""
+    if projections is None or len(projections) != len(df):
+        return df
+    return df.assign(**{column: projections[column].to_numpy() for column in PROJECTION_COLUMNS})
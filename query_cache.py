@@ -0,0 +1,177 @@
+# query_cache.py - Cache compatta del dataset unificato per query veloci da CLI
+# Il lato lettura usa solo la libreria standard: niente pandas all'avvio.
+import json
+import os
+import re
+
+import config
+
+QUERY_CACHE_VERSION = 1
+
+DEFAULT_COLUMNS = [
+    "Nome", "Squadra", "Ruolo", "quotazione_attuale",
+    "Indice_Aggiustato", "Score_Affare", "Affidabilita_Dati", "Fonte_Dati",
+]
+
+ROLE_ALIASES = {
+    "p": "P", "por": "P", "portiere": "P", "portieri": "P",
+    "d": "D", "dif": "D", "difensore": "D", "difensori": "D",
+    "c": "C", "cen": "C", "centrocampista": "C", "centrocampisti": "C",
+    "a": "A", "att": "A", "attaccante": "A", "attaccanti": "A",
+}
+
+_OPERATORS = {
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+    "!=": lambda a, b: a != b,
+    "==": lambda a, b: a == b,
+    "=": lambda a, b: a == b,
+    ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b,
+}
+_CONDITION_RE = re.compile(r"^\s*([^<>=!]+?)\s*(>=|<=|!=|==|=|>|<)\s*(.+?)\s*$")
+
+
+def write_query_cache(df_unified, path: str = config.QUERY_CACHE_FILE) -> str:
+    """
+    Scrive il dataset unificato in formato colonnare JSON (una lista di valori per colonna),
+    leggibile senza pandas.
+    """
+    from loguru import logger
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df = df_unified.reset_index(drop=True)
+    data = {}
+    for col in df.columns:
+        series = df[col].astype(object).where(df[col].notna(), None)
+        data[str(col)] = series.tolist()
+
+    payload = {"version": QUERY_CACHE_VERSION, "rows": len(df), "columns": list(data), "data": data}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fp:
+        json.dump(payload, fp, ensure_ascii=False, separators=(",", ":"), default=str)
+    os.replace(tmp_path, path)
+
+    logger.info(f"Query cache salvata in: {path} ({len(df)} giocatori)")
+    return path
+
+
+def load_query_cache(path: str = config.QUERY_CACHE_FILE) -> dict:
+    """Legge la cache; solleva FileNotFoundError se la pipeline non è ancora stata eseguita."""
+    with open(path, "r", encoding="utf-8") as fp:
+        payload = json.load(fp)
+    if payload.get("version") != QUERY_CACHE_VERSION:
+        raise ValueError(f"Versione della query cache non supportata: {payload.get('version')}")
+    return payload
+
+
+def normalize_role(ruolo: str) -> str:
+    return ROLE_ALIASES.get(ruolo.strip().lower(), ruolo.strip().upper())
+
+
+def parse_condition(condition: str) -> tuple:
+    """Converte 'Affidabilita_Dati>=70' in ('Affidabilita_Dati', '>=', 70.0)."""
+    match = _CONDITION_RE.match(condition)
+    if not match:
+        raise ValueError(f"Condizione non valida: '{condition}' (atteso es. 'Score_Affare>=50')")
+    column, op, value = match.groups()
+    try:
+        value = float(value)
+    except ValueError:
+        pass
+    return column, op, value
+
+
+def matches(value, op: str, target) -> bool:
+    if value is None:
+        return False
+    try:
+        return _OPERATORS[op](value, target)
+    except TypeError:
+        return False
+
+
+def sort_rows(rows, values, ascending: bool = False) -> list[int]:
+    """
+    Ordina le righe per valore anche su colonne miste: prima i numeri, poi i testi (mai
+    confrontati tra loro), in fondo i mancanti, qualunque sia la direzione.
+    """
+    numbers = [i for i in rows if values[i] is not None and not isinstance(values[i], str)]
+    texts = [i for i in rows if isinstance(values[i], str)]
+    missing = [i for i in rows if values[i] is None]
+    numbers.sort(key=values.__getitem__, reverse=not ascending)
+    texts.sort(key=values.__getitem__, reverse=not ascending)
+    return numbers + texts + missing
+
+
+def query(
+    payload: dict,
+    ruolo=None,
+    squadra=None,
+    min_prezzo=None,
+    max_prezzo=None,
+    fonte=None,
+    conditions=(),
+    sort_by: str = "Score_Affare",
+    ascending: bool = False,
+    limit: int | None = 10,
+) -> list[int]:
+    """
+    Filtra e ordina le righe della cache. Ritorna gli indici delle righe selezionate.
+    """
+    data = payload["data"]
+    filters = [parse_condition(c) if isinstance(c, str) else tuple(c) for c in conditions]
+    for column, _, _ in filters:
+        if column not in data:
+            raise KeyError(f"Colonna sconosciuta: '{column}'")
+
+    predicates = [(data[column], lambda v, op=op, t=target: matches(v, op, t)) for column, op, target in filters]
+    if ruolo:
+        ruoli = {normalize_role(r) for r in ([ruolo] if isinstance(ruolo, str) else ruolo)}
+        predicates.append((data.get("Ruolo"), lambda v: v in ruoli))
+    if squadra:
+        team = squadra.strip().lower()
+        predicates.append((data.get("Squadra"), lambda v: v is not None and str(v).lower() == team))
+    if fonte:
+        source = fonte.strip().lower()
+        predicates.append((data.get("Fonte_Dati"), lambda v: v is not None and source in str(v).lower()))
+    if min_prezzo is not None:
+        low = float(min_prezzo)
+        predicates.append((data.get("quotazione_attuale"), lambda v: matches(v, ">=", low)))
+    if max_prezzo is not None:
+        high = float(max_prezzo)
+        predicates.append((data.get("quotazione_attuale"), lambda v: matches(v, "<=", high)))
+
+    if any(values is None for values, _ in predicates):
+        return []
+    selected = [
+        i for i in range(payload["rows"])
+        if all(predicate(values[i]) for values, predicate in predicates)
+    ]
+
+    if sort_by:
+        if sort_by not in data:
+            raise KeyError(f"Colonna di ordinamento sconosciuta: '{sort_by}'")
+        selected = sort_rows(selected, data[sort_by], ascending)
+
+    return selected[:limit] if limit else selected
+
+
+def format_table(payload: dict, indices: list[int], columns: list[str]) -> str:
+    """Tabella testuale allineata per l'output della CLI."""
+    data = payload["data"]
+    columns = [c for c in columns if c in data]
+
+    def fmt(value):
+        if value is None:
+            return "-"
+        if isinstance(value, float):
+            return f"{value:.1f}"
+        return str(value)
+
+    rows = [[fmt(data[c][i]) for c in columns] for i in indices]
+    widths = [max([len(c)] + [len(r[j]) for r in rows]) for j, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    lines.extend("  ".join(v.ljust(w) for v, w in zip(r, widths)) for r in rows)
+    return "\n".join(lines)
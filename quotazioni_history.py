@@ -0,0 +1,245 @@
+# quotazioni_history.py - Storico append-only degli snapshot delle quotazioni
+# Ogni snapshot (file settimanale, anche di stagioni diverse) diventa un segmento colonnare
+# `.npz` per (stagione, data) che contiene solo le righe cambiate rispetto allo stato
+# precedente. Lo stato a una data si ricostruisce con l'ultima riga nota per giocatore;
+# delta, momentum e trend FVM sono calcolati su matrici giocatori x snapshot.
+import os
+import re
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+import config
+import quotazioni_loader
+
+NUMERIC_COLUMNS = (
+    "quotazione_attuale", "quotazione_iniziale", "quotazione_attuale_mantra",
+    "fantavoto_medio", "fantavoto_medio_mantra",
+)
+TEXT_COLUMNS = ("nome", "squadra", "ruolo_singolo", "ruolo_mantra")
+TRACKED_COLUMNS = NUMERIC_COLUMNS + TEXT_COLUMNS
+
+
+def season_from_path(path: str) -> str:
+    """Stagione dal nome del file (es. ..._2025_26.xlsx -> '2025_26'), altrimenti quella corrente."""
+    match = re.search(r"(20\d{2})[_-](\d{2})(?!\d)", os.path.basename(path))
+    if match:
+        return f"{match.group(1)}_{match.group(2)}"
+    return f"{config.ANNO_CORRENTE}_{str(config.ANNO_CORRENTE + 1)[-2:]}"
+
+
+def date_from_path(path: str) -> date:
+    """Data dello snapshot dal nome del file (YYYY-MM-DD o YYYYMMDD), altrimenti la data di modifica."""
+    name = os.path.basename(path)
+    match = re.search(r"(20\d{2})-?(\d{2})-?(\d{2})(?!\d)", name)
+    if match:
+        try:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(path)).date()
+
+
+def _segment_path(history_dir: str, stagione: str, snapshot: date) -> str:
+    return os.path.join(history_dir, stagione, f"{snapshot.isoformat()}.npz")
+
+
+def snapshot_dates(stagione: str, history_dir: str = config.QUOTAZIONI_HISTORY_DIR) -> list[date]:
+    season_dir = os.path.join(history_dir, stagione)
+    if not os.path.isdir(season_dir):
+        return []
+    return sorted(date.fromisoformat(f[:-4]) for f in os.listdir(season_dir) if f.endswith(".npz"))
+
+
+def seasons(history_dir: str = config.QUOTAZIONI_HISTORY_DIR) -> list[str]:
+    if not os.path.isdir(history_dir):
+        return []
+    return sorted(d for d in os.listdir(history_dir) if snapshot_dates(d, history_dir))
+
+
+def load_history(stagione: str, history_dir: str = config.QUOTAZIONI_HISTORY_DIR) -> pd.DataFrame:
+    """Tutte le righe memorizzate di una stagione, ordinate per data."""
+    frames = []
+    for snapshot in snapshot_dates(stagione, history_dir):
+        with np.load(_segment_path(history_dir, stagione, snapshot), allow_pickle=False) as segment:
+            frame = pd.DataFrame({key: segment[key] for key in segment.files})
+        frame["data"] = pd.Timestamp(snapshot)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=["id_giocatore", "data", "presente", *TRACKED_COLUMNS])
+    return pd.concat(frames, ignore_index=True)
+
+
+def state_at(history: pd.DataFrame, when=None) -> pd.DataFrame:
+    """Ultima riga nota per giocatore alla data `when` (inclusa; default: fine dello storico)."""
+    if when is not None:
+        history = history[history["data"] <= pd.Timestamp(when)]
+    return history.drop_duplicates("id_giocatore", keep="last").set_index("id_giocatore")
+
+
+def _normalize_snapshot(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.dropna(subset=["id_giocatore"]).drop_duplicates("id_giocatore", keep="last")
+    out = pd.DataFrame({"id_giocatore": df["id_giocatore"].astype("int64").to_numpy()})
+    for col in NUMERIC_COLUMNS:
+        values = df[col] if col in df.columns else np.nan
+        # Stessa precisione dei segmenti, così i valori invariati risultano uguali
+        out[col] = pd.to_numeric(pd.Series(values, index=df.index), errors="coerce").to_numpy(dtype="float32")
+    for col in TEXT_COLUMNS:
+        values = df[col] if col in df.columns else ""
+        out[col] = pd.Series(values, index=df.index).fillna("").astype(str).str.strip().to_numpy()
+    return out.set_index("id_giocatore")
+
+
+def changed_rows(snapshot: pd.DataFrame, previous: pd.DataFrame) -> pd.DataFrame:
+    """
+    Righe da memorizzare per un nuovo snapshot rispetto allo stato precedente: giocatori nuovi,
+    con almeno un valore cambiato, rientrati, e usciti dal listone (riga con presente=False).
+    """
+    snapshot = snapshot.assign(presente=True)
+    if previous.empty:
+        return snapshot.reset_index()
+
+    common = snapshot.index.intersection(previous.index)
+    new = snapshot.index.difference(previous.index)
+    cur, prev = snapshot.loc[common], previous.loc[common]
+
+    changed = ~prev["presente"].to_numpy(dtype=bool)
+    for col in NUMERIC_COLUMNS:
+        a, b = cur[col].to_numpy(dtype="float64"), prev[col].to_numpy(dtype="float64")
+        changed |= ~((a == b) | (np.isnan(a) & np.isnan(b)))
+    for col in TEXT_COLUMNS:
+        changed |= cur[col].to_numpy() != prev[col].to_numpy()
+
+    gone = previous.index[previous["presente"].to_numpy(dtype=bool)].difference(snapshot.index)
+    removed = previous.loc[gone, list(TRACKED_COLUMNS)].assign(presente=False)
+
+    rows = pd.concat([snapshot.loc[new], cur[changed], removed])
+    return rows.reset_index().sort_values("id_giocatore", kind="stable")
+
+
+def ingest_snapshot(df_quotazioni: pd.DataFrame, snapshot: date, stagione: str,
+                    history_dir: str = config.QUOTAZIONI_HISTORY_DIR) -> int:
+    """
+    Aggiunge uno snapshot (formato di `load_quotazioni`) allo storico e ritorna le righe scritte.
+    Si può riscrivere l'ultima data (correzioni) ma non inserire date precedenti: le righe non
+    cambiate non sono memorizzate, quindi uno snapshot retrodatato altererebbe gli stati successivi.
+    """
+    dates = snapshot_dates(stagione, history_dir)
+    if dates and snapshot < dates[-1]:
+        raise ValueError(
+            f"Snapshot {snapshot} anteriore all'ultimo dello storico {stagione} ({dates[-1]})"
+        )
+
+    history = load_history(stagione, history_dir)
+    previous = state_at(history[history["data"] < pd.Timestamp(snapshot)])
+    rows = changed_rows(_normalize_snapshot(df_quotazioni), previous)
+
+    path = _segment_path(history_dir, stagione, snapshot)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    columns = {"id_giocatore": rows["id_giocatore"].to_numpy(dtype="int32"),
+               "presente": rows["presente"].to_numpy(dtype=bool)}
+    columns.update({col: rows[col].to_numpy(dtype="float32") for col in NUMERIC_COLUMNS})
+    columns.update({col: rows[col].to_numpy(dtype=str) for col in TEXT_COLUMNS})
+    # Scrittura atomica: il segmento compare solo quando è completo
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as fp:
+        np.savez_compressed(fp, **columns)
+    os.replace(tmp_path, path)
+
+    logger.info(
+        f"Storico quotazioni {stagione}: snapshot {snapshot} con {len(rows)} righe cambiate "
+        f"su {len(df_quotazioni)}"
+    )
+    return len(rows)
+
+
+def ingest_file(path: str, snapshot: date | None = None, stagione: str | None = None,
+                history_dir: str = config.QUOTAZIONI_HISTORY_DIR) -> int:
+    """Legge un file quotazioni (xlsx del listone) e lo aggiunge allo storico."""
+    df = quotazioni_loader.load_quotazioni(path)
+    if df.empty:
+        raise ValueError(f"Nessuna quotazione letta da {path}")
+    return ingest_snapshot(df, snapshot or date_from_path(path), stagione or season_from_path(path), history_dir)
+
+
+def panel(history: pd.DataFrame, column: str, dates: list | None = None) -> pd.DataFrame:
+    """
+    Matrice giocatori x snapshot di `column`, con i valori non cambiati propagati in avanti.
+    I giocatori non presenti in uno snapshot (non ancora in listone o usciti) valgono NaN.
+    """
+    dates = pd.DatetimeIndex(dates if dates is not None else sorted(history["data"].unique()))
+    values = history.pivot(index="id_giocatore", columns="data", values=column).reindex(columns=dates)
+    present = history.pivot(index="id_giocatore", columns="data", values="presente").reindex(columns=dates)
+    present = present.astype("float64").ffill(axis=1)
+    return values.ffill(axis=1).where(present == 1)
+
+
+def _slope_per_week(values: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """Pendenza dei minimi quadrati per riga (unità per settimana), ignorando i NaN."""
+    mask = ~np.isnan(values)
+    counts = mask.sum(axis=1)
+    x = np.where(mask, days / 7.0, 0.0)
+    y = np.where(mask, values, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = x.sum(axis=1) / counts
+        y_mean = y.sum(axis=1) / counts
+        dx = np.where(mask, x - x_mean[:, None], 0.0)
+        dy = np.where(mask, y - y_mean[:, None], 0.0)
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+    return np.where(counts >= 2, slope, np.nan)
+
+
+def trends(stagione: str | None = None, window: int = config.QUOTAZIONI_TREND_WINDOW,
+           history_dir: str = config.QUOTAZIONI_HISTORY_DIR) -> pd.DataFrame:
+    """
+    Trend di prezzo e FVM di tutti i giocatori all'ultimo snapshot della stagione:
+    delta rispetto allo snapshot precedente, a `window` snapshot prima e a inizio storico,
+    momentum (pendenza per settimana sugli ultimi `window` snapshot) per quotazione e FVM.
+    """
+    if stagione is None:
+        available = seasons(history_dir)
+        if not available:
+            return pd.DataFrame()
+        stagione = available[-1]
+    dates = snapshot_dates(stagione, history_dir)
+    history = load_history(stagione, history_dir)
+    if history.empty:
+        return pd.DataFrame()
+
+    timestamps = [pd.Timestamp(d) for d in dates]
+    qa_panel = panel(history, "quotazione_attuale", timestamps)
+    qa = qa_panel.to_numpy(dtype="float64")
+    fvm = panel(history, "fantavoto_medio", timestamps).to_numpy(dtype="float64")
+    days = np.array([(d - dates[0]).days for d in dates], dtype="float64")
+
+    last = qa[:, -1]
+    back = min(window, len(dates) - 1)
+    first_idx = np.argmax(~np.isnan(qa), axis=1)
+    first = qa[np.arange(len(qa)), first_idx]
+    recent = slice(len(dates) - back - 1, len(dates))
+
+    state = state_at(history)
+    ids = qa_panel.index
+    out = pd.DataFrame({
+        "nome": state.loc[ids, "nome"].to_numpy(),
+        "ruolo": state.loc[ids, "ruolo_singolo"].to_numpy(),
+        "squadra": state.loc[ids, "squadra"].to_numpy(),
+        "presente": state.loc[ids, "presente"].to_numpy(dtype=bool),
+        "quotazione_attuale": last,
+        "delta_ultimo": last - qa[:, -2] if len(dates) > 1 else np.nan,
+        "delta_finestra": last - qa[:, -back - 1] if back else np.nan,
+        "delta_stagione": last - first,
+        "momentum": _slope_per_week(qa[:, recent], days[recent]),
+        "fantavoto_medio": fvm[:, -1],
+        "delta_fvm_finestra": fvm[:, -1] - fvm[:, -back - 1] if back else np.nan,
+        "momentum_fvm": _slope_per_week(fvm[:, recent], days[recent]),
+        "snapshot": (~np.isnan(qa)).sum(axis=1),
+    }, index=ids)
+    out.index.name = "id_giocatore"
+    # I segmenti sono in float32: si arrotonda per non mostrare artefatti come 28.799999
+    numeric = out.select_dtypes("float").columns
+    out[numeric] = out[numeric].round(2)
+    out.attrs.update({"stagione": stagione, "dal": dates[0].isoformat(), "al": dates[-1].isoformat()})
+    return out.sort_values("momentum", ascending=False, na_position="last")
@@ -3,15 +3,35 @@ import pandas as pd
 import os
 from loguru import logger
 import config
+from instrumentation import traced
 
-def load_quotazioni() -> pd.DataFrame:
+# Colonne delle quotazioni usate per formato di gioco, rinominate ai nomi attesi dai calcoli
+COLONNE_FORMATO = {
+    "classic": {
+        "quotazione_attuale": "quotazione_attuale",
+        "quotazione_iniziale": "quotazione_iniziale",
+        "fantavoto_medio": "fantavoto_medio",
+    },
+    "mantra": {
+        "quotazione_attuale_mantra": "quotazione_attuale",
+        "quotazione_iniziale_mantra": "quotazione_iniziale",
+        "fantavoto_medio_mantra": "fantavoto_medio",
+        "ruolo_mantra": "ruolo_mantra",
+    },
+}
+
+@traced
+def load_quotazioni(quotazioni_file: str | None = None) -> pd.DataFrame:
     """
     Carica il file delle quotazioni ufficiali del fantacalcio.
     
+    Args:
+        quotazioni_file: percorso del file (default: config.QUOTAZIONI_FILE)
+
     Returns:
         DataFrame con le quotazioni o DataFrame vuoto se il file non esiste
     """
-    quotazioni_file = os.path.join(config.DATA_DIR, "Quotazioni_Fantacalcio_Stagione_2025_26.xlsx")
+    quotazioni_file = quotazioni_file or config.QUOTAZIONI_FILE
     
     if not os.path.exists(quotazioni_file):
         logger.warning(f"File quotazioni non trovato: {quotazioni_file}")
@@ -43,7 +63,8 @@ def load_quotazioni() -> pd.DataFrame:
         df['nome_normalizzato'] = df['nome'].str.strip().str.lower()
         
         # Converti quotazioni in numerico
-        numeric_cols = ['quotazione_attuale', 'quotazione_iniziale', 
+        numeric_cols = ['quotazione_attuale', 'quotazione_iniziale',
+                       'quotazione_attuale_mantra', 'quotazione_iniziale_mantra',
                        'fantavoto_medio', 'fantavoto_medio_mantra']
         for col in numeric_cols:
             if col in df.columns:
@@ -59,17 +80,24 @@ def load_quotazioni() -> pd.DataFrame:
         return pd.DataFrame()
 
 
-def merge_with_quotazioni(df_players: pd.DataFrame, df_quotazioni: pd.DataFrame) -> pd.DataFrame:
+@traced
+def merge_with_quotazioni(df_players: pd.DataFrame, df_quotazioni: pd.DataFrame,
+                          formato: str = "classic") -> pd.DataFrame:
     """
     Unisce i dati dei giocatori con le quotazioni ufficiali.
     
     Args:
         df_players: DataFrame con i dati dei giocatori (FPEDIA o FSTATS)
         df_quotazioni: DataFrame con le quotazioni ufficiali
+        formato: "classic" o "mantra"; con "mantra" quotazioni e FVM Mantra prendono
+            il posto di quelli Classic (stessi nomi di colonna) e si aggiunge `ruolo_mantra`
         
     Returns:
         DataFrame unito con le quotazioni
     """
+    if formato not in COLONNE_FORMATO:
+        raise ValueError(f"Formato non valido: {formato!r} (attesi: {', '.join(COLONNE_FORMATO)})")
+
     if df_quotazioni.empty:
         logger.warning("DataFrame quotazioni vuoto, skip del merge")
         df_players['quotazione_attuale'] = 10  # Default fallback
@@ -86,8 +114,8 @@ def merge_with_quotazioni(df_players: pd.DataFrame, df_quotazioni: pd.DataFrame)
         return df_players
     
     # Prepara un subset delle quotazioni con solo le colonne necessarie
-    quotazioni_subset = df_quotazioni[['nome_normalizzato', 'quotazione_attuale', 
-                                       'quotazione_iniziale', 'fantavoto_medio']].copy()
+    colonne = COLONNE_FORMATO[formato]
+    quotazioni_subset = df_quotazioni[['nome_normalizzato', *colonne]].rename(columns=colonne)
     
     # Merge sui nomi normalizzati
     df_merged = df_players.merge(
@@ -0,0 +1,114 @@
+# report_writer.py - Salvataggio dei report Excel per le singole fonti
+import pandas as pd
+from loguru import logger
+import config
+import scoring_formulas
+from instrumentation import traced
+
+
+FPEDIA_OUTPUT_COLUMNS = [
+    "Nome", "Ruolo", "Squadra",
+    "quotazione_attuale", "Valore_su_Prezzo", "Convenienza", "Convenienza Potenziale", "fantavoto_medio",
+    f"Fantamedia anno {config.ANNO_CORRENTE-1}-{config.ANNO_CORRENTE}",
+    f"Presenze {config.ANNO_CORRENTE-1}-{config.ANNO_CORRENTE}",
+    f"FM su tot gare {config.ANNO_CORRENTE-1}-{config.ANNO_CORRENTE}",
+    "Presenze campionato corrente",
+    f"Fantamedia anno {config.ANNO_CORRENTE-2}-{config.ANNO_CORRENTE-1}",
+    "Presenze previste", "Gol previsti", "Assist previsti",
+    "Convenienza_Proiettata", "Presenze_Proiettate", "Gol_Proiettati", "Assist_Proiettati", "Fantamedia_Proiettata",
+    "Punteggio", "Trend", "Skills",
+    "Buon investimento", "Resistenza infortuni",
+    "Infortunato", "Nuovo acquisto",
+]
+
+LEAGUE_OUTPUT_COLUMNS = [
+    "Nome", "Ruolo", "ruolo_mantra", "Squadra",
+    "quotazione_attuale", "Prezzo_Lega", "Offerta_Max", "Score_Lega", "Rank_Ruolo",
+    "Score_Affare", "Valore_su_Prezzo", "Convenienza", "Convenienza Potenziale",
+    "Affidabilita_Dati", "Fonte_Dati",
+]
+
+FSTATS_OUTPUT_COLUMNS = [
+    "Nome", "Ruolo", "Squadra",
+    "quotazione_attuale", "Valore_su_Prezzo", "Convenienza", "Convenienza Potenziale", "fantavoto_medio",
+    "fantacalcioFantaindex", "fanta_avg", "avg", "presences",
+    "goals", "assists", "xgFromOpenPlays", "xA",
+    "yellowCards", "redCards",
+    "Convenienza_Proiettata", "Presenze_Proiettate", "Gol_Proiettati", "Assist_Proiettati", "Fantamedia_Proiettata",
+]
+
+
+def _with_custom(columns: list, group: str) -> list:
+    """Colonne del report più gli indici aggiunti da SCORING_FORMULAS_FILE."""
+    return columns + [c for c in scoring_formulas.load_formulas().outputs(group) if c not in columns]
+
+
+@traced
+def save_fpedia_excel(df_fpedia_final: pd.DataFrame, output_path: str = config.FPEDIA_OUTPUT_EXCEL) -> str:
+    """
+    Salva l'analisi FPEDIA: foglio completo, Top30 per ruolo e occasioni (top 20% Valore_su_Prezzo).
+    """
+    final_columns = [col for col in _with_custom(FPEDIA_OUTPUT_COLUMNS, "fpedia") if col in df_fpedia_final.columns]
+
+    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        df_fpedia_final[final_columns].to_excel(writer, sheet_name='Tutti', index=False)
+
+        for ruolo in ['P', 'D', 'C', 'A']:
+            df_ruolo = df_fpedia_final[df_fpedia_final['Ruolo'] == ruolo].head(30)
+            if not df_ruolo.empty:
+                df_ruolo[final_columns].to_excel(writer, sheet_name=f'{ruolo}_Top30', index=False)
+
+        df_occasioni = df_fpedia_final[df_fpedia_final['Valore_su_Prezzo'] > df_fpedia_final['Valore_su_Prezzo'].quantile(0.8)]
+        df_occasioni[final_columns].to_excel(writer, sheet_name='Occasioni', index=False)
+
+    logger.info(f"✅ FPEDIA analysis salvata in: {output_path}")
+    return output_path
+
+
+@traced
+def save_FSTATS_excel(df_fstats_final: pd.DataFrame, output_path: str = config.FSTATS_OUTPUT_EXCEL) -> str:
+    """
+    Salva l'analisi FSTATS: foglio completo e Top30 per ruolo.
+    """
+    final_columns = [col for col in _with_custom(FSTATS_OUTPUT_COLUMNS, "FSTATS") if col in df_fstats_final.columns]
+
+    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        df_fstats_final[final_columns].to_excel(writer, sheet_name='Tutti', index=False)
+
+        for ruolo in ['P', 'D', 'C', 'A']:
+            df_ruolo = df_fstats_final[df_fstats_final['Ruolo'] == ruolo].head(30)
+            if not df_ruolo.empty:
+                df_ruolo[final_columns].to_excel(writer, sheet_name=f'{ruolo}_Top30', index=False)
+
+    logger.info(f"✅ FSTATS analysis salvata in: {output_path}")
+    return output_path
+
+
+@traced
+def save_league_excel(df_ranked: pd.DataFrame, df_rosa: pd.DataFrame, league, output_path: str) -> str:
+    """
+    Salva il report di una lega: classifica completa, shortlist per ruolo
+    (tre volte gli slot della rosa), rosa consigliata e impostazioni della lega.
+    """
+    final_columns = [col for col in LEAGUE_OUTPUT_COLUMNS if col in df_ranked.columns]
+
+    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        df_ranked[final_columns].to_excel(writer, sheet_name='Classifica', index=False)
+
+        for ruolo, slots in league.rosa.items():
+            df_ruolo = df_ranked[df_ranked['Ruolo'] == ruolo].head(slots * 3)
+            if not df_ruolo.empty:
+                df_ruolo[final_columns].to_excel(writer, sheet_name=f'{ruolo}_Shortlist', index=False)
+
+        df_rosa[final_columns].to_excel(writer, sheet_name='Rosa_Consigliata', index=False)
+
+        impostazioni = [
+            ("Lega", league.nome), ("Formato", league.formato), ("Budget", league.budget),
+            *((f"Rosa {r}", n) for r, n in league.rosa.items()),
+            *((f"Budget {r}", round(q * league.budget)) for r, q in league.ripartizione.items()),
+            *((f"Peso {c}", p) for c, p in league.pesi.items()),
+        ]
+        pd.DataFrame(impostazioni, columns=['Parametro', 'Valore']).to_excel(writer, sheet_name='Impostazioni', index=False)
+
+    logger.info(f"✅ Report lega '{league.nome}' salvato in: {output_path}")
+    return output_path
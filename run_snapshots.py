@@ -0,0 +1,177 @@
+# run_snapshots.py - Snapshot delle classifiche di ogni esecuzione e diff tra due esecuzioni
+# Ogni esecuzione salva un .npz compatto (senza pickle) con le colonne del dataset, un hash della
+# chiave e un hash di riga per ogni giocatore. Il confronto tra due snapshot è un solo hash join
+# sulle chiavi: le righe con lo stesso hash di riga sono scartate subito, e solo quelle cambiate
+# vengono confrontate colonna per colonna. Le leghe di `batch` hanno ognuna i propri snapshot.
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import config
+
+KEY_COLUMNS = ("Nome", "Squadra")
+UNIFIED = "unificato"
+
+
+def _normalize(df: pd.DataFrame) -> dict:
+    """Colonne come float64 (NaN = mancante) o stringhe con maschera dei valori presenti."""
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            columns[str(column)] = (series.to_numpy(dtype=np.float64, na_value=np.nan), None)
+        else:
+            present = series.notna().to_numpy()
+            values = np.where(present, series.astype(str).to_numpy(), "")
+            columns[str(column)] = (values.astype(str), present)
+    return columns
+
+
+def _hash_rows(columns: dict, names) -> np.ndarray:
+    frame = pd.DataFrame({
+        name: pd.Series(values).where(mask) if mask is not None else values
+        for name, (values, mask) in ((n, columns[n]) for n in names)
+    })
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def write_snapshot(df: pd.DataFrame, scope: str = UNIFIED, rank_columns=config.RUN_SNAPSHOT_RANKS,
+                   snapshot_dir: str | None = None) -> str:
+    """
+    Salva lo snapshot di una classifica (una riga per giocatore). Le colonne in `rank_columns`
+    aggiungono la posizione in classifica `Rank_<colonna>` (1 = migliore).
+    """
+    snapshot_dir = os.path.join(snapshot_dir or config.RUN_SNAPSHOT_DIR, scope)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    df = df.reset_index(drop=True)
+    ranks = {
+        f"Rank_{c}": pd.to_numeric(df[c], errors="coerce").rank(ascending=False, method="min")
+        for c in rank_columns if c in df.columns
+    }
+    df = df.assign(**ranks)
+
+    keys = df[list(KEY_COLUMNS)].astype(str)
+    # Omonimi nella stessa squadra: l'ordine di comparsa distingue le righe
+    keys["_n"] = keys.groupby(list(KEY_COLUMNS)).cumcount()
+    columns = _normalize(df)
+
+    arrays = {
+        "key_hash": pd.util.hash_pandas_object(keys, index=False).to_numpy(),
+        "row_hash": _hash_rows(columns, columns),
+        "columns": np.array(list(columns), dtype=str),
+    }
+    for i, (values, mask) in enumerate(columns.values()):
+        arrays[f"v{i}"] = values
+        if mask is not None:
+            arrays[f"m{i}"] = mask
+
+    name = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    path = os.path.join(snapshot_dir, f"{name}.npz")
+    with open(f"{path}.tmp", "wb") as fp:
+        np.savez_compressed(fp, **arrays)
+    os.replace(f"{path}.tmp", path)
+
+    existing = list_snapshots(scope, snapshot_dir=os.path.dirname(snapshot_dir))
+    for old in existing[:-config.RUN_SNAPSHOT_KEEP]:
+        os.remove(os.path.join(snapshot_dir, f"{old}.npz"))
+    return path
+
+
+def list_snapshots(scope: str = UNIFIED, snapshot_dir: str | None = None) -> list[str]:
+    """Nomi degli snapshot di una classifica, dal più vecchio."""
+    directory = os.path.join(snapshot_dir or config.RUN_SNAPSHOT_DIR, scope)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(f[:-4] for f in os.listdir(directory) if f.endswith(".npz"))
+
+
+def load_snapshot(name: str, scope: str = UNIFIED, snapshot_dir: str | None = None) -> dict:
+    """Legge uno snapshot per nome (o percorso): hash, nomi delle colonne e valori."""
+    path = name if name.endswith(".npz") else os.path.join(snapshot_dir or config.RUN_SNAPSHOT_DIR, scope, f"{name}.npz")
+    with np.load(path, allow_pickle=False) as data:
+        names = [str(c) for c in data["columns"]]
+        return {
+            "name": os.path.basename(path)[:-4],
+            "key_hash": data["key_hash"],
+            "row_hash": data["row_hash"],
+            "columns": {
+                c: (data[f"v{i}"], data[f"m{i}"] if f"m{i}" in data else None) for i, c in enumerate(names)
+            },
+        }
+
+
+def _value(column: tuple, i: int):
+    values, mask = column
+    if mask is not None:
+        return str(values[i]) if mask[i] else None
+    value = values[i]
+    return None if value != value else float(value)
+
+
+def diff_snapshots(old: dict, new: dict, columns=None, min_rank_move: int = config.RUN_DIFF_MIN_RANK_MOVE) -> dict:
+    """
+    Confronta due snapshot con un hash join sulle chiavi. Ritorna le righe dei giocatori
+    aggiunti e rimossi (colonne chiave) e, per i cambiati, una riga per colonna modificata
+    con valore precedente, nuovo e differenza (per le colonne numeriche). Gli spostamenti in
+    classifica sotto `min_rank_move` posizioni (effetto dei cambiamenti altrui) sono ignorati;
+    i giocatori con valori cambiati vengono prima, poi quelli con gli spostamenti più ampi.
+    """
+    matches = pd.Index(old["key_hash"]).get_indexer(new["key_hash"])
+    found = matches >= 0
+    removed = np.ones(len(old["key_hash"]), dtype=bool)
+    removed[matches[found]] = False
+
+    common = [c for c in new["columns"] if c in old["columns"] and (columns is None or c in columns)]
+    same_layout = list(old["columns"]) == list(new["columns"])
+    candidates = np.flatnonzero(found)
+    if same_layout:
+        # Stesso hash di riga = giocatore invariato: si confrontano solo le righe rimaste
+        candidates = candidates[new["row_hash"][candidates] != old["row_hash"][matches[candidates]]]
+    previous = matches[candidates]
+
+    changes = []
+    for column in common:
+        (a, mask_a), (b, mask_b) = old["columns"][column], new["columns"][column]
+        before, after = a[previous], b[candidates]
+        if (mask_a is None) != (mask_b is None):
+            continue
+        if mask_a is None:
+            differ = ~((before == after) | (np.isnan(before) & np.isnan(after)))
+        else:
+            differ = (before != after) | (mask_a[previous] != mask_b[candidates])
+        for i, j in zip(candidates[differ], previous[differ]):
+            prima, dopo = _value(old["columns"][column], j), _value(new["columns"][column], i)
+            delta = dopo - prima if mask_a is None and prima is not None and dopo is not None else None
+            changes.append({"riga": i, "colonna": column, "prima": prima, "dopo": dopo, "delta": delta})
+
+    def keys(snapshot: dict, rows) -> pd.DataFrame:
+        return pd.DataFrame({c: [_value(snapshot["columns"][c], i) for i in rows] for c in KEY_COLUMNS if c in snapshot["columns"]})
+
+    changed = pd.DataFrame(changes, columns=["riga", "colonna", "prima", "dopo", "delta"])
+    # Solo colonne di testo cambiate: delta tutto None, che deve restare una colonna float
+    changed["delta"] = pd.to_numeric(changed["delta"]).astype(float)
+    rank = changed["colonna"].str.startswith("Rank_")
+    changed = changed[~(rank & (changed["delta"].abs() < min_rank_move))]
+    if len(changed):
+        rank = changed["colonna"].str.startswith("Rank_")
+        order = pd.DataFrame({
+            "valori": (~rank).groupby(changed["riga"]).any(),
+            "spostamento": changed["delta"].where(rank).abs().groupby(changed["riga"]).max().fillna(0),
+        }).sort_values(["valori", "spostamento"], ascending=False, kind="stable")
+        changed = changed.set_index("riga").loc[order.index].reset_index()
+    players = keys(new, changed["riga"].to_numpy())
+    changed = pd.concat([players, changed.drop(columns="riga").reset_index(drop=True)], axis=1)
+    return {
+        "added": keys(new, np.flatnonzero(~found)),
+        "removed": keys(old, np.flatnonzero(removed)),
+        "changed": changed,
+    }
+
+
+def snapshot_stage(df_unified: pd.DataFrame):
+    """Stage della pipeline: snapshot del dataset unificato (solo quando il risultato cambia)."""
+    if df_unified.empty:
+        return None
+    return write_snapshot(df_unified)
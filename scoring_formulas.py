@@ -0,0 +1,427 @@
+# scoring_formulas.py - Formule di punteggio dichiarate in configurazione
+# Gli indici di convenienza di FPEDIA e FSTATS e l'Indice_Aggiustato del dataset unificato sono
+# espressioni sulle colonne, con condizioni per ruolo e fascia di prezzo. DEFAULT_FORMULAS contiene
+# quelle di default; SCORING_FORMULAS_FILE può modificarle o aggiungerne di nuove senza toccare il
+# codice. Ogni formula è un'espressione Python ristretta: viene validata una volta con `ast` e
+# compilata in una funzione numpy che calcola l'intera colonna in un passo, senza cicli per riga.
+# Le funzioni disponibili lavorano elemento per elemento, quindi il punteggio di un giocatore
+# dipende solo dalla sua riga, come richiede il ricalcolo incrementale (incremental_scoring).
+import ast
+import functools
+import hashlib
+import json
+import operator
+import os
+
+import numpy as np
+import pandas as pd
+
+import config
+
+GROUPS = ("fpedia", "FSTATS", "unificato")
+
+SKILLS_PESI = {
+    "Fuoriclasse": 1,
+    "Titolare": 3,
+    "Buona Media": 2,
+    "Goleador": 4,
+    "Assistman": 2,
+    "Piazzati": 2,
+    "Rigorista": 5,
+    "Giovane talento": 2,
+    "Panchinaro": -4,
+    "Falloso": -2,
+    "Outsider": 2,
+}
+
+# Gruppo -> {nome: espressione}, valutate in ordine. I nomi che iniziano con "_" sono valori
+# intermedi, gli altri diventano colonne. Nei nomi di colonna di col() {anno}, {anno_prec} e
+# {anno_prec2} valgono ANNO_CORRENTE, ANNO_CORRENTE-1 e ANNO_CORRENTE-2.
+DEFAULT_FORMULAS = {
+    "fpedia": {
+        "_fm_su_tot": 'col("FM su tot gare {anno_prec}-{anno}", 0)',
+        "_fantamedia": '_fm_su_tot if _fm_su_tot > 0 else col("Fantamedia anno {anno_prec}-{anno}", 0)',
+        "_presenze": 'col("Presenze {anno_prec}-{anno}", 0)',
+        "_fvm": 'col("fantavoto_medio", 0)',
+        "_quotazione": "1 if quotazione_attuale == 0 else quotazione_attuale",
+        # Fantamedia pesata per presenze, bonus skills e bonus/malus vari
+        "_valore": (
+            '(_fantamedia * (_presenze / 38) if _presenze > 5 else 0) + skills(col("Skills", "[]")) * 0.5'
+            ' + (1 if col("Buon investimento", 0) > 60 else 0) + (1 if col("Resistenza infortuni", 0) > 60 else 0)'
+            ' - (2 if col("Infortunato", False) else 0) + (1 if col("Trend", "") == "UP" else 0)'
+        ),
+        "Convenienza": "_valore / _quotazione * 100",
+        # FVM dal file quotazioni se disponibile, altrimenti FM su tot gare
+        "Valore_su_Prezzo": "(_fvm if _fvm > 0 else _fm_su_tot) / quotazione_attuale * 100 if quotazione_attuale > 0 else 0",
+        # Potenziale per giocatori con poche presenze: punteggio FPEDIA (0-10), FVM e skills
+        "_potenziale": 'col("Punteggio", 50) / 10 + (_fvm / 10 if _fvm > 0 else 0) + skills(col("Skills", "[]"))',
+        "Convenienza Potenziale": "_potenziale / _quotazione * 100",
+    },
+    "FSTATS": {
+        # Valore per presenza: fantamedia più bonus (gol, assist) e malus (cartellini) per presenza
+        "Convenienza": (
+            "(fanta_avg + (goals * 3 + assists * 1) / presences - (yellowCards * 0.5 + redCards * 1) / presences)"
+            " / quotazione_attuale * 100 if presences > 0 else 0"
+        ),
+        "_fvm": 'col("fantavoto_medio", 0)',
+        "Valore_su_Prezzo": "(_fvm if _fvm > 0 else fanta_avg) / quotazione_attuale * 100 if quotazione_attuale > 0 else 0",
+        # Peso alto per le expected stats
+        "Convenienza Potenziale": "(fantacalcioFantaindex / 10 + (xgFromOpenPlays + xA) * 2) / quotazione_attuale * 100",
+    },
+    "unificato": {
+        "_indice": 'fillna(col("Indice_Unificato", 0), 0)',
+        "_ruolo": 'col("Ruolo", "")',
+        "_quotazione": 'fillna(col("quotazione_attuale", 10), 10)',
+        "_presenze": 'fillna(col("Presenze campionato corrente", 0), 0)',
+        "_gol": 'fillna(col("goals", 0), 0)',
+        "_assist": 'fillna(col("assists", 0), 0)',
+        # Portieri ridotti del 60% (bonus solo ai titolari certi), bonus per fascia di prezzo ai
+        # giocatori di movimento e ai più prolifici, ai dati completi e a chi ha tante presenze
+        "Indice_Aggiustato": (
+            '_indice * (0.4 if _ruolo == "P" else 1) * (1.2 if _ruolo == "P" and _presenze > 15 else 1)'
+            ' * (fascia(_quotazione, (10, 20, 30), (1, 1.1, 1.15, 1.2)) if _ruolo in ("D", "C", "A") else 1)'
+            ' * (1.2 if _ruolo == "A" and _gol > 10 else 1.15 if _ruolo == "C" and (_gol > 5 or _assist > 5)'
+            ' else 1.1 if _ruolo == "D" and _gol > 2 else 1)'
+            ' * (1.1 if col("Fonte_Dati", "") == "Entrambe" else 1) * (1.05 if _presenze > 20 else 1)'
+        ),
+    },
+}
+
+_BINARY = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide, ast.Mod: np.mod, ast.Pow: np.float_power,
+}
+_COMPARE = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt,
+    ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+}
+_MISSING = object()
+
+
+def _truth(value) -> np.ndarray:
+    """Verità elemento per elemento con la semantica di bool() (NaN è vero, come in Python)."""
+    value = np.asarray(value)
+    if value.dtype == bool:
+        return value
+    if value.dtype.kind in "iuf":
+        return value != 0
+    return np.frompyfunc(bool, 1, 1)(value).astype(bool)
+
+
+def _skill_sum(value, pesi: dict) -> float:
+    try:
+        return sum(pesi.get(skill, 0) for skill in ast.literal_eval(value))
+    except Exception:
+        return 0
+
+
+def _skills(value, pesi: dict):
+    # Le liste di skills ripetute sono poche: si valuta una volta ogni stringa distinta
+    values = np.asarray(value, dtype=object)
+    codes, uniques = pd.factorize(values.ravel())
+    table = np.array([_skill_sum(u, pesi) for u in uniques] + [0], dtype=np.float64)
+    return table[codes].reshape(values.shape)
+
+
+def _fascia(value, soglie: tuple, valori: tuple):
+    # Intervalli (-inf, s1], (s1, s2], ..., (sN, inf): valori[i] per l'i-esimo intervallo
+    value = np.asarray(value, dtype=np.float64)
+    result = np.asarray(valori, dtype=np.float64)[np.searchsorted(soglie, value, side="left")]
+    return np.where(np.isnan(value), np.nan, result)
+
+
+def _fillna(value, default):
+    return np.where(pd.isna(value), default, value)
+
+
+def _reduce(ufunc):
+    return lambda *args: ufunc.reduce(np.broadcast_arrays(*(np.asarray(a) for a in args)))
+
+
+# Nome -> (argomenti minimi, massimi, implementazione). col, skills e fascia sono gestite a parte
+FUNCTIONS = {
+    "fillna": (2, 2, _fillna),
+    "num": (1, 1, lambda v: pd.to_numeric(pd.Series(np.ravel(v)), errors="coerce").to_numpy().reshape(np.shape(v))),
+    "min": (2, None, _reduce(np.minimum)),
+    "max": (2, None, _reduce(np.maximum)),
+    "abs": (1, 1, np.abs),
+    "sqrt": (1, 1, np.sqrt),
+    "log": (1, 1, np.log),
+    "clip": (3, 3, np.clip),
+    "round": (1, 2, lambda v, n=0: np.round(v, int(n))),
+    "where": (3, 3, lambda c, a, b: np.where(_truth(c), a, b)),
+    "col": (1, 2, None),
+    "skills": (1, 1, None),
+    "fascia": (3, 3, None),
+}
+
+
+class _Compiler:
+    """Valida l'AST di una formula e lo traduce in una funzione dell'ambiente di valutazione."""
+
+    def __init__(self, group: str, name: str, defined: set, pesi: dict):
+        self.where = f"formula '{name}' ({group})"
+        self.defined = defined
+        self.pesi = pesi
+        self.inputs = []
+
+    def error(self, message: str) -> ValueError:
+        return ValueError(f"{self.where}: {message}")
+
+    def compile(self, source: str):
+        if not isinstance(source, str) or not source.strip():
+            raise self.error("l'espressione deve essere una stringa non vuota")
+        try:
+            tree = ast.parse(source.strip(), mode="eval")
+        except SyntaxError as e:
+            raise self.error(f"sintassi non valida: {e.msg}") from None
+        return self.node(tree.body)
+
+    def constants(self, node, kind=(int, float, str, bool)) -> tuple:
+        if not isinstance(node, (ast.Tuple, ast.List)):
+            raise self.error("attesa una lista di costanti, es. (10, 20)")
+        values = tuple(self.constant(e, kind) for e in node.elts)
+        if not values:
+            raise self.error("lista vuota")
+        return values
+
+    def constant(self, node, kind=(int, float, str, bool)):
+        if not isinstance(node, ast.Constant) or not isinstance(node.value, kind):
+            raise self.error(f"attesa una costante, trovato '{ast.unparse(node)}'")
+        return node.value
+
+    def node(self, node):
+        if isinstance(node, ast.Constant):
+            value = self.constant(node)
+            return lambda env: value
+        if isinstance(node, ast.Name):
+            return self.name(node.id)
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            op, left, right = _BINARY[type(node.op)], self.node(node.left), self.node(node.right)
+            return lambda env: op(left(env), right(env))
+        if isinstance(node, ast.UnaryOp):
+            operand = self.node(node.operand)
+            if isinstance(node.op, ast.USub):
+                return lambda env: np.negative(operand(env))
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            if isinstance(node.op, ast.Not):
+                return lambda env: ~_truth(operand(env))
+        if isinstance(node, ast.BoolOp):
+            ufunc = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            values = [self.node(v) for v in node.values]
+            return lambda env: functools.reduce(ufunc, (_truth(v(env)) for v in values))
+        if isinstance(node, ast.IfExp):
+            test, body, orelse = self.node(node.test), self.node(node.body), self.node(node.orelse)
+            return lambda env: np.where(_truth(test(env)), body(env), orelse(env))
+        if isinstance(node, ast.Compare):
+            return self.compare(node)
+        if isinstance(node, ast.Call):
+            return self.call(node)
+        raise self.error(f"espressione non ammessa: '{ast.unparse(node)}'")
+
+    def name(self, name: str):
+        if name in self.defined:
+            return lambda env: env.values[name]
+        if name.startswith("_"):
+            raise self.error(f"'{name}' non è definita prima di questa formula")
+        self.inputs.append(name)
+        return lambda env: env.column(name)
+
+    def compare(self, node):
+        left = self.node(node.left)
+        checks = []
+        for op, comparator in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                options = self.constants(comparator)
+                negate = isinstance(op, ast.NotIn)
+                checks.append(lambda a, env, options=options, negate=negate: np.logical_xor(
+                    np.logical_or.reduce([np.asarray(a == o, dtype=bool) for o in options]), negate
+                ))
+            elif type(op) in _COMPARE:
+                fn, right = _COMPARE[type(op)], self.node(comparator)
+                checks.append(lambda a, env, fn=fn, right=right: fn(a, right(env)))
+            else:
+                raise self.error(f"confronto non ammesso: '{ast.unparse(node)}'")
+        operands = [left] + [self.node(c) for c in node.comparators[:-1]]
+
+        def run(env):
+            # a < b < c diventa (a < b) & (b < c), come in Python
+            result = True
+            for operand, check in zip(operands, checks):
+                result = np.logical_and(result, _truth(check(operand(env), env)))
+            return result
+        return run
+
+    def call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise self.error(f"funzione sconosciuta '{ast.unparse(node.func)}' (disponibili: {', '.join(FUNCTIONS)})")
+        if node.keywords:
+            raise self.error(f"{node.func.id}(): argomenti per nome non ammessi")
+        name, args = node.func.id, node.args
+        low, high, impl = FUNCTIONS[name]
+        if len(args) < low or (high is not None and len(args) > high):
+            raise self.error(f"{name}(): numero di argomenti non valido ({len(args)})")
+
+        if name == "col":
+            column = self.column_name(self.constant(args[0], str))
+            default = self.constant(args[1]) if len(args) > 1 else _MISSING
+            if column not in self.defined:
+                self.inputs.append(column)
+            return lambda env: env.values[column] if column in env.values else env.column(column, default)
+        if name == "skills":
+            value, pesi = self.node(args[0]), self.pesi
+            return lambda env: _skills(value(env), pesi)
+        if name == "fascia":
+            value = self.node(args[0])
+            soglie = self.constants(args[1], (int, float))
+            valori = self.constants(args[2], (int, float))
+            if list(soglie) != sorted(soglie):
+                raise self.error("fascia(): le soglie devono essere in ordine crescente")
+            if len(valori) != len(soglie) + 1:
+                raise self.error("fascia(): servono un valore in più delle soglie")
+            return lambda env: _fascia(value(env), soglie, valori)
+        compiled = [self.node(a) for a in args]
+        return lambda env: impl(*(a(env) for a in compiled))
+
+    def column_name(self, template: str) -> str:
+        anno = config.ANNO_CORRENTE
+        try:
+            return template.format(anno=anno, anno_prec=anno - 1, anno_prec2=anno - 2)
+        except (KeyError, IndexError, ValueError):
+            raise self.error(f"segnaposto non valido in '{template}' (ammessi: {{anno}}, {{anno_prec}}, {{anno_prec2}})") from None
+
+
+class _Env:
+    """Colonne del DataFrame (convertite una volta in array) e valori delle formule già calcolate."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.where = ""
+        self.values = {}
+        self._columns = {}
+
+    def column(self, name: str, default=_MISSING):
+        if name not in self._columns:
+            if name not in self.df.columns:
+                if default is _MISSING:
+                    raise ValueError(f"{self.where}: colonna '{name}' mancante (con col(\"{name}\", default) è facoltativa)")
+                return default
+            series = self.df[name]
+            if pd.api.types.is_bool_dtype(series.dtype):
+                values = series.to_numpy(dtype=bool)
+            elif pd.api.types.is_numeric_dtype(series.dtype):
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            elif pd.api.types.infer_dtype(series, skipna=True) in ("integer", "floating", "mixed-integer-float"):
+                # Colonne numeriche con valori mancanti None (es. dopo l'unione delle fonti)
+                values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64)
+            else:
+                values = series.to_numpy(dtype=object)
+            self._columns[name] = values
+        return self._columns[name]
+
+
+class Formula:
+    def __init__(self, name: str, source: str, fn, inputs: list):
+        self.name = name
+        self.source = source
+        self.fn = fn
+        self.inputs = inputs
+
+    @property
+    def output(self) -> bool:
+        return not self.name.startswith("_")
+
+
+class FormulaSet:
+    """Formule compilate di tutti i gruppi, con i pesi delle skills e l'impronta della configurazione."""
+
+    def __init__(self, formulas: dict, pesi: dict, digest: str, custom: dict | None = None):
+        self.pesi = pesi
+        self.digest = digest
+        # Gruppo -> nomi definiti o modificati da SCORING_FORMULAS_FILE
+        self.custom = custom or {}
+        self.groups = {}
+        for group, sources in formulas.items():
+            compiled, defined = [], set()
+            for name, source in sources.items():
+                compiler = _Compiler(group, name, defined, pesi)
+                fn = compiler.compile(source)
+                compiled.append(Formula(name, source, fn, compiler.inputs))
+                defined.add(name)
+            self.groups[group] = compiled
+
+    def outputs(self, group: str) -> list[str]:
+        return [f.name for f in self.groups[group] if f.output]
+
+    def inputs(self, group: str) -> list[str]:
+        """Colonne del DataFrame lette dalle formule del gruppo."""
+        return list(dict.fromkeys(c for f in self.groups[group] for c in f.inputs))
+
+    def evaluate(self, group: str, df: pd.DataFrame) -> dict:
+        """Valuta le formule del gruppo su tutte le righe: {colonna: array}, nell'ordine delle formule."""
+        env = _Env(df)
+        n = len(df)
+        with np.errstate(all="ignore"):
+            for formula in self.groups[group]:
+                env.where = f"formula '{formula.name}' ({group})"
+                try:
+                    env.values[formula.name] = formula.fn(env)
+                except ValueError:
+                    raise
+                except Exception as e:
+                    raise ValueError(f"{env.where}: {e}") from e
+        return {
+            f.name: np.broadcast_to(np.asarray(env.values[f.name]), (n,)).copy()
+            for f in self.groups[group] if f.output
+        }
+
+
+_compiled = {}
+
+
+def _read_file(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as fp:
+        try:
+            data = json.load(fp)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}: JSON non valido ({e})") from None
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: atteso un oggetto JSON {{\"gruppo\": {{\"nome\": \"espressione\"}}}}")
+    unknown = [k for k in data if k not in GROUPS and k != "skills"]
+    if unknown:
+        raise ValueError(f"{path}: gruppi sconosciuti {unknown} (ammessi: {', '.join(GROUPS)}, skills)")
+    for key, value in data.items():
+        if not isinstance(value, dict):
+            raise ValueError(f"{path}: '{key}' deve essere un oggetto")
+        if key == "skills" and not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value.values()):
+            raise ValueError(f"{path}: i pesi delle skills devono essere numeri")
+    return data
+
+
+def load_formulas(path: str | None = None) -> FormulaSet:
+    """
+    Formule di default con le modifiche di SCORING_FORMULAS_FILE (stessi nomi sostituiti, nuovi
+    nomi aggiunti in coda al gruppo). Compilate una volta per configurazione; ValueError se il
+    file o una formula non sono validi.
+    """
+    path = path or config.SCORING_FORMULAS_FILE
+    custom = _read_file(path)
+    formulas = {group: {**DEFAULT_FORMULAS[group], **custom.get(group, {})} for group in GROUPS}
+    pesi = {**SKILLS_PESI, **custom.get("skills", {})}
+    payload = json.dumps({"formule": formulas, "skills": pesi, "anno": config.ANNO_CORRENTE}, ensure_ascii=False)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    if digest not in _compiled:
+        _compiled[digest] = FormulaSet(formulas, pesi, digest, {g: set(custom.get(g, {})) for g in GROUPS})
+    return _compiled[digest]
+
+
+def evaluate(group: str, df: pd.DataFrame) -> dict:
+    return load_formulas().evaluate(group, df)
+
+
+def digest(df: pd.DataFrame | None = None) -> str:
+    """Impronta delle formule in uso (normalizzatore dei punteggi incrementali)."""
+    return load_formulas().digest
@@ -0,0 +1,136 @@
+# scrape_priority.py - Ordine di scraping delle pagine giocatore FPEDIA
+# Uno scraping interrotto o a tempo (SCRAPE_DEADLINE_S) lascia dei buchi: meglio che manchino le
+# riserve che i titolari. Ogni URL riceve una priorità che combina il valore del giocatore nel
+# listone (quotazione attuale e FVM in percentile entro il ruolo, abbinati per nome normalizzato)
+# e l'anzianità del dato nell'esecuzione precedente (pagine fallite o mai scaricate prima).
+# L'ordine finale alterna i ruoli penalizzando quelli già coperti, così anche un dataset parziale
+# ha i giocatori migliori di ogni ruolo. I giocatori fuori dal listone vengono per ultimi.
+import json
+import os
+import re
+import time
+import unicodedata
+
+import pandas as pd
+from loguru import logger
+
+import config
+
+RUOLI = ("P", "D", "C", "A")
+
+
+def name_key(text: str) -> str:
+    """Chiave di abbinamento: minuscolo, senza accenti né punteggiatura, parole in ordine alfabetico."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return " ".join(sorted(re.findall(r"[a-z0-9]+", text)))
+
+
+def url_key(url: str) -> str:
+    """Chiave del giocatore dallo slug dell'URL (.../calciatore/nome-cognome/)."""
+    return name_key(url.rstrip("/").rsplit("/", 1)[-1])
+
+
+def _listone(quotazioni: pd.DataFrame) -> pd.DataFrame:
+    """Una riga per chiave del listone: ruolo e valore (percentili di quotazione e FVM nel ruolo)."""
+    columns = ("nome", "ruolo_singolo", "quotazione_attuale", "fantavoto_medio")
+    if quotazioni.empty or not all(c in quotazioni.columns for c in columns):
+        return pd.DataFrame(columns=["chiave", "cognome", "ruolo", "valore"])
+    pesi = config.SCRAPE_PRIORITY_WEIGHTS
+    df = pd.DataFrame({
+        "chiave": quotazioni["nome"].map(name_key),
+        "cognome": quotazioni["nome"].map(lambda nome: name_key(str(nome).split()[0]) if str(nome).split() else ""),
+        "ruolo": quotazioni["ruolo_singolo"].astype(str).str.strip().str.upper(),
+    })
+    df = df.assign(
+        quotazione=pd.to_numeric(quotazioni["quotazione_attuale"], errors="coerce").fillna(0).to_numpy(),
+        fantavoto=pd.to_numeric(quotazioni["fantavoto_medio"], errors="coerce").fillna(0).to_numpy(),
+    )
+    df = df[df["ruolo"].isin(RUOLI)]
+    per_ruolo = df.groupby("ruolo")
+    df["valore"] = (pesi["quotazione"] * per_ruolo["quotazione"].rank(pct=True)
+                    + pesi["fantavoto"] * per_ruolo["fantavoto"].rank(pct=True))
+    # A parità di nome (omonimi) conta il più quotato
+    return df.sort_values("valore", ascending=False).drop_duplicates("chiave")
+
+
+def _match(chiavi: pd.Series, listone: pd.DataFrame) -> pd.DataFrame:
+    """
+    Riga del listone per ogni chiave URL: prima il nome completo, poi, per i nomi abbreviati
+    del listone (es. "Martinez L."), il cognome se è unico nel listone e compare nello slug.
+    """
+    by_key = listone.set_index("chiave")[["ruolo", "valore"]]
+    matched = by_key.reindex(chiavi.to_numpy())
+    matched.index = chiavi.index
+    cognomi = listone[~listone["cognome"].duplicated(keep=False) & (listone["cognome"] != "")]
+    by_cognome = cognomi.set_index("cognome")[["ruolo", "valore"]]
+    for i in matched.index[matched["ruolo"].isna()]:
+        candidates = [token for token in chiavi[i].split() if token in by_cognome.index]
+        if len(candidates) == 1:
+            matched.loc[i, ["ruolo", "valore"]] = by_cognome.loc[candidates[0]].to_numpy()
+    return matched
+
+
+def _last_fetch(path: str) -> dict[str, float]:
+    """Istante dell'ultimo download riuscito per URL, dalla telemetria dello scraping precedente."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            records = json.load(fp).get("records", [])
+    except (OSError, ValueError):
+        return {}
+    return {r["url"]: r["timestamp"] for r in records if r.get("kind") == "giocatore" and not r.get("error")}
+
+
+def priorities(urls: list[str], quotazioni: pd.DataFrame, last_fetch: dict[str, float],
+               now: float | None = None) -> pd.DataFrame:
+    """URL con ruolo (None fuori dal listone), valore, anzianità (0-1) e priorità."""
+    now = now or time.time()
+    table = pd.DataFrame({"url": urls})
+    table = table.join(_match(table["url"].map(url_key), _listone(quotazioni)))
+    eta_h = pd.Series([(now - last_fetch[u]) / 3600 if u in last_fetch else None for u in urls], dtype=float)
+    # Mai scaricata (o fallita) la volta scorsa: anzianità massima
+    table["anzianita"] = (eta_h / config.SCRAPE_STALE_AFTER_H).clip(0, 1).fillna(1).to_numpy()
+    table["valore"] = pd.to_numeric(table["valore"], errors="coerce").fillna(0)
+    table["priorita"] = table["valore"] + config.SCRAPE_PRIORITY_WEIGHTS["anzianita"] * table["anzianita"]
+    return table
+
+
+def schedule(table: pd.DataFrame) -> list[str]:
+    """
+    Ordine degli URL: a ogni passo il primo in coda del ruolo con priorità meno la penalità di
+    copertura (peso "copertura" per la frazione del ruolo già in lista) più alta; poi chi è
+    fuori dal listone, per anzianità.
+    """
+    peso = config.SCRAPE_PRIORITY_WEIGHTS["copertura"]
+    code = {}
+    for ruolo, group in table[table["ruolo"].notna()].groupby("ruolo"):
+        group = group.sort_values("priorita", ascending=False, kind="stable")
+        code[ruolo] = (group["url"].tolist(), group["priorita"].tolist())
+    presi = dict.fromkeys(code, 0)
+    order = []
+    while code:
+        ruolo = max(code, key=lambda r: code[r][1][presi[r]] - peso * presi[r] / len(code[r][0]))
+        order.append(code[ruolo][0][presi[ruolo]])
+        presi[ruolo] += 1
+        if presi[ruolo] == len(code[ruolo][0]):
+            del code[ruolo]
+    fuori = table[table["ruolo"].isna()].sort_values("anzianita", ascending=False, kind="stable")
+    return order + fuori["url"].tolist()
+
+
+def order(urls: list[str]) -> list[str]:
+    """URL da scaricare nell'ordine di priorità (quotazioni da config.QUOTAZIONI_FILE)."""
+    if not urls:
+        return urls
+    import quotazioni_loader
+
+    table = priorities(urls, quotazioni_loader.load_quotazioni(), _last_fetch(config.FPEDIA_TELEMETRY_FILE))
+    ordered = schedule(table)
+    in_listone = table["ruolo"].notna()
+    logger.info(
+        f"Ordine di scraping: {in_listone.sum()}/{len(urls)} pagine abbinate al listone, "
+        f"{(table['anzianita'] >= 1).sum()} senza dati recenti dall'esecuzione precedente"
+    )
+    return ordered
@@ -0,0 +1,202 @@
+# scraped_rows.py - Accumulo colonnare e tipizzato delle righe scaricate (FPEDIA e FSTATS)
+# Ogni pagina giocatore FPEDIA (o giocatore del JSON FSTATS) diventa un dict di attributi. Invece
+# di tenerli tutti in una lista e lasciare a pandas l'inferenza dei tipi alla fine, i valori sono
+# già del tipo finale (`number` nel parsing HTML, il decoder per il JSON) e vengono accodati a
+# buffer tipizzati (array.array): i campi noti hanno una colonna del tipo dichiarato nello schema,
+# le etichette inattese finiscono in colonne aggiunte al volo. Il DataFrame finale avvolge i buffer già pronti (np.frombuffer, senza copia).
+# Il CSV scritto è lo stesso della lista di dict: stesse colonne nello stesso ordine (prima
+# comparsa) e valori che pd.read_csv rilegge con lo stesso tipo.
+import re
+from array import array
+
+import numpy as np
+import pandas as pd
+
+import config
+
+_INT = re.compile(r"[+-]?\d+\Z")
+_FLOAT = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\Z")
+
+# Tipo -> typecode del buffer array.array; "object" (testi, liste, colonne miste) usa una lista
+_TYPECODES = {"int": "q", "float": "d", "bool": "b"}
+_DTYPES = {"int": np.int64, "float": np.float64, "bool": np.bool_}
+
+
+def number(text: str):
+    """
+    Valore numerico di un testo della pagina: int, float, None se vuoto; il testo stesso se non
+    è un numero (la colonna diventa di testo, come farebbe pd.read_csv).
+    """
+    text = text.strip()
+    if not text:
+        return None
+    if _INT.match(text):
+        return int(text)
+    if _FLOAT.match(text):
+        return float(text)
+    return text
+
+
+def fpedia_schema(anno: int | None = None) -> dict[str, str]:
+    """Campi noti di una pagina giocatore FPEDIA, nell'ordine della pagina, con il loro tipo."""
+    anno = anno or config.ANNO_CORRENTE
+    stagione, precedente = f"{anno-1}-{anno}", f"{anno-2}-{anno-1}"
+    return {
+        "Nome": "object",
+        "Punteggio": "int",
+        f"Fantamedia anno {stagione}": "float",
+        f"Fantamedia anno {precedente}": "float",
+        f"Presenze {stagione}": "int",
+        f"FM su tot gare {stagione}": "float",
+        "Presenze previste": "int",
+        "Gol previsti": "int",
+        "Assist previsti": "int",
+        "Ruolo": "object",
+        "Skills": "object",
+        "Buon investimento": "int",
+        "Resistenza infortuni": "int",
+        "Consigliato prossima giornata": "bool",
+        "Nuovo acquisto": "bool",
+        "Infortunato": "bool",
+        "Squadra": "object",
+        "Trend": "object",
+        "Presenze campionato corrente": "int",
+    }
+
+
+def fstats_schema() -> dict[str, str]:
+    """
+    Campi FSTATS usati dall'analisi (dopo `json_stream.flatten_record`), con il loro tipo. I valori
+    JSON arrivano già tipizzati; gli altri campi dell'API finiscono in colonne dedotte dal valore.
+    """
+    return {
+        "name": "object",
+        "team_id": "int",
+        "team": "object",
+        "fantacalcioPosition": "object",
+        "appearances": "int",
+        "goals": "int",
+        "assists": "int",
+        "yellowCards": "int",
+        "redCards": "int",
+        "xgFromOpenPlays": "float",
+        "xA": "float",
+        "pagella": "float",
+        "fantacalcioRanking": "float",
+        "fantacalcioFantaindex": "float",
+    }
+
+
+def _kind_of(value) -> str:
+    if isinstance(value, (bool, np.bool_)):
+        return "bool"
+    if isinstance(value, (int, np.integer)):
+        return "int"
+    if isinstance(value, (float, np.floating)):
+        return "float"
+    return "object"
+
+
+class _Column:
+    """
+    Buffer tipizzato di una colonna. Il caso comune è un `append` del buffer stesso; un valore
+    mancante o di tipo diverso solleva un'eccezione e passa da `add`, che registra il mancante o
+    allarga il tipo (int -> float -> object).
+    """
+
+    def __init__(self, kind: str, rows: int = 0):
+        self.kind = kind
+        self.values = array(_TYPECODES[kind]) if kind in _TYPECODES else []
+        self.append = self.values.append
+        self.missing: list[int] = []
+        for _ in range(rows):
+            self.pad()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def pad(self) -> None:
+        if self.kind == "float":
+            self.append(np.nan)
+        elif self.kind == "object":
+            self.append(None)
+        else:
+            self.missing.append(len(self.values))
+            self.append(0)
+
+    def _widen(self, kind: str) -> None:
+        if {self.kind, kind} <= {"int", "float"}:
+            self.values = array("d", self.values)
+            for row in self.missing:
+                self.values[row] = np.nan
+            kind = "float"
+        else:
+            values = [bool(v) for v in self.values] if self.kind == "bool" else list(self.values)
+            for row in self.missing:
+                values[row] = None
+            self.values, kind = values, "object"
+        self.kind, self.missing, self.append = kind, [], self.values.append
+
+    def add(self, value) -> None:
+        if value is None:
+            self.pad()
+        else:
+            self._widen(_kind_of(value))
+            self.append(value)
+
+    def array(self):
+        if self.kind == "object":
+            return np.fromiter(self.values, dtype=object, count=len(self.values))
+        values = np.frombuffer(self.values, dtype=_DTYPES[self.kind]) if self.values else np.empty(0, _DTYPES[self.kind])
+        if not self.missing:
+            return values
+        mask = np.zeros(len(values), dtype=bool)
+        mask[self.missing] = True
+        if self.kind == "int":
+            return pd.arrays.IntegerArray(values, mask)
+        return pd.arrays.BooleanArray(values, mask)
+
+
+class TypedColumnBuilder:
+    """
+    Accumula record (dict) in colonne tipizzate. I campi dello schema hanno una colonna del tipo
+    dichiarato; le chiavi fuori schema ne ricevono una al primo utilizzo, con tipo dedotto dal
+    valore. Le colonne compaiono nel DataFrame nell'ordine in cui sono state viste.
+    """
+
+    def __init__(self, schema: dict[str, str]):
+        self.schema = dict(schema)
+        self.columns: dict[str, _Column] = {}
+        self.overflow: list[str] = []
+        self.rows = 0
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _column(self, name: str, value) -> _Column:
+        kind = self.schema.get(name)
+        if kind is None:
+            kind = _kind_of(value)
+            self.overflow.append(name)
+        column = self.columns[name] = _Column(kind, self.rows)
+        return column
+
+    def append(self, record: dict) -> None:
+        columns = self.columns
+        for name, value in record.items():
+            column = columns.get(name)
+            if column is None:
+                column = self._column(name, value)
+            try:
+                column.append(value)
+            except (TypeError, OverflowError):
+                column.add(value)
+        self.rows += 1
+        if len(record) != len(columns):
+            for column in columns.values():
+                if len(column) < self.rows:
+                    column.pad()
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame che avvolge i buffer (senza copia per le colonne numeriche complete)."""
+        return pd.DataFrame({name: column.array() for name, column in self.columns.items()}, copy=False)
@@ -0,0 +1,171 @@
+# scraper_telemetry.py - Telemetria delle richieste HTTP del retriever
+# Una registrazione per richiesta logica (retry inclusi), aggregata alla fine dello
+# scrape in istogrammi e statistiche per capire concorrenza ottimale e throttling.
+import json
+import os
+import statistics
+import threading
+import time
+
+import requests
+from loguru import logger
+
+# Limiti superiori dei bucket degli istogrammi (l'ultimo bucket è "oltre")
+LATENCY_BUCKETS_MS = (50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+SIZE_BUCKETS_KB = (1, 10, 50, 100, 250, 500, 1000, 5000)
+
+
+def classify_error(exc: BaseException | None = None, status: int | None = None) -> str | None:
+    """Classe di errore sintetica per una richiesta fallita (None se riuscita)."""
+    if exc is None and (status is None or status < 400):
+        return None
+    if isinstance(exc, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return "connection"
+    if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+    if status == 429:
+        return "throttled_429"
+    if status is not None and 400 <= status < 500:
+        return "http_4xx"
+    if status is not None and status >= 500:
+        return "http_5xx"
+    if isinstance(exc, (AttributeError, IndexError, KeyError, TypeError, ValueError)):
+        return "parse"
+    return type(exc).__name__ if exc is not None else "unknown"
+
+
+def _histogram(values, buckets) -> dict:
+    counts = {f"<={b}": 0 for b in buckets}
+    counts[f">{buckets[-1]}"] = 0
+    for v in values:
+        for b in buckets:
+            if v <= b:
+                counts[f"<={b}"] += 1
+                break
+        else:
+            counts[f">{buckets[-1]}"] += 1
+    return counts
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "mean": statistics.fmean(ordered),
+        "p50": pct(50),
+        "p90": pct(90),
+        "p99": pct(99),
+        "max": ordered[-1],
+    }
+
+
+class ScrapeTelemetry:
+    """Raccoglie le misure delle richieste in modo thread-safe."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.time()
+        self._records: list[dict] = []
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        kind: str,
+        url: str,
+        status: int | None = None,
+        size: int = 0,
+        latency_s: float = 0.0,
+        delay_s: float = 0.0,
+        network_s: float = 0.0,
+        parse_s: float = 0.0,
+        retries: int = 0,
+        throttled: int = 0,
+        error: str | None = None,
+    ) -> None:
+        """
+        kind: tipo di pagina (es. 'lista_ruolo', 'giocatore', 'login')
+        latency_s: durata dell'ultimo tentativo; network_s: somma di tutti i tentativi
+        delay_s: attesa di cortesia e backoff tra i retry
+        throttled: risposte 429 ricevute, anche se poi superate con un retry
+        """
+        with self._lock:
+            self._records.append({
+                "kind": kind, "url": url, "status": status, "size": size,
+                "latency_s": latency_s, "delay_s": delay_s, "network_s": network_s,
+                "parse_s": parse_s, "retries": retries, "throttled": throttled, "error": error,
+                "timestamp": time.time(),
+            })
+
+    @property
+    def records(self) -> list[dict]:
+        with self._lock:
+            return list(self._records)
+
+    def summary(self) -> dict:
+        records = self.records
+        by_kind = {}
+        for kind in sorted({r["kind"] for r in records}):
+            rows = [r for r in records if r["kind"] == kind]
+            latencies_ms = [r["latency_s"] * 1000 for r in rows if r["status"] is not None]
+            sizes_kb = [r["size"] / 1024 for r in rows if r["size"]]
+            errors = {}
+            statuses = {}
+            for r in rows:
+                if r["error"]:
+                    errors[r["error"]] = errors.get(r["error"], 0) + 1
+                if r["status"] is not None:
+                    statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+            by_kind[kind] = {
+                "requests": len(rows),
+                "ok": sum(1 for r in rows if not r["error"]),
+                "errors": errors,
+                "status_codes": statuses,
+                "retries": sum(r["retries"] for r in rows),
+                "throttled_429": sum(r["throttled"] for r in rows),
+                "bytes_total": sum(r["size"] for r in rows),
+                "latency_ms": _percentiles(latencies_ms),
+                "latency_histogram_ms": _histogram(latencies_ms, LATENCY_BUCKETS_MS),
+                "size_kb": _percentiles(sizes_kb),
+                "size_histogram_kb": _histogram(sizes_kb, SIZE_BUCKETS_KB),
+                "time_split_s": {
+                    "delay": sum(r["delay_s"] for r in rows),
+                    "network": sum(r["network_s"] for r in rows),
+                    "parse": sum(r["parse_s"] for r in rows),
+                },
+            }
+
+        elapsed = time.time() - self.started
+        return {
+            "name": self.name,
+            "elapsed_s": elapsed,
+            "requests": len(records),
+            "requests_per_s": len(records) / elapsed if elapsed > 0 else 0.0,
+            "throttled_429": sum(r["throttled"] for r in records),
+            "by_kind": by_kind,
+        }
+
+    def write(self, path: str, include_records: bool = True) -> dict:
+        """Scrive riepilogo (e richieste singole) in JSON e logga una riga di sintesi."""
+        summary = self.summary()
+        payload = dict(summary, records=self.records if include_records else [])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump(payload, fp, indent=2)
+
+        for kind, s in summary["by_kind"].items():
+            latency = s["latency_ms"]
+            logger.info(
+                f"Telemetria {self.name}/{kind}: {s['requests']} richieste, {s['ok']} ok, "
+                f"errori {s['errors'] or '-'}, retry {s['retries']}, 429 {s['throttled_429']}, "
+                f"p50 {latency.get('p50', 0):.0f} ms, p90 {latency.get('p90', 0):.0f} ms, "
+                f"{s['bytes_total'] / 1024 / 1024:.1f} MB"
+            )
+        logger.info(f"Telemetria scrape salvata in: {path}")
+        return summary
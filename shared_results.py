@@ -0,0 +1,334 @@
+# shared_results.py - Risultati della pipeline in un file colonnare mappabile in memoria
+# Alla fine della pipeline le tabelle FPEDIA, FSTATS e unificata vengono pubblicate in un unico
+# file binario versionato: un header JSON seguito dai buffer delle colonne allineati a 64 byte
+# (numeri float64/int64, booleani uint8, stringhe come offset int64 + byte UTF-8). I lettori
+# (API, CLI, ottimizzatori in altri processi) lo aprono con mmap e ottengono viste numpy senza
+# copie: le pagine sono condivise dalla page cache del sistema, non duplicate per processo.
+# Il puntatore CURRENT viene sostituito atomicamente: chi legge passa alla nuova versione al
+# prossimo refresh(), mentre le viste già aperte restano valide sul file precedente.
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+import config
+
+MAGIC = b"FCRS0001"
+ALIGNMENT = 64
+# Valore dei booleani mancanti
+BOOL_NULL = 255
+
+
+def _align(n: int) -> int:
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _encode_column(series) -> tuple[str, dict]:
+    """Tipo e buffer di una colonna: "f8", "i8", "b1" o "str"."""
+    import pandas as pd
+
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) and not series.isna().any():
+        return "b1", {"values": series.to_numpy(dtype=np.uint8)}
+    if pd.api.types.is_integer_dtype(dtype) and not series.isna().any():
+        return "i8", {"values": series.to_numpy(dtype=np.int64)}
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        return "f8", {"values": series.to_numpy(dtype=np.float64, na_value=np.nan)}
+
+    values = series.to_numpy(dtype=object)
+    missing = pd.isna(values)
+    present = values[~missing]
+    if len(present) and all(isinstance(v, (bool, np.bool_)) for v in present):
+        encoded = np.full(len(values), BOOL_NULL, dtype=np.uint8)
+        encoded[~missing] = present.astype(np.uint8)
+        return "b1", {"values": encoded}
+    if len(present) and all(isinstance(v, (int, float, np.integer, np.floating)) for v in present):
+        return "f8", {"values": pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)}
+
+    chunks = [b"" if m else str(v).encode("utf-8") for v, m in zip(values, missing)]
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in chunks], out=offsets[1:])
+    return "str", {
+        "offsets": offsets,
+        "data": np.frombuffer(b"".join(chunks), dtype=np.uint8),
+        "valid": (~missing).astype(np.uint8),
+    }
+
+
+def write_results_file(tables: dict, path: str, version: int) -> str:
+    """Scrive le tabelle (nome -> DataFrame) nel formato colonnare, atomicamente."""
+    header = {"version": version, "tables": {}}
+    buffers = []
+    position = 0
+    for name, df in tables.items():
+        if df is None:
+            continue
+        df = df.reset_index(drop=True)
+        columns = []
+        for column in df.columns:
+            kind, arrays = _encode_column(df[column])
+            entry = {"name": str(column), "kind": kind, "buffers": {}}
+            for role, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                entry["buffers"][role] = {"offset": position, "dtype": array.dtype.str, "length": len(array)}
+                buffers.append((position, array))
+                position = _align(position + array.nbytes)
+            columns.append(entry)
+        header["tables"][name] = {"rows": len(df), "columns": columns}
+
+    encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(encoded))
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as fp:
+        fp.write(MAGIC)
+        fp.write(struct.pack("<Q", len(encoded)))
+        fp.write(encoded)
+        for offset, array in buffers:
+            fp.seek(data_start + offset)
+            fp.write(array.tobytes())
+        fp.truncate(data_start + position)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_pointer(directory: str) -> dict | None:
+    try:
+        with open(os.path.join(directory, "CURRENT"), "r", encoding="utf-8") as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+
+def publish(tables: dict, directory: str | None = None) -> str:
+    """
+    Pubblica una nuova versione: scrive il file versionato, poi sostituisce atomicamente il
+    puntatore CURRENT ed elimina le versioni più vecchie di SHARED_RESULTS_KEEP.
+    """
+    directory = directory or config.SHARED_RESULTS_DIR
+    os.makedirs(directory, exist_ok=True)
+    pointer = _read_pointer(directory)
+    version = (pointer["version"] if pointer else 0) + 1
+    filename = f"results-{version:06d}.fcr"
+    write_results_file(tables, os.path.join(directory, filename), version)
+
+    current = os.path.join(directory, "CURRENT")
+    with open(f"{current}.tmp", "w", encoding="utf-8") as fp:
+        json.dump({"version": version, "file": filename}, fp)
+    os.replace(f"{current}.tmp", current)
+
+    for old in sorted(f for f in os.listdir(directory) if f.startswith("results-") and f.endswith(".fcr")):
+        if int(old[8:14]) <= version - config.SHARED_RESULTS_KEEP:
+            try:
+                os.remove(os.path.join(directory, old))
+            except OSError:
+                pass  # su Windows un file ancora mappato da un lettore non si può cancellare
+    return os.path.join(directory, filename)
+
+
+def publish_stage(df_fpedia, df_fstats, df_unified):
+    """Stage della pipeline: pubblica le tre tabelle di risultati."""
+    from loguru import logger
+
+    tables = {"fpedia": df_fpedia, "fstats": df_fstats, "unified": df_unified}
+    tables = {name: df for name, df in tables.items() if df is not None and not df.empty}
+    if not tables:
+        return None
+    path = publish(tables)
+    logger.info(f"Risultati condivisi pubblicati in: {path} ({', '.join(f'{n}: {len(d)}' for n, d in tables.items())})")
+    return path
+
+
+class StringColumn:
+    """Colonna di stringhe sopra i buffer mappati: decodifica solo gli elementi letti."""
+
+    def __init__(self, offsets, data, valid):
+        self.offsets = offsets
+        self.data = data
+        self.valid = valid
+
+    def __len__(self) -> int:
+        return len(self.valid)
+
+    def __getitem__(self, i: int):
+        if not self.valid[i]:
+            return None
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def tolist(self) -> list:
+        return [self[i] for i in range(len(self))]
+
+
+class _PyColumn:
+    """Accesso per indice con valori Python (None per i mancanti), come le liste della query cache."""
+
+    def __init__(self, kind: str, values):
+        self.kind = kind
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, i: int):
+        value = self.values[i]
+        if self.kind == "str":
+            return value
+        if self.kind == "f8":
+            return None if value != value else float(value)
+        if self.kind == "b1":
+            return None if value == BOOL_NULL else bool(value)
+        return int(value)
+
+
+class SharedTable:
+    """Una tabella pubblicata: colonne come viste numpy (o StringColumn) sul file mappato."""
+
+    def __init__(self, name: str, rows: int, columns: dict, kinds: dict, version: int):
+        self.name = name
+        self.rows = rows
+        self.columns = list(columns)
+        self.version = version
+        self._columns = columns
+        self._kinds = kinds
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def column(self, name: str):
+        return self._columns[name]
+
+    def kind(self, name: str) -> str:
+        return self._kinds[name]
+
+    def as_payload(self) -> dict:
+        """Vista compatibile con il payload della query cache (query_cache.query/format_table)."""
+        data = {name: _PyColumn(self._kinds[name], self._columns[name]) for name in self.columns}
+        return {"version": self.version, "rows": self.rows, "columns": self.columns, "data": data}
+
+    def to_pandas(self):
+        """Copia in un DataFrame (per chi ha bisogno di pandas; la copia non è condivisa)."""
+        import pandas as pd
+
+        data = {}
+        for name in self.columns:
+            values, kind = self._columns[name], self._kinds[name]
+            if kind == "str":
+                data[name] = values.tolist()
+            elif kind == "b1":
+                data[name] = [None if v == BOOL_NULL else bool(v) for v in values]
+            else:
+                data[name] = np.array(values)
+        return pd.DataFrame(data, columns=self.columns)
+
+
+class SharedResults:
+    """
+    Lettore dei risultati condivisi. `refresh()` passa all'ultima versione pubblicata (se
+    cambiata) senza rileggere i dati: apre il nuovo file con mmap e interpreta solo l'header.
+    """
+
+    def __init__(self, directory: str | None = None):
+        self.directory = directory or config.SHARED_RESULTS_DIR
+        self.version = None
+        self.tables: dict[str, SharedTable] = {}
+
+    def refresh(self) -> bool:
+        pointer = _read_pointer(self.directory)
+        if pointer is None:
+            raise FileNotFoundError(f"Nessun risultato condiviso in {self.directory}")
+        if pointer["version"] == self.version:
+            return False
+        with open(os.path.join(self.directory, pointer["file"]), "rb") as fp:
+            # Il mapping resta valido dopo la chiusura del file e vive finché esistono viste su di esso
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{pointer['file']}: formato non riconosciuto")
+        (header_len,) = struct.unpack_from("<Q", mapped, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(mapped[start:start + header_len].decode("utf-8"))
+        data_start = _align(start + header_len)
+
+        tables = {}
+        for name, table in header["tables"].items():
+            columns, kinds = {}, {}
+            for entry in table["columns"]:
+                views = {
+                    role: np.frombuffer(mapped, dtype=np.dtype(b["dtype"]), count=b["length"],
+                                        offset=data_start + b["offset"])
+                    for role, b in entry["buffers"].items()
+                }
+                kinds[entry["name"]] = entry["kind"]
+                columns[entry["name"]] = (
+                    StringColumn(views["offsets"], views["data"], views["valid"])
+                    if entry["kind"] == "str" else views["values"]
+                )
+            tables[name] = SharedTable(name, table["rows"], columns, kinds, header["version"])
+        # Sostituzione in blocco: chi sta leggendo la versione precedente continua a farlo
+        self.tables = tables
+        self.version = header["version"]
+        return True
+
+    def table(self, name: str) -> SharedTable:
+        if self.version is None:
+            self.refresh()
+        if name not in self.tables:
+            raise KeyError(f"Tabella '{name}' non presente (disponibili: {', '.join(self.tables)})")
+        return self.tables[name]
+
+
+def anonymous_memory_kb() -> int | None:
+    """
+    Memoria anonima del processo in kB (heap e copie dei dati, mai condivisa); None fuori da Linux.
+    Le pagine del file mappato stanno nella page cache e non vengono contate.
+    """
+    try:
+        with open("/proc/self/smaps_rollup", "r") as fp:
+            return sum(int(line.split()[1]) for line in fp if line.startswith("Anonymous:"))
+    except OSError:
+        return None
+
+
+def _probe(mode: str, directory: str, query_cache_file: str) -> None:
+    """Eseguito in un processo lettore: carica la tabella unificata e stampa la memoria anonima aggiunta."""
+    before = anonymous_memory_kb()
+    if mode == "mmap":
+        table = SharedResults(directory).table("unified")
+        # Legge ogni buffer per intero, così tutte le pagine sono effettivamente mappate
+        for name in table.columns:
+            values = table.column(name)
+            for array in ((values.offsets, values.data, values.valid) if table.kind(name) == "str" else (values,)):
+                np.sum(array, dtype=np.float64)
+    else:
+        import query_cache
+
+        query_cache.load_query_cache(query_cache_file)
+    after = anonymous_memory_kb()
+    print(json.dumps({"anonymous_kb": None if before is None else after - before}))
+
+
+def measure_readers(readers: int, mode: str = "mmap", directory: str | None = None,
+                    query_cache_file: str | None = None) -> list[int | None]:
+    """
+    Avvia `readers` processi lettori in parallelo e ritorna la memoria anonima (kB) che ognuno
+    ha dovuto allocare per i dati: "mmap" apre i risultati condivisi, "json" la query cache.
+    """
+    import subprocess
+    import sys
+
+    # I lettori partono dalla directory del progetto: percorsi assoluti rispetto a quella corrente
+    directory = os.path.abspath(directory or config.SHARED_RESULTS_DIR)
+    query_cache_file = os.path.abspath(query_cache_file or config.QUERY_CACHE_FILE)
+    code = f"import shared_results; shared_results._probe({mode!r}, {directory!r}, {query_cache_file!r})"
+    processes = [
+        subprocess.Popen([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                         stdout=subprocess.PIPE, text=True)
+        for _ in range(readers)
+    ]
+    results = []
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"Processo lettore terminato con codice {process.returncode}")
+        results.append(json.loads(output.strip().splitlines()[-1])["anonymous_kb"])
+    return results
@@ -0,0 +1,136 @@
+# similar_players.py - Ricerca dei giocatori più simili (sostituti all'asta)
+# L'indice è costruito una volta per esecuzione dal dataset unificato: feature numeriche
+# standardizzate per ruolo (z-score), righe ordinate per ruolo e prezzo. Una ricerca con
+# tetto di prezzo considera solo il prefisso del ruolo sotto il tetto (ricerca binaria) e
+# calcola le distanze in un'unica operazione vettoriale. Per le ricerche basta numpy.
+import os
+
+import numpy as np
+
+import config
+
+RUOLI = ("P", "D", "C", "A")
+
+
+def _fold(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+class SimilarityIndex:
+    """Indice per ruolo con feature standardizzate, prezzi ordinati e metadati dei giocatori."""
+
+    def __init__(self, features, prezzi, ruoli, nomi, squadre, features_names):
+        self.features = np.asarray(features, dtype="float32")
+        self.prezzi = np.asarray(prezzi, dtype="float32")
+        self.ruoli = np.asarray(ruoli)
+        self.nomi = np.asarray(nomi)
+        self.squadre = np.asarray(squadre)
+        self.features_names = tuple(str(f) for f in features_names)
+        self._nomi_fold = np.array([_fold(n) for n in self.nomi])
+        # Intervallo [inizio, fine) delle righe di ogni ruolo
+        self.ranges = {}
+        for ruolo in np.unique(self.ruoli):
+            positions = np.flatnonzero(self.ruoli == ruolo)
+            self.ranges[str(ruolo)] = (int(positions[0]), int(positions[-1]) + 1)
+
+    def __len__(self) -> int:
+        return len(self.nomi)
+
+    @classmethod
+    def from_dataframe(cls, df, features=config.SIMILARITY_FEATURES) -> "SimilarityIndex":
+        """
+        Costruisce l'indice da un DataFrame con Nome, Ruolo, Squadra e le colonne in `features`.
+        Le feature mancanti per un giocatore (es. dati solo FPEDIA) valgono la media del ruolo,
+        cioè z-score 0; le colonne assenti del tutto sono ignorate.
+        """
+        import pandas as pd
+
+        df = df[df["Ruolo"].isin(RUOLI) & df["Nome"].notna()]
+        features = [f for f in features if f in df.columns]
+        if df.empty or not features:
+            return cls(np.empty((0, len(features))), [], [], [], [], features)
+
+        values = df[features].apply(pd.to_numeric, errors="coerce").astype("float64")
+        by_role = values.groupby(df["Ruolo"])
+        std = by_role.transform("std").replace(0, np.nan)
+        z = ((values - by_role.transform("mean")) / std).fillna(0.0)
+
+        prezzo = pd.to_numeric(df.get("quotazione_attuale"), errors="coerce").fillna(0.0)
+        order = np.lexsort((prezzo.to_numpy(), df["Ruolo"].to_numpy()))
+        return cls(
+            z.to_numpy()[order],
+            prezzo.to_numpy()[order],
+            df["Ruolo"].to_numpy()[order].astype(str),
+            df["Nome"].to_numpy()[order].astype(str),
+            df["Squadra"].fillna("").to_numpy()[order].astype(str),
+            features,
+        )
+
+    def save(self, path: str = config.SIMILARITY_INDEX_FILE) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fp:
+            np.savez(
+                fp, features=self.features, prezzi=self.prezzi, ruoli=self.ruoli, nomi=self.nomi,
+                squadre=self.squadre, features_names=np.array(self.features_names),
+            )
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str = config.SIMILARITY_INDEX_FILE) -> "SimilarityIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["features"], data["prezzi"], data["ruoli"], data["nomi"],
+                       data["squadre"], data["features_names"])
+
+    def find(self, nome: str) -> list[int]:
+        """Posizioni dei giocatori il cui nome corrisponde (esatto se possibile, altrimenti sottostringa)."""
+        query = _fold(nome)
+        exact = np.flatnonzero(self._nomi_fold == query)
+        if len(exact):
+            return exact.tolist()
+        return [i for i, n in enumerate(self._nomi_fold) if query in n]
+
+    def similar(self, position: int, k: int = 10, max_prezzo: float | None = None,
+                min_prezzo: float | None = None) -> list[tuple[int, float]]:
+        """
+        I `k` giocatori dello stesso ruolo più vicini a quello in `position` (distanza euclidea
+        sulle feature standardizzate), con prezzo nell'intervallo indicato. Ritorna (posizione, distanza).
+        """
+        start, end = self.ranges[str(self.ruoli[position])]
+        prezzi = self.prezzi[start:end]
+        lo = start + (int(np.searchsorted(prezzi, min_prezzo, side="left")) if min_prezzo is not None else 0)
+        hi = start + (int(np.searchsorted(prezzi, max_prezzo, side="right")) if max_prezzo is not None else end - start)
+        if hi <= lo:
+            return []
+
+        diff = self.features[lo:hi] - self.features[position]
+        distances = np.einsum("ij,ij->i", diff, diff)
+        if lo <= position < hi:
+            distances[position - lo] = np.inf
+        k = min(k, int(np.isfinite(distances).sum()))
+        if k <= 0:
+            return []
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return [(lo + int(i), float(np.sqrt(distances[i]))) for i in nearest]
+
+    def describe(self, position: int) -> dict:
+        return {
+            "Nome": str(self.nomi[position]),
+            "Ruolo": str(self.ruoli[position]),
+            "Squadra": str(self.squadre[position]),
+            "quotazione_attuale": float(self.prezzi[position]),
+        }
+
+
+def build_similarity_index(df_unified, path: str = config.SIMILARITY_INDEX_FILE):
+    """Stage della pipeline: costruisce e salva l'indice dal dataset unificato."""
+    from loguru import logger
+
+    if df_unified is None or df_unified.empty:
+        return None
+    index = SimilarityIndex.from_dataframe(df_unified)
+    index.save(path)
+    logger.info(f"Indice di similarità: {len(index)} giocatori, feature {', '.join(index.features_names)} -> {path}")
+    return path
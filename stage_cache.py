@@ -0,0 +1,104 @@
+# stage_cache.py - Cache su disco degli stage della pipeline basata su fingerprint
+import glob
+import hashlib
+import json
+import os
+import pickle
+from functools import lru_cache
+
+from loguru import logger
+
+import config
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """Returns the sha256 of a file's content, or 'missing' if it does not exist."""
+    if not path or not os.path.exists(path):
+        return "missing"
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def code_digest() -> str:
+    """
+    Digest of the project's source files: any code change invalidates the cache,
+    so a stale result computed by an older formula is never reused.
+    """
+    digest = hashlib.sha256()
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(project_dir, "*.py"))):
+        digest.update(os.path.basename(path).encode("utf-8"))
+        digest.update(file_digest(path).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def fingerprint(name: str, config_keys=(), files=(), upstream=()) -> str:
+    """
+    Fingerprint of a stage: its name, the project code, the values of the
+    relevant `config` constants, the content of its input files and the
+    fingerprints of the upstream stages.
+    """
+    payload = {
+        "stage": name,
+        "code": code_digest(),
+        "config": {key: repr(getattr(config, key)) for key in config_keys},
+        "files": {key: file_digest(getattr(config, key)) for key in files},
+        "upstream": list(upstream),
+    }
+    encoded = json.dumps(payload, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class StageCache:
+    """
+    Stores the last result of every stage together with its fingerprint.
+    Only one entry per stage is kept: a new fingerprint overwrites the old one.
+    """
+
+    def __init__(self, cache_dir: str = config.STAGE_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _paths(self, name: str) -> tuple[str, str]:
+        base = os.path.join(self.cache_dir, name)
+        return f"{base}.fingerprint", f"{base}.pkl"
+
+    def is_valid(self, name: str, fp: str) -> bool:
+        fp_path, result_path = self._paths(name)
+        if not os.path.exists(fp_path) or not os.path.exists(result_path):
+            return False
+        with open(fp_path, "r", encoding="utf-8") as f:
+            return f.read().strip() == fp
+
+    def load(self, name: str):
+        _, result_path = self._paths(name)
+        with open(result_path, "rb") as f:
+            return pickle.load(f)
+
+    def store(self, name: str, fp: str, result) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fp_path, result_path = self._paths(name)
+        try:
+            # Scrittura atomica: prima il risultato, poi il fingerprint che lo rende valido
+            if os.path.exists(fp_path):
+                os.remove(fp_path)
+            tmp_path = f"{result_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, result_path)
+
+            tmp_path = f"{fp_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(fp)
+            os.replace(tmp_path, fp_path)
+        except Exception as e:
+            logger.warning(f"Impossibile salvare la cache dello stage '{name}': {e}")
+
+    def clear(self) -> None:
+        for path in glob.glob(os.path.join(self.cache_dir, "*")):
+            os.remove(path)
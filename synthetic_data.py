@@ -0,0 +1,200 @@
+# synthetic_data.py - Generatore di dati sintetici per benchmark e test offline
+# Produce righe FPEDIA, FSTATS e quotazioni che condividono lo stesso universo di giocatori,
+# nello stesso formato in cui le restituiscono i loader della pipeline.
+import os
+
+import numpy as np
+import pandas as pd
+
+import config
+
+SQUADRE = [
+    "Atalanta", "Bologna", "Cagliari", "Como", "Cremonese", "Fiorentina", "Genoa",
+    "Inter", "Juventus", "Lazio", "Lecce", "Milan", "Napoli", "Parma", "Pisa",
+    "Roma", "Sassuolo", "Torino", "Udinese", "Verona",
+]
+NOMI = [
+    "Alessandro", "Andrea", "Antonio", "Davide", "Federico", "Francesco", "Gabriele",
+    "Giacomo", "Giorgio", "Giovanni", "Leonardo", "Lorenzo", "Luca", "Marco", "Matteo",
+    "Mattia", "Nicolò", "Paolo", "Pietro", "Riccardo", "Simone", "Stefano", "Tommaso",
+]
+_SILLABE = [
+    "ba", "be", "bi", "ca", "ce", "ci", "da", "de", "di", "fa", "fe", "ga", "gi", "la",
+    "le", "li", "lo", "ma", "me", "mi", "na", "ne", "ni", "pa", "pe", "ra", "re", "ri",
+    "ro", "sa", "se", "si", "ta", "te", "ti", "to", "va", "ve", "vi", "za", "zo", "lu",
+]
+SKILLS = [
+    "Fuoriclasse", "Titolare", "Buona Media", "Goleador", "Assistman", "Piazzati",
+    "Rigorista", "Giovane talento", "Panchinaro", "Falloso", "Outsider",
+]
+RUOLI = np.array(["P", "D", "C", "A"])
+RUOLI_FPEDIA = {"P": "Portiere", "D": "Difensore", "C": "Centrocampista", "A": "Attaccante"}
+RUOLI_FSTATS = {"P": "POR", "D": "DIF", "C": "CEN", "A": "ATT"}
+# Distribuzione dei ruoli in una rosa di Serie A
+PROB_RUOLI = [0.11, 0.33, 0.34, 0.22]
+
+
+def _cognome(i: int) -> str:
+    """Cognome univoco e pronunciabile derivato dall'indice (base len(_SILLABE))."""
+    n = len(_SILLABE)
+    sillabe = [_SILLABE[i % n], _SILLABE[(i // n) % n], _SILLABE[(i // n // n) % n]]
+    if i >= n ** 3:
+        sillabe.append(_SILLABE[(i // n ** 3) % n])
+    return "".join(sillabe).capitalize() + "lli"
+
+
+def generate_universe(n_players: int = 600, seed: int = 0) -> pd.DataFrame:
+    """
+    Universo comune di giocatori con le "vere" caratteristiche latenti da cui
+    derivano le tre fonti.
+    """
+    rng = np.random.default_rng(seed)
+    ruolo = rng.choice(RUOLI, size=n_players, p=PROB_RUOLI)
+
+    # Qualità latente 0-1: poche stelle, molti gregari
+    qualita = rng.beta(2.0, 5.0, size=n_players)
+    presenze = np.clip(rng.normal(8 + qualita * 40, 8), 0, 38).round().astype(int)
+    gol_rate = np.select([ruolo == "A", ruolo == "C", ruolo == "D"], [0.45, 0.15, 0.05], 0.0) * (0.4 + qualita)
+    gol = rng.poisson(gol_rate * presenze)
+    assist = rng.poisson(np.where(ruolo == "P", 0.0, 0.08 + qualita * 0.15) * presenze)
+    fantamedia = np.round(5.6 + qualita * 1.6 + rng.normal(0, 0.25, n_players), 2)
+
+    return pd.DataFrame({
+        "id_giocatore": np.arange(1, n_players + 1),
+        "nome": rng.choice(NOMI, size=n_players),
+        "cognome": [_cognome(i) for i in range(n_players)],
+        "squadra": rng.choice(SQUADRE, size=n_players),
+        "ruolo": ruolo,
+        "qualita": qualita,
+        "presenze": presenze,
+        "gol": gol,
+        "assist": assist,
+        "fantamedia": fantamedia,
+    })
+
+
+def generate_fpedia(universe: pd.DataFrame, coverage: float = 0.95, seed: int = 1) -> pd.DataFrame:
+    """Righe FPEDIA come lette da `_giocatori.csv` (formato nome: COGNOME Nome)."""
+    rng = np.random.default_rng(seed)
+    u = universe[rng.random(len(universe)) < coverage]
+    n = len(u)
+    anno = config.ANNO_CORRENTE
+
+    skills = [
+        str([str(s) for s in rng.choice(SKILLS, size=k, replace=False)])
+        for k in rng.integers(0, 4, size=n)
+    ]
+    fm = u["fantamedia"].to_numpy()
+    return pd.DataFrame({
+        "Nome": (u["cognome"].str.upper() + " " + u["nome"]).to_numpy(),
+        "Punteggio": np.clip(u["qualita"].to_numpy() * 100 + rng.normal(0, 8, n), 1, 100).round().astype(int),
+        f"Fantamedia anno {anno-2}-{anno-1}": np.round(fm + rng.normal(0, 0.3, n), 2),
+        f"Fantamedia anno {anno-1}-{anno}": fm,
+        f"Presenze {anno-1}-{anno}": u["presenze"].to_numpy(),
+        f"FM su tot gare {anno-1}-{anno}": np.round(fm * u["presenze"].to_numpy() / 38, 2),
+        "Presenze previste": np.clip(u["presenze"].to_numpy() + rng.integers(-5, 6, n), 0, 38),
+        "Gol previsti": u["gol"].to_numpy(),
+        "Assist previsti": u["assist"].to_numpy(),
+        "Ruolo": [RUOLI_FPEDIA[r] for r in u["ruolo"]],
+        "Skills": skills,
+        "Buon investimento": rng.integers(0, 101, n),
+        "Resistenza infortuni": rng.integers(0, 101, n),
+        "Consigliato prossima giornata": rng.random(n) < 0.3,
+        "Nuovo acquisto": rng.random(n) < 0.1,
+        "Infortunato": rng.random(n) < 0.05,
+        "Squadra": u["squadra"].to_numpy(),
+        "Trend": rng.choice(["UP", "DOWN", "STABLE"], size=n),
+        "Presenze campionato corrente": rng.integers(0, 8, n),
+    })
+
+
+def generate_FSTATS(universe: pd.DataFrame, coverage: float = 0.9, seed: int = 2) -> pd.DataFrame:
+    """
+    Righe FSTATS come lette da `_players.csv`: nomi 'Nome Cognome', squadra come dict
+    serializzato, ruoli POR/DIF/CEN/ATT e nomi di colonna originali.
+    """
+    rng = np.random.default_rng(seed)
+    u = universe[rng.random(len(universe)) < coverage]
+    n = len(u)
+    presenze = u["presenze"].to_numpy()
+    return pd.DataFrame({
+        "name": (u["nome"] + " " + u["cognome"]).to_numpy(),
+        "team": [
+            str({"id": SQUADRE.index(s) + 1, "name": s.lower()}) for s in u["squadra"]
+        ],
+        "fantacalcioPosition": [RUOLI_FSTATS[r] for r in u["ruolo"]],
+        "appearances": presenze,
+        "goals": u["gol"].to_numpy(),
+        "assists": u["assist"].to_numpy(),
+        "yellowCards": rng.poisson(presenze * 0.12),
+        "redCards": rng.poisson(presenze * 0.01),
+        "xgFromOpenPlays": np.round(u["gol"].to_numpy() * rng.uniform(0.6, 1.2, n), 2),
+        "xA": np.round(u["assist"].to_numpy() * rng.uniform(0.6, 1.2, n), 2),
+        "pagella": np.round(5.8 + u["qualita"].to_numpy() * 0.8 + rng.normal(0, 0.15, n), 2),
+        "fantacalcioRanking": np.round(u["fantamedia"].to_numpy() + rng.normal(0, 0.2, n), 2),
+        "fantacalcioFantaindex": np.clip(u["qualita"].to_numpy() * 100 + rng.normal(0, 10, n), 0, 100).round(1),
+    })
+
+
+def generate_quotazioni(universe: pd.DataFrame, seed: int = 3) -> pd.DataFrame:
+    """Quotazioni nel formato restituito da `quotazioni_loader.load_quotazioni`."""
+    rng = np.random.default_rng(seed)
+    n = len(universe)
+    q = universe["qualita"].to_numpy()
+    qt_iniziale = np.clip(np.round(1 + q ** 2 * 60 + rng.normal(0, 2, n)), 1, 80).astype(int)
+    qt_attuale = np.clip(qt_iniziale + rng.integers(-3, 4, n), 1, 80)
+    fvm = np.clip(np.round(qt_attuale * 3.5 + rng.normal(0, 10, n)), 1, 500).astype(int)
+    # merge_with_quotazioni confronta i nomi normalizzati con quelli FPEDIA,
+    # quindi si usa lo stesso formato "COGNOME Nome"
+    nome = (universe["cognome"].str.upper() + " " + universe["nome"]).to_numpy()
+
+    df = pd.DataFrame({
+        "id_giocatore": universe["id_giocatore"].to_numpy(),
+        "ruolo_singolo": universe["ruolo"].to_numpy(),
+        "ruolo_mantra": universe["ruolo"].map({"P": "Por", "D": "Dc", "C": "M;C", "A": "Pc"}).to_numpy(),
+        "nome": nome,
+        "squadra": universe["squadra"].to_numpy(),
+        "quotazione_attuale": qt_attuale.astype(float),
+        "quotazione_iniziale": qt_iniziale.astype(float),
+        "diff_quotazione": (qt_attuale - qt_iniziale),
+        "quotazione_attuale_mantra": np.clip(qt_attuale + rng.integers(-2, 3, n), 1, 80).astype(float),
+        "quotazione_iniziale_mantra": qt_iniziale.astype(float),
+        "diff_quotazione_mantra": 0,
+        "fantavoto_medio": fvm.astype(float),
+        "fantavoto_medio_mantra": np.clip(fvm + rng.integers(-5, 6, n), 1, 500).astype(float),
+    })
+    df["nome_normalizzato"] = df["nome"].str.strip().str.lower()
+    return df
+
+
+def generate_dataset(n_players: int = 600, seed: int = 0) -> dict[str, pd.DataFrame]:
+    """FPEDIA, FSTATS e quotazioni generati dallo stesso universo."""
+    universe = generate_universe(n_players, seed)
+    return {
+        "fpedia": generate_fpedia(universe, seed=seed + 1),
+        "fstats": generate_FSTATS(universe, seed=seed + 2),
+        "quotazioni": generate_quotazioni(universe, seed=seed + 3),
+    }
+
+
+def write_dataset(data_dir: str, n_players: int = 600, seed: int = 0) -> None:
+    """
+    Scrive i file di input della pipeline (`_giocatori.csv`, `_players.csv` e l'Excel
+    delle quotazioni con la riga di titolo) in `data_dir`.
+    """
+    dataset = generate_dataset(n_players, seed)
+    os.makedirs(data_dir, exist_ok=True)
+    dataset["fpedia"].to_csv(os.path.join(data_dir, os.path.basename(config.GIOCATORI_CSV)), index=False, encoding="utf-8")
+    dataset["fstats"].to_csv(os.path.join(data_dir, os.path.basename(config.PLAYERS_CSV)), index=False, sep=";", encoding="utf-8")
+
+    inverse_mapping = {
+        "id_giocatore": "Id", "ruolo_singolo": "R", "ruolo_mantra": "RM", "nome": "Nome",
+        "squadra": "Squadra", "quotazione_attuale": "Qt.A", "quotazione_iniziale": "Qt.I",
+        "diff_quotazione": "Diff.", "quotazione_attuale_mantra": "Qt.A M",
+        "quotazione_iniziale_mantra": "Qt.I M", "diff_quotazione_mantra": "Diff.M",
+        "fantavoto_medio": "FVM", "fantavoto_medio_mantra": "FVM M",
+    }
+    quotazioni = dataset["quotazioni"].drop(columns=["nome_normalizzato"]).rename(columns=inverse_mapping)
+    with pd.ExcelWriter(os.path.join(data_dir, os.path.basename(config.QUOTAZIONI_FILE)), engine="openpyxl") as writer:
+        pd.DataFrame([["Quotazioni Fantacalcio (dati sintetici)"]]).to_excel(writer, index=False, header=False)
+        quotazioni.to_excel(writer, index=False, startrow=1)
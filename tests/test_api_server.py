@@ -0,0 +1,18 @@
+# Ordinamento dell'API su colonne miste numeri/testo
+import json
+
+import api_server
+import query_cache
+
+
+def test_sorted_order_puts_numbers_first(tmp_path):
+    path = tmp_path / "query_cache.json"
+    path.write_text(json.dumps({
+        "version": query_cache.QUERY_CACHE_VERSION,
+        "rows": 4,
+        "columns": ["Nome", "x"],
+        "data": {"Nome": ["a", "b", "c", "d"], "x": [2, "z", None, 9]},
+    }), encoding="utf-8")
+    dataset = api_server.Dataset("unified", str(path))
+    assert dataset.sorted_order("x", ascending=False) == [3, 0, 1, 2]
+    assert dataset.sorted_order("x", ascending=True) == [0, 3, 1, 2]
@@ -0,0 +1,36 @@
+# Budget di avvio della CLI: `import cli` in un interprete pulito non deve caricare i moduli
+# pesanti né superare config.CLI_IMPORT_BUDGET_MS
+import json
+import os
+import subprocess
+import sys
+
+import cli
+import config
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_cli() -> dict:
+    code = (
+        "import json, sys, time\n"
+        "t = time.perf_counter()\n"
+        "import cli\n"
+        "elapsed = (time.perf_counter() - t) * 1000\n"
+        "print(json.dumps({'elapsed_ms': elapsed, 'modules': sorted(sys.modules)}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def test_import_cli_skips_heavy_modules():
+    modules = set(_import_cli()["modules"])
+    assert [m for m in cli.HEAVY_MODULES if m in modules] == []
+
+
+def test_import_cli_within_budget():
+    # Il primo import può pagare la compilazione dei .pyc: conta il migliore di tre
+    elapsed_ms = min(_import_cli()["elapsed_ms"] for _ in range(3))
+    assert elapsed_ms < config.CLI_IMPORT_BUDGET_MS
@@ -0,0 +1,113 @@
+# Parità tra punteggi incrementali (RowScorer) e ricalcolo completo di calcola_convenienza_*
+import warnings
+
+import pandas as pd
+import pytest
+
+import config
+import convenienza_calculator
+import data_processor
+import incremental_scoring
+import projections
+import quotazioni_loader
+import scoring_formulas
+import stage_cache
+import synthetic_data
+
+
+@pytest.fixture(scope="module")
+def inputs() -> dict[str, pd.DataFrame]:
+    """Input dei punteggi (dati elaborati e uniti alle quotazioni) su un universo sintetico."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        data = synthetic_data.generate_dataset(300, seed=7)
+        return {
+            "fpedia": quotazioni_loader.merge_with_quotazioni(
+                data_processor.process_fpedia_data(data["fpedia"].copy()), data["quotazioni"]),
+            "FSTATS": quotazioni_loader.merge_with_quotazioni(
+                data_processor.process_FSTATS_data(data["fstats"].copy()), data["quotazioni"]),
+        }
+
+
+@pytest.fixture(autouse=True)
+def incremental(monkeypatch):
+    monkeypatch.setattr(config, "INCREMENTAL_SCORING", True)
+    monkeypatch.setattr(config, "INCREMENTAL_PARITY_CHECK", False)
+
+
+def _fpedia_scorer(state_dir) -> incremental_scoring.RowScorer:
+    # Stessa configurazione di main.FPEDIA_SCORER, con lo stato in una directory temporanea
+    return incremental_scoring.RowScorer(
+        "score_fpedia", convenienza_calculator.calcola_convenienza_fpedia, key=("Nome", "Squadra"),
+        normalizers={"giocatemax": convenienza_calculator.calcola_giocatemax, "formule": scoring_formulas.digest},
+        state_dir=str(state_dir),
+    )
+
+
+def _fstats_scorer(state_dir) -> incremental_scoring.RowScorer:
+    return incremental_scoring.RowScorer(
+        "score_FSTATS", convenienza_calculator.calcola_convenienza_FSTATS, key=("Nome",),
+        normalizers={"formule": scoring_formulas.digest}, state_dir=str(state_dir),
+    )
+
+
+def _weekly_update(df: pd.DataFrame) -> pd.DataFrame:
+    """Pochi prezzi cambiati, un ruolo e (se presente) una skill."""
+    df = df.copy()
+    rows = df.index[[3, 40, 41, 150]]
+    df.loc[rows, "quotazione_attuale"] = df.loc[rows, "quotazione_attuale"] + 4
+    df.loc[df.index[10], "Ruolo"] = "Attaccante" if df.loc[df.index[10], "Ruolo"] != "Attaccante" else "Difensore"
+    if "Skills" in df.columns:
+        df.loc[df.index[20], "Skills"] = "['Rigorista', 'Titolare']"
+    return df
+
+
+@pytest.mark.parametrize("source, make_scorer, full", [
+    ("fpedia", _fpedia_scorer, convenienza_calculator.calcola_convenienza_fpedia),
+    ("FSTATS", _fstats_scorer, convenienza_calculator.calcola_convenienza_FSTATS),
+])
+def test_incremental_matches_full(tmp_path, inputs, source, make_scorer, full):
+    scorer = make_scorer(tmp_path)
+    first = scorer(inputs[source])
+    assert scorer.last_run["mode"] == "full"
+    pd.testing.assert_frame_equal(first, full(inputs[source].copy()))
+
+    updated = _weekly_update(inputs[source])
+    result = scorer(updated)
+    assert scorer.last_run["mode"] == "incremental"
+    assert 0 < scorer.last_run["changed"] <= 6
+    pd.testing.assert_frame_equal(result, full(updated.copy()))
+
+
+def test_code_change_forces_full(tmp_path, inputs, monkeypatch):
+    scorer = _fpedia_scorer(tmp_path)
+    scorer(inputs["fpedia"])
+    monkeypatch.setattr(stage_cache, "code_digest", lambda: "codice-diverso")
+    updated = _weekly_update(inputs["fpedia"])
+    result = scorer(updated)
+    assert scorer.last_run["mode"] == "full"
+    assert scorer.last_run["reason"] == "codice cambiato"
+    pd.testing.assert_frame_equal(result, convenienza_calculator.calcola_convenienza_fpedia(updated.copy()))
+
+
+def test_column_change_forces_full(tmp_path, inputs):
+    scorer = _fstats_scorer(tmp_path)
+    scorer(inputs["FSTATS"])
+    # Es. le colonne aggiunte da projections.attach quando le proiezioni diventano disponibili
+    updated = inputs["FSTATS"].assign(**{projections.PROJECTION_COLUMNS[0]: 6.0})
+    result = scorer(updated)
+    assert scorer.last_run["mode"] == "full"
+    assert scorer.last_run["reason"] == "colonne di input cambiate"
+    pd.testing.assert_frame_equal(result, convenienza_calculator.calcola_convenienza_FSTATS(updated.copy()))
+
+
+def test_too_many_changes_force_full(tmp_path, inputs):
+    scorer = _fpedia_scorer(tmp_path)
+    scorer(inputs["fpedia"])
+    updated = inputs["fpedia"].copy()
+    rows = updated.index[: int(len(updated) * 0.6)]
+    updated.loc[rows, "quotazione_attuale"] = updated.loc[rows, "quotazione_attuale"] + 1
+    result = scorer(updated)
+    assert scorer.last_run["mode"] == "full"
+    assert scorer.last_run["reason"] == "troppe righe cambiate"
+    pd.testing.assert_frame_equal(result, convenienza_calculator.calcola_convenienza_fpedia(updated.copy()))
@@ -0,0 +1,41 @@
+# Picco di memoria per span: ogni stage riporta il proprio, anche dentro lo span "pipeline"
+import pytest
+
+import instrumentation
+
+
+@pytest.fixture
+def enabled():
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+
+
+def _peaks() -> dict[str, float]:
+    return {e["name"]: e["peak_mem_delta_mb"] for e in instrumentation.events()}
+
+
+def test_sibling_spans_report_their_own_peak(enabled):
+    with instrumentation.span("pipeline", category="pipeline"):
+        with instrumentation.span("grande"):
+            buffer = bytearray(100 * 1024 * 1024)
+            del buffer
+        with instrumentation.span("piccolo"):
+            buffer = bytearray(5 * 1024 * 1024)
+            del buffer
+    peaks = _peaks()
+    assert peaks["grande"] == pytest.approx(100, abs=1)
+    assert peaks["piccolo"] == pytest.approx(5, abs=1)
+    assert peaks["pipeline"] == pytest.approx(100, abs=1)
+
+
+def test_child_peak_folds_into_parent(enabled):
+    with instrumentation.span("padre"):
+        with instrumentation.span("figlio"):
+            buffer = bytearray(40 * 1024 * 1024)
+            del buffer
+        buffer = bytearray(10 * 1024 * 1024)
+        del buffer
+    peaks = _peaks()
+    assert peaks["figlio"] == pytest.approx(40, abs=1)
+    assert peaks["padre"] == pytest.approx(40, abs=1)
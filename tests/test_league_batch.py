@@ -0,0 +1,35 @@
+# Rosa consigliata: massimo valore entro il budget di ogni ruolo
+import pandas as pd
+import pytest
+
+import league_batch
+
+
+def _ranked() -> pd.DataFrame:
+    # Indici valore/prezzo: i giocatori a 1 credito hanno l'indice più alto ma valgono poco
+    return pd.DataFrame({
+        "Nome": ["Base1", "Base2", "Base3", "Medio", "Top"],
+        "Ruolo": ["A"] * 5,
+        "Prezzo_Lega": [1, 1, 1, 20, 40],
+        "quotazione_attuale": [1, 1, 1, 20, 40],
+        "Indice_Aggiustato": [900.0, 800.0, 700.0, 60.0, 50.0],
+        "Score_Lega": [100.0, 90.0, 80.0, 50.0, 40.0],
+    })
+
+
+def test_roster_spends_budget_on_value():
+    league = league_batch.League("Test", rosa={"A": 2}, ripartizione={"A": 1}, budget=60)
+    rosa = league_batch.suggest_roster(_ranked(), league)
+    assert rosa["Nome"].tolist() == ["Medio", "Top"]
+    assert rosa["Prezzo_Lega"].sum() <= 60
+
+
+def test_roster_respects_role_budget():
+    league = league_batch.League("Test", rosa={"A": 2}, ripartizione={"A": 1}, budget=30)
+    rosa = league_batch.suggest_roster(_ranked(), league)
+    assert rosa["Nome"].tolist() == ["Base1", "Medio"]
+
+
+def test_empty_rosa_is_rejected():
+    with pytest.raises(ValueError, match="rosa"):
+        league_batch.League("Test", rosa={})
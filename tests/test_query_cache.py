@@ -0,0 +1,12 @@
+# Ordinamento della query cache su colonne miste numeri/testo
+import query_cache
+
+PAYLOAD = {"rows": 6, "columns": ["x"], "data": {"x": [3, "b", None, 1.5, "a", 7]}}
+
+
+def test_sort_descending_puts_numbers_first():
+    assert query_cache.query(PAYLOAD, sort_by="x", limit=None) == [5, 0, 3, 1, 4, 2]
+
+
+def test_sort_ascending_puts_numbers_first():
+    assert query_cache.query(PAYLOAD, sort_by="x", ascending=True, limit=None) == [3, 0, 5, 4, 1, 2]
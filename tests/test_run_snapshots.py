@@ -0,0 +1,36 @@
+# Diff tra snapshot: giocatori aggiunti, rimossi e cambiati
+import pandas as pd
+
+import run_snapshots
+
+
+def _frame(**changes) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "Nome": ["Rossi", "Bianchi"],
+        "Squadra": ["Inter", "Milan"],
+        "Infortunato": ["no", "no"],
+        "Score_Affare": [80.0, 60.0],
+    })
+    for column, values in changes.items():
+        df[column] = values
+    return df
+
+
+def _diff(tmp_path, old: pd.DataFrame, new: pd.DataFrame) -> dict:
+    paths = [run_snapshots.write_snapshot(df, snapshot_dir=str(tmp_path / name)) for name, df in (("a", old), ("b", new))]
+    return run_snapshots.diff_snapshots(*(run_snapshots.load_snapshot(p) for p in paths))
+
+
+def test_diff_with_only_text_changes(tmp_path):
+    diff = _diff(tmp_path, _frame(), _frame(Infortunato=["no", "si"]))
+    changed = diff["changed"]
+    assert changed[["Nome", "colonna", "prima", "dopo"]].values.tolist() == [["Bianchi", "Infortunato", "no", "si"]]
+    assert changed["delta"].isna().all()
+    assert diff["added"].empty and diff["removed"].empty
+
+
+def test_diff_numeric_change_has_delta(tmp_path):
+    diff = _diff(tmp_path, _frame(), _frame(Score_Affare=[80.0, 65.5]))
+    changed = diff["changed"].set_index("colonna")
+    assert changed.loc["Score_Affare", "delta"] == 5.5
+    assert "Rank_Score_Affare" not in changed.index
@@ -0,0 +1,99 @@
+# watch.py - Modalità watch: pipeline residente in memoria, rieseguita quando cambiano gli input
+# Il processo resta attivo con import fatti e frame caricati: a ogni modifica di quotazioni, CSV
+# scaricati o override di config la pipeline viene rieseguita con i risultati in memoria, e solo
+# gli stage con fingerprint cambiato (quindi a valle della modifica) vengono ricalcolati.
+import os
+import time
+
+from loguru import logger
+
+import config
+import instrumentation
+import main
+
+FETCH_STAGES = ("fetch_fpedia", "fetch_FSTATS")
+# Output aggiornati senza i report Excel (la scrittura con openpyxl è la parte più lenta):
+# l'API di `serve` ricarica da sola le query cache
+FAST_TARGETS = (
+    "query_cache", "query_cache_fpedia", "query_cache_FSTATS", "similarity_index", "quotazioni_history",
+    "shared_results", "run_snapshot",
+)
+
+
+def watched_files() -> list[str]:
+    """File di input osservati, letti da config a ogni controllo (gli override possono cambiarli)."""
+    return [
+        config.QUOTAZIONI_FILE, config.GIOCATORI_CSV, config.PLAYERS_CSV, config.CONFIG_OVERRIDES_FILE,
+        config.SCORING_FORMULAS_FILE,
+    ]
+
+
+def _snapshot(paths) -> dict:
+    snapshot = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            snapshot[path] = None
+    return snapshot
+
+
+class Watcher:
+    """Esegue la pipeline (senza download) riusando i risultati in memoria tra un'esecuzione e l'altra."""
+
+    def __init__(self, targets=None, exclude=FETCH_STAGES):
+        self.targets = targets
+        self.exclude = tuple(exclude)
+        self.memory = {}
+        self.runs = 0
+
+    def refresh(self) -> dict:
+        """
+        Riapplica gli override ed esegue la pipeline. Ritorna la provenienza del risultato
+        di ogni stage ("memoria", "cache" o "eseguito").
+        """
+        config.apply_overrides()
+        os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+        started = time.perf_counter()
+        pipeline = main.build_pipeline(memory=self.memory)
+        with instrumentation.tracing():
+            pipeline.run(targets=self.targets, exclude=self.exclude)
+        self.runs += 1
+        eseguiti = [name for name, source in pipeline.sources.items() if source != "memoria"]
+        logger.info(
+            f"👀 Aggiornamento {self.runs} in {time.perf_counter() - started:.2f}s: "
+            f"{len(eseguiti)}/{len(pipeline.sources)} stage rieseguiti"
+            + (f" ({', '.join(eseguiti)})" if eseguiti else "")
+        )
+        return pipeline.sources
+
+    def run(self, interval: float = config.WATCH_INTERVAL) -> None:
+        """
+        Primo calcolo completo, poi polling dei file osservati. Una modifica viene elaborata quando
+        il file resta invariato per un intervallo (es. copia o salvataggio ancora in corso).
+        """
+        state = _snapshot(watched_files())
+        self._safe_refresh()
+        logger.info(f"👀 In attesa di modifiche a: {', '.join(watched_files())} (Ctrl+C per uscire)")
+        while True:
+            time.sleep(interval)
+            current = _snapshot(watched_files())
+            if current == state:
+                continue
+            time.sleep(interval)
+            settled = _snapshot(watched_files())
+            if settled != current:
+                continue
+            changed = [path for path, value in settled.items() if state.get(path) != value]
+            state = settled
+            logger.info(f"👀 Modificati: {', '.join(changed)}")
+            self._safe_refresh()
+
+    def _safe_refresh(self) -> None:
+        # Un file a metà o un override sbagliato non devono fermare il watch: si aspetta la correzione
+        try:
+            self.refresh()
+        except Exception as e:
+            self.runs += 1
+            logger.error(f"👀 Aggiornamento fallito, resto in attesa di modifiche: {e}")